@@ -0,0 +1,76 @@
+"""
+Benchmark da análise sobre um snapshot (entrada reproduzível).
+
+Executa `analisar --from-snapshot` em subprocessos novos e mede o tempo de
+parede (mediana), sem autenticação nem rede: só leitura do snapshot,
+RulesEngine, perfil e relatório. Opcionalmente falha acima de um orçamento.
+
+Uso:
+  python benchmarks/bench_replay.py SNAPSHOT [--runs 3] [--budget-ms 5000]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    return env
+
+
+def measure_replay(snapshot: Path, workdir: Path) -> float:
+    report = workdir / "resumo.md"
+    if report.exists():
+        report.unlink()
+    t0 = time.perf_counter()
+    proc = subprocess.run(
+        [sys.executable, "-m", "bot_cab.main", "analisar",
+         "--from-snapshot", str(snapshot),
+         "--solution-name", snapshot.stem,
+         "--output-markdown", str(report)],
+        capture_output=True, text=True, env=_env(), cwd=ROOT,
+    )
+    elapsed = (time.perf_counter() - t0) * 1000.0
+    # 0/1/2 são resultados da análise (2 = flow que já falhou no fetch);
+    # sem relatório, o próprio comando falhou.
+    if proc.returncode not in (0, 1, 2) or not report.is_file():
+        sys.stderr.write(proc.stderr[-2000:])
+        raise SystemExit(f"❌ analisar --from-snapshot retornou {proc.returncode}")
+    return elapsed
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de reanálise de snapshot do Bot_CAB")
+    ap.add_argument("snapshot", type=Path)
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--budget-ms", type=float)
+    args = ap.parse_args()
+
+    snapshot = args.snapshot.resolve()
+    times = []
+    with tempfile.TemporaryDirectory(prefix="bench_replay_") as td:
+        for _ in range(args.runs):
+            times.append(measure_replay(snapshot, Path(td)))
+
+    median_ms = statistics.median(times)
+    budget: Optional[float] = args.budget_ms
+    print(f"analisar --from-snapshot {snapshot.name}: {median_ms:.0f} ms "
+          f"(min {min(times):.0f}, max {max(times):.0f}, {args.runs} execuções)")
+    if budget is not None and median_ms > budget:
+        print(f"❌ acima do orçamento de {budget:.0f} ms")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
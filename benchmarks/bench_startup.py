@@ -0,0 +1,111 @@
+"""
+Benchmark de cold start do Bot_CAB.
+
+Mede, em subprocessos novos:
+  1) `python -X importtime -c "import bot_cab.main"`: tempo cumulativo de
+     import do entry-point e módulos pesados que não deveriam ser carregados;
+  2) tempo de parede de `python -m bot_cab.main --help`.
+
+Falha (exit 1) se o import passar do orçamento ou puxar dependências pesadas.
+
+Uso:
+  python benchmarks/bench_startup.py [--import-budget-ms 150] [--help-budget-ms 600] [--runs 5]
+"""
+
+import argparse
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# Módulos que só os subcomandos devem importar.
+HEAVY_MODULES = ("azure", "requests", "dateutil", "urllib3", "msal")
+# Pacotes do próprio Bot_CAB que o parse da CLI não deve carregar.
+DEFERRED_PACKAGES = ("bot_cab.processing", "bot_cab.commands", "bot_cab.output")
+
+_IMPORTTIME_RE = re.compile(r"^import time:\s+(\d+)\s+\|\s+(\d+)\s+\|(\s*)(\S+)")
+
+
+def _env() -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PYTHONPATH"] = str(ROOT) + os.pathsep + env.get("PYTHONPATH", "")
+    env.pop("PYTHONDONTWRITEBYTECODE", None)
+    return env
+
+
+def measure_import() -> Tuple[float, List[str]]:
+    """
+    Retorna (ms cumulativos de bot_cab.main, módulos pesados importados).
+    """
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import bot_cab.main"],
+        capture_output=True, text=True, env=_env(), cwd=ROOT, check=True,
+    )
+    cumulative_us = 0
+    heavy = []
+    for line in proc.stderr.splitlines():
+        m = _IMPORTTIME_RE.match(line)
+        if not m:
+            continue
+        name = m.group(4)
+        if name == "bot_cab.main":
+            cumulative_us = int(m.group(2))
+        if name.split(".")[0] in HEAVY_MODULES or name.startswith(DEFERRED_PACKAGES):
+            heavy.append(name)
+    return cumulative_us / 1000.0, sorted(set(heavy))
+
+
+def measure_help() -> float:
+    t0 = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-m", "bot_cab.main", "--help"],
+        capture_output=True, env=_env(), cwd=ROOT, check=True,
+    )
+    return (time.perf_counter() - t0) * 1000.0
+
+
+def main() -> int:
+    ap = argparse.ArgumentParser(description="Benchmark de cold start do Bot_CAB")
+    ap.add_argument("--import-budget-ms", type=float, default=150.0)
+    ap.add_argument("--help-budget-ms", type=float, default=600.0)
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    # primeira execução aquece o cache de bytecode
+    measure_import()
+
+    imports, helps, heavy = [], [], set()
+    for _ in range(args.runs):
+        ms, loaded = measure_import()
+        imports.append(ms)
+        heavy.update(loaded)
+        helps.append(measure_help())
+
+    import_ms = statistics.median(imports)
+    help_ms = statistics.median(helps)
+    print(f"import bot_cab.main: {import_ms:.1f} ms (orçamento {args.import_budget_ms:.0f} ms)")
+    print(f"bot_cab --help:      {help_ms:.1f} ms (orçamento {args.help_budget_ms:.0f} ms)")
+
+    failed = False
+    if heavy:
+        print(f"❌ módulos pesados importados no start-up: {', '.join(sorted(heavy))}")
+        failed = True
+    if import_ms > args.import_budget_ms:
+        print("❌ import do entry-point acima do orçamento")
+        failed = True
+    if help_ms > args.help_budget_ms:
+        print("❌ --help acima do orçamento")
+        failed = True
+    if not failed:
+        print("✅ start-up dentro do orçamento")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -3,6 +3,11 @@ Define a interface de linha de comando (CLI) do Bot_CAB.
 """
 
 import argparse
+import os
+
+from bot_cab.config.constants import MAX_CONCURRENT_DOWNLOADS, STATS_WINDOW_DAYS
+from bot_cab.utils.shard import parse_shard
+
 class CLIInputHandler:
     def __init__(self) -> None:
         parser = argparse.ArgumentParser(
@@ -14,6 +19,12 @@ class CLIInputHandler:
             action="store_true",
             help="habilita logs de depuração"
         )
+        parser.add_argument(
+            "--metrics-dir",
+            dest="metrics_dir",
+            default=os.environ.get("BOT_CAB_METRICS_DIR"),
+            help="grava metrics.prom (OpenMetrics) e metrics.json neste diretório ao final"
+        )
 
         subparsers = parser.add_subparsers(
             dest="command",
@@ -23,25 +34,107 @@ class CLIInputHandler:
 
         # analisar
         pa = subparsers.add_parser("analisar", help="Analisa solução e gera relatório")
-        auth = pa.add_argument_group("Autenticação")
-        auth.add_argument("--environment-url",   dest="environment_url",   required=True)
-        auth.add_argument("--environment-name",  dest="environment_name",  required=True)
-        auth.add_argument("--application-id",    dest="application_id",    required=True)
-        auth.add_argument("--tenant-id",         dest="tenant_id",         required=True)
+        auth = pa.add_argument_group("Autenticação", "obrigatórios, exceto com --offline/--from-snapshot")
+        auth.add_argument("--environment-url",   dest="environment_url")
+        auth.add_argument("--environment-name",  dest="environment_name")
+        auth.add_argument("--application-id",    dest="application_id")
+        auth.add_argument("--tenant-id",         dest="tenant_id")
         auth.add_argument("--pac-auth-mode",     dest="pac_auth_mode",
                           choices=["standard","federated"], default="standard")
+        auth.add_argument("--environments",      dest="environments",      nargs="+",
+                          metavar="NOME=URL",
+                          help="analisa vários ambientes em paralelo (FetchXML via Web API, token por "
+                               "ambiente) e gera um relatório comparativo; substitui --environment-url/-name")
+        auth.add_argument("--fetch-via",         dest="fetch_via",
+                          choices=["pac","webapi"], default="pac",
+                          help="executa os FetchXML pelo PAC CLI ou direto pela Web API "
+                               "(sem profile do pac; implícito com --environments)")
 
         op = pa.add_argument_group("Operação")
         op.add_argument("--solution-name",       dest="solution_name",     required=True)
-        op.add_argument("--solution-zip-path",   dest="solution_zip_path", required=True)
-        op.add_argument("--output-markdown",     dest="output_markdown",   required=True)
+        op.add_argument("--solution-zip-path",   dest="solution_zip_path",
+                        help="obrigatório, exceto com --from-snapshot")
+        op.add_argument("--from-snapshot",       dest="from_snapshot",
+                        help="reanalisa um snapshot gravado por `fetch` (sem autenticação nem rede)")
+        op.add_argument("--output-markdown",     dest="output_markdown",
+                        help="relatório Markdown (obrigatório sem --partial-output)")
         op.add_argument("--export-path",         dest="export_path")
 
+        op.add_argument("--offline",             dest="offline",           action="store_true",
+                        help="sem ambiente: analisa só o código dos Desktop Flows (sem pac/REST)")
+        op.add_argument("--script-index-cache",  dest="script_index_cache",
+                        help="JSON com o cache do índice dos scripts de Desktop Flow (lido e atualizado)")
+        op.add_argument("--cloud-flow-cache",    dest="cloud_flow_cache",
+                        help="JSON com o cache da análise estática dos Cloud Flows (lido e atualizado)")
+        op.add_argument("--profile-dir",         dest="profile_dir",
+                        help="grava um flame graph (pilhas colapsadas) por flow neste diretório")
+        op.add_argument("--profile-top",         dest="profile_top",       type=int, default=10,
+                        help="nº de subfluxos, tipos de ação e ações mais lentas listados no perfil de execução")
+        op.add_argument("--stats",               dest="stats",             action="store_true",
+                        help="inclui estatísticas agregadas pelo Dataverse (execuções, erros, work queue)")
+        op.add_argument("--stats-days",          dest="stats_days",        type=int, default=STATS_WINDOW_DAYS,
+                        help="janela das estatísticas, em dias")
+
+        sch = pa.add_argument_group("Agendamento")
+        sch.add_argument("--deadline",           dest="deadline",          type=float,
+                         help="orçamento total em segundos; ao se esgotar, gera relatório parcial")
+        sch.add_argument("--max-workers",        dest="max_workers",       type=int, default=1,
+                         help="flows buscados em paralelo (regras e exportação seguem em pipeline)")
+        sch.add_argument("--fail-fast",          dest="fail_fast",         action="store_true",
+                         help="cancela flows pendentes na primeira issue encontrada")
+        sch.add_argument("--timings-file",       dest="timings_file",
+                         help="JSON com tempos da execução anterior (lido e atualizado)")
+        sch.add_argument("--shard",              dest="shard",
+                         help="analisa apenas a fatia i de N (formato i/N, 1 <= i <= N)")
+        sch.add_argument("--partial-output",     dest="partial_output",
+                         help="grava o resultado parcial (JSON) para o subcomando merge")
+        sch.add_argument("--incremental-state",  dest="incremental_state",
+                         help="JSON com manifesto e resultados da execução anterior (lido e atualizado); "
+                              "flows sem componentes alterados não são revalidados")
+
+        # fetch
+        pf = subparsers.add_parser("fetch", help="Busca os dados dos Desktop Flows e grava um snapshot")
+        fauth = pf.add_argument_group("Autenticação")
+        fauth.add_argument("--environment-url",  dest="environment_url",   required=True)
+        fauth.add_argument("--environment-name", dest="environment_name",  required=True)
+        fauth.add_argument("--application-id",   dest="application_id")
+        fauth.add_argument("--tenant-id",        dest="tenant_id",         required=True)
+        fauth.add_argument("--pac-auth-mode",    dest="pac_auth_mode",
+                           choices=["standard","federated"], default="standard")
+        fauth.add_argument("--fetch-via",        dest="fetch_via",
+                           choices=["pac","webapi"], default="pac",
+                           help="executa os FetchXML pelo PAC CLI ou direto pela Web API")
+        pf.add_argument("--solution-name",       dest="solution_name",     required=True)
+        pf.add_argument("--solution-zip-path",   dest="solution_zip_path", required=True)
+        pf.add_argument("--snapshot",            dest="snapshot",          required=True,
+                        help="arquivo de snapshot a gravar")
+        pf.add_argument("--max-workers",         dest="max_workers",       type=int, default=1,
+                        help="flows buscados em paralelo")
+
+        # merge
+        pm = subparsers.add_parser("merge", help="Junta resultados parciais de shards em um relatório")
+        pm.add_argument("--partials",            dest="partials",          nargs="+", required=True,
+                        help="arquivos gravados por analisar --partial-output")
+        pm.add_argument("--output-markdown",     dest="output_markdown",   required=True)
+        pm.add_argument("--timings-file",        dest="timings_file",
+                        help="atualiza o histórico de tempos com os tempos dos shards")
+        pm.add_argument("--profile-top",         dest="profile_top",       type=int, default=10,
+                        help="nº de subfluxos e tipos de ação listados no perfil de execução")
+
         # logs
-        pl = subparsers.add_parser("logs", help="Exporta logs de uma sessão de Flow")
+        pl = subparsers.add_parser("logs", help="Exporta logs de uma ou mais sessões de Flow")
         pl.add_argument("--environment-url",     dest="environment_url",   required=True)
-        pl.add_argument("--flow-session-id",     dest="flow_session_id",   required=True)
+        pl.add_argument("--flow-session-id",     dest="flow_session_ids",  nargs="+", action="extend",
+                        default=[], help="um ou mais ids de sessão (pode repetir)")
+        pl.add_argument("--session-file",        dest="session_file",
+                        help="arquivo com um id de sessão por linha ('-' lê do stdin)")
+        pl.add_argument("--fetchxml-filter",     dest="fetchxml_filter",
+                        help="FetchXML (via PAC CLI) cujo resultado define as sessões")
         pl.add_argument("--export-path",         dest="export_path",       required=True)
+        pl.add_argument("--combined",            dest="combined",          action="store_true",
+                        help="grava um único CSV com todas as sessões (coluna flowSessionId)")
+        pl.add_argument("--max-workers",         dest="max_workers",       type=int,
+                        default=MAX_CONCURRENT_DOWNLOADS, help="downloads simultâneos")
         pl.add_argument("--pac-auth-mode",     dest="pac_auth_mode",
                           choices=["standard","federated"], default="standard")
         pl.add_argument("--tenant-id",         dest="tenant_id",         required=False)
@@ -54,6 +147,72 @@ class CLIInputHandler:
     def parse(self):
         args = self.parser.parse_args()
         if args.command == "analisar":
-            if args.pac_auth_mode == "standard" and not args.application_id:
+            if args.offline and args.from_snapshot:
+                self.parser.error("--offline e --from-snapshot são excludentes")
+            if not (args.solution_zip_path or args.from_snapshot):
+                self.parser.error("informe --solution-zip-path ou --from-snapshot")
+            local = args.offline or args.from_snapshot
+            if args.environments:
+                self._check_environments(args, local)
+            elif not local:
+                for opt in ("environment_url", "environment_name", "tenant_id"):
+                    if not getattr(args, opt):
+                        self.parser.error(f"--{opt.replace('_', '-')} é obrigatório (exceto com --offline/--from-snapshot)")
+            if not local and not args.environments and args.fetch_via == "pac" \
+                    and args.pac_auth_mode == "standard" and not args.application_id:
                 self.parser.error("--application-id é obrigatório com pac-auth-mode=standard")
+            if args.deadline is not None and args.deadline <= 0:
+                self.parser.error("--deadline deve ser > 0")
+            if args.max_workers < 1:
+                self.parser.error("--max-workers deve ser >= 1")
+            if args.stats and local:
+                self.parser.error("--stats requer ambiente (não combina com --offline/--from-snapshot)")
+            if args.stats_days < 1:
+                self.parser.error("--stats-days deve ser >= 1")
+            if not (args.output_markdown or args.partial_output):
+                self.parser.error("informe --output-markdown e/ou --partial-output")
+            if args.shard:
+                try:
+                    parse_shard(args.shard)
+                except ValueError as e:
+                    self.parser.error(str(e))
+                if args.incremental_state:
+                    self.parser.error("--incremental-state não combina com --shard")
+        elif args.command == "fetch":
+            if args.fetch_via == "pac" and args.pac_auth_mode == "standard" and not args.application_id:
+                self.parser.error("--application-id é obrigatório com pac-auth-mode=standard")
+            if args.max_workers < 1:
+                self.parser.error("--max-workers deve ser >= 1")
+        elif args.command == "logs":
+            if not (args.flow_session_ids or args.session_file or args.fetchxml_filter):
+                self.parser.error("informe --flow-session-id, --session-file ou --fetchxml-filter")
+            if args.fetchxml_filter and not args.environment_name:
+                self.parser.error("--environment-name é obrigatório com --fetchxml-filter")
+            if args.max_workers < 1:
+                self.parser.error("--max-workers deve ser >= 1")
         return args
+
+    def _check_environments(self, args, local) -> None:
+        """
+        Valida --environments e o converte em [(nome, url)].
+        """
+        if local:
+            self.parser.error("--environments não combina com --offline/--from-snapshot")
+        if args.environment_url or args.environment_name:
+            self.parser.error("use --environments ou --environment-url/--environment-name, não ambos")
+        for opt in ("shard", "partial_output", "incremental_state", "stats"):
+            if getattr(args, opt):
+                self.parser.error(f"--{opt.replace('_', '-')} não combina com --environments")
+        if not args.tenant_id:
+            self.parser.error("--tenant-id é obrigatório")
+        envs = []
+        for item in args.environments:
+            name, sep, url = item.partition("=")
+            if not sep or not name.strip() or not url.strip():
+                self.parser.error(f"ambiente inválido '{item}' (formato NOME=URL)")
+            envs.append((name.strip(), url.strip().rstrip("/")))
+        names = [n for n, _ in envs]
+        if len(set(names)) != len(names):
+            self.parser.error("nomes repetidos em --environments")
+        args.environments = envs
+        args.fetch_via = "webapi"
@@ -1,51 +1,434 @@
+import argparse
 import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from pathlib import Path
-from bot_cab.utils.io import unzip_solution
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from bot_cab.utils.io import sanitize_filename, unzip_solution
+from bot_cab.utils.shard import parse_shard
+from bot_cab.utils.signals import sigterm_as_interrupt
+from bot_cab.utils.tempdir import create_tempdir
 from bot_cab.processing.processor import Processor
-from bot_cab.processing.rules_engine import RulesEngine
+from bot_cab.processing.rules_engine import RULE_ANALYSIS_FAILED, CloudFlowIssues, RulesEngine
+from bot_cab.processing.cloud_flows import analyze_cloud_flows
+from bot_cab.processing.components import flow_fingerprint, solution_components
+from bot_cab.processing.desktop_scripts import DesktopFlowIndex, ScriptIndexCache, read_desktop_flow_scripts
+from bot_cab.processing.pipeline import Stage
+from bot_cab.processing.profiler import profile_actions
+from bot_cab.processing.request_governor import all_governors
+from bot_cab.processing.session_stats import SolutionStats, collect_stats
+from bot_cab.processing.scheduler import (
+    FlowScheduler,
+    FlowOutcome,
+    TimingHistory,
+    STATUS_DONE,
+    STATUS_FAILED,
+    STATUS_SKIPPED,
+    assign_shard,
+)
+from bot_cab.commands.report import exit_code_for, write_report
 from bot_cab.output.csv_export import CSVExporter
-from bot_cab.output.md_builder import MarkdownResponseBuilder
+from bot_cab.output.incremental_state import IncrementalState
+from bot_cab.output.partial_result import write_partial
+from bot_cab.output.snapshot import Snapshot
 
-def run_analysis(args) -> int:
-    """
-    Executa o fluxo de análise (subcomando `analisar`):
-      1) descompacta a solution
-      2) executa cada desktop flow via Processor
-      3) aplica regras via RulesEngine
-      4) gera CSVs opcionais e relatório Markdown
-    Retorna 0 se nenhuma issue, 1 caso contrário.
-    """
-    logger = logging.getLogger("bot_cab.analyze")
-    logger.info("Iniciando análise da Solution '%s'", args.solution_name)
+logger = logging.getLogger("bot_cab.analyze")
 
-    temp_dir = unzip_solution(args.solution_zip_path)
-    logger.debug("Solution descompactada em %s", temp_dir)
+# Tempo para os ambientes devolverem os resultados parciais após SIGTERM.
+_STOP_GRACE_SECONDS = 2.0
 
-    processor = Processor(args, temp_dir)
-
-    all_issue_groups = []
-    for flow in processor.get_desktop_flows_name():
-        logger.info("Processando Desktop Flow: %s", flow)
-        result = processor.process(flow)
 
+def _analysis_stages(args, unzip_dir: Path) -> List[Stage]:
+    """
+    Regras + exportação sobre a saída de Processor.process (buscada ou do snapshot).
+    """
+    def evaluate(result):
         engine = RulesEngine(
             details=result["details"],
             actions=result["actions"],
-            unzipped_folder=Path(temp_dir),
+            unzipped_folder=unzip_dir,
             prefix=result["prefix"],
         )
         groups, has_issues = engine.analyze_issues()
-        all_issue_groups.append((result, groups, has_issues))
+        result["profile"] = profile_actions(result["actions"], top_n=args.profile_top)
+        return result, groups, has_issues
 
+    def export(analysis):
+        result, _, _ = analysis
+        flow = result["desktop_flow"]
+        if args.profile_dir:
+            result["profile"].write_collapsed(
+                Path(args.profile_dir) / f"{sanitize_filename(flow)}.folded"
+            )
         if args.export_path:
             exporter = CSVExporter(result["actions"], args.export_path, flow)
             exporter.export_csv()
+        return analysis
+
+    return [Stage("regras", evaluate), Stage("exportacao", export)]
+
+
+def _online_stages(args, unzip_dir: Path, processor: Processor) -> List[Stage]:
+    """
+    Busca (pac/REST) em paralelo; regras e exportação do flow anterior
+    rodam enquanto o próximo ainda está sendo buscado.
+    """
+    def fetch(flow: str):
+        logger.info("Processando Desktop Flow: %s", flow)
+        return processor.process(flow)
+
+    return [Stage("busca", fetch, workers=args.max_workers)] + _analysis_stages(args, unzip_dir)
+
+
+def _replay_stages(args, unzip_dir: Path, snapshot: Snapshot) -> List[Stage]:
+    """
+    --from-snapshot: a busca é substituída pela leitura do snapshot
+    (sem autenticação, subprocessos ou HTTP).
+    """
+    def load(flow: str):
+        logger.info("Lendo Desktop Flow do snapshot: %s", flow)
+        return snapshot.load(flow)
+
+    return [Stage("leitura", load)] + _analysis_stages(args, unzip_dir)
+
+
+def _offline_stages(args, unzip_dir: Path, cache: ScriptIndexCache) -> List[Stage]:
+    """
+    --offline: sem autenticação nem chamadas de rede; indexa o script de cada
+    Desktop Flow (com cache por hash) e aplica só as regras sobre o código.
+    """
+    scripts = read_desktop_flow_scripts(unzip_dir)
+
+    def index(flow: str):
+        logger.info("Indexando script do Desktop Flow: %s", flow)
+        return cache.index(flow, scripts.get(flow, ""))
+
+    def evaluate(script: DesktopFlowIndex):
+        engine = RulesEngine(details=None, actions=[], unzipped_folder=unzip_dir, prefix="")
+        groups, has_issues = engine.analyze_script(script)
+        result = {
+            "desktop_flow": script.flow,
+            "session_id": "N/A (offline)",
+            "start_time": "N/A",
+            "details": None,
+            "actions": [],
+            "script": script,
+        }
+        return result, groups, has_issues
+
+    return [Stage("indice", index), Stage("regras", evaluate)]
+
+
+def run_analysis(args) -> int:
+    """
+    Executa o fluxo de análise (subcomando `analisar`):
+      1) descompacta a solution e analisa estaticamente os Cloud Flows
+      2) busca cada desktop flow via Processor (agendado por FlowScheduler)
+      3) aplica regras via RulesEngine e gera CSVs/perfis opcionais, em
+         estágios de pipeline que se sobrepõem à busca dos flows seguintes
+      4) gera o relatório Markdown (sempre, mesmo parcial); com --stats, inclui
+         as estatísticas agregadas pelo Dataverse, consultadas em paralelo à busca
+    Com --offline, os passos 2 e 3 usam só o script dos Desktop Flows; com
+    --from-snapshot, o passo 2 lê a busca gravada pelo subcomando `fetch`.
+    Com --environments, os passos 2 e 3 rodam em paralelo para cada ambiente
+    e o relatório compara os ambientes.
+    Com --shard i/N analisa só a sua fatia dos flows e grava o resultado
+    parcial (--partial-output) para o subcomando `merge`. Com
+    --incremental-state, flows cujos componentes não mudaram desde a execução
+    anterior reaproveitam o resultado guardado (marcado no relatório).
+    Retorna 0 se nenhuma issue, 1 se houver issues ou flows não analisados
+    dentro do prazo, 2 se a análise de algum flow falhou.
+    """
+    started_at = time.monotonic()
+    logger.info("Iniciando análise da Solution '%s'", args.solution_name)
+    if args.environments:
+        return _analyze_environments(args, Path(args.solution_zip_path), started_at)
+    if not args.from_snapshot:
+        return _analyze(args, Path(args.solution_zip_path), started_at)
+
+    with Snapshot(args.from_snapshot) as snapshot, create_tempdir("snapshot_") as td:
+        logger.info("Reanalisando snapshot %s (%s, %s)", args.from_snapshot,
+                    snapshot.solution_name, snapshot.header.get("created_at"))
+        zip_path = snapshot.extract_solution(td / "solution.zip")
+        return _analyze(args, zip_path, started_at, snapshot)
+
+
+def _analyze(args, zip_path: Path, started_at: float, snapshot: Optional[Snapshot] = None) -> int:
+    # Sem rede (offline/snapshot), tempos e prazo não refletem uma análise completa.
+    local = args.offline or snapshot is not None
+
+    temp_dir = unzip_solution(zip_path)
+    logger.debug("Solution descompactada em %s", temp_dir)
+
+    all_flows = snapshot.flows if snapshot is not None else Processor.list_desktop_flows(Path(temp_dir))
+    history = TimingHistory.load(args.timings_file)
+    shard = parse_shard(args.shard) if args.shard else None
+
+    # Análise estática da solution: uma vez só (no shard 1, quando particionado).
+    solution_groups = _solution_groups(args, zip_path) if not shard or shard[0] == 1 else None
+    if shard:
+        flows = assign_shard(all_flows, history, *shard)
+        logger.info("Shard %d/%d: %d de %d flows", shard[0], shard[1], len(flows), len(all_flows))
+    else:
+        flows = all_flows
+
+    carried: Dict[str, FlowOutcome] = {}
+    fingerprints: Dict[str, str] = {}
+    processor: Optional[Processor] = None
+    components = solution_components(temp_dir) if args.incremental_state else {}
+    state = IncrementalState.load(args.incremental_state, _incremental_context(args, snapshot))
+    if args.incremental_state:
+        state.log_diff(components)
+        sessions: Dict[str, str] = {}
+        if not local and flows:
+            try:
+                processor = Processor(args, Path(temp_dir))
+            except Exception as e:
+                logger.warning("Validação incremental sem consultar as últimas execuções: %s", e)
+            else:
+                sessions = _last_sessions(processor, flows)
+        for f in flows:
+            fingerprints[f] = flow_fingerprint(f, components, sessions.get(f, ""))
+            # online, sem a última sessão não dá para saber se houve execução nova
+            if not local and f not in sessions:
+                continue
+            outcome = state.reuse(f, fingerprints[f])
+            if outcome is not None:
+                carried[f] = outcome
+        logger.info("Validação incremental: %d de %d flows sem alterações (resultados reaproveitados)",
+                    len(carried), len(flows))
+    to_run = [f for f in flows if f not in carried]
+    # Replay: flows cuja busca falhou no `fetch` não têm o que reanalisar.
+    unfetched: Dict[str, FlowOutcome] = {}
+    if snapshot is not None:
+        for f in to_run:
+            reason = snapshot.missing_reason(f)
+            if reason is not None:
+                logger.warning("Flow %s sem dados no snapshot: %s", f, reason)
+                unfetched[f] = FlowOutcome(f, STATUS_FAILED, reason=f"busca falhou no fetch: {reason}")
+        to_run = [f for f in to_run if f not in unfetched]
+
+    script_cache = ScriptIndexCache.load(args.script_index_cache)
+    scheduler = FlowScheduler(
+        to_run,
+        history=TimingHistory() if local else history,
+        deadline=None if local else args.deadline,
+        max_workers=args.max_workers,
+        fail_fast=args.fail_fast,
+        started_at=started_at,
+    )
+
+    stats_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="bot_cab_stats")
+    stats_future: Optional[Future] = None
+    want_stats = args.stats and (not shard or shard[0] == 1)
+    try:
+        if not (to_run or want_stats):
+            stages = []
+        elif args.offline:
+            stages = _offline_stages(args, Path(temp_dir), script_cache)
+        elif snapshot is not None:
+            stages = _replay_stages(args, Path(temp_dir), snapshot)
+        else:
+            processor = processor or Processor(args, Path(temp_dir))
+            stages = _online_stages(args, Path(temp_dir), processor)
+            if want_stats:
+                stats_future = stats_pool.submit(
+                    collect_stats, processor.aggregate_client, all_flows, args.stats_days)
+    except Exception as e:
+        logger.error("Falha ao preparar a análise: %s", e, exc_info=True)
+        reason = "falha ao ler os scripts" if args.offline else "falha na autenticação"
+        outcomes = [FlowOutcome(f, STATUS_FAILED, reason=f"{reason}: {e}") for f in to_run]
+    else:
+        outcomes = []
+        if to_run:
+            with sigterm_as_interrupt():
+                outcomes = scheduler.run_pipeline(stages)
+        for gov in all_governors().values():
+            logger.info("Governor Dataverse: %s", gov.snapshot())
+    stats_pool.shutdown(wait=True)
+    stats = _stats_result(stats_future)
+
+    outcomes += unfetched.values()
+    if args.incremental_state:
+        for o in outcomes:
+            state.record(o.flow, fingerprints[o.flow], o)
+        state.save(args.incremental_state, components, all_flows)
+    fresh = {o.flow: o for o in outcomes}
+    outcomes = [carried.get(f) or fresh[f] for f in flows]
+
+    if args.partial_output:
+        write_partial(args.partial_output, args.solution_name, shard or (1, 1), all_flows, outcomes,
+                      solution_groups, stats)
+    if args.output_markdown:
+        write_report(outcomes, args.output_markdown, solution_groups, stats, args.profile_top)
+
+    if args.script_index_cache:
+        script_cache.save(args.script_index_cache)
+    if args.timings_file and not local:
+        history.save(args.timings_file)
+
+    return exit_code_for(outcomes, solution_groups)
+
+
+def _last_sessions(processor: Processor, flows: List[str]) -> Dict[str, str]:
+    """
+    Sessão da última execução de cada flow (uma consulta fetch-last-run por
+    flow): uma execução nova invalida o resultado guardado no estado incremental.
+    """
+    sessions: Dict[str, str] = {}
+    for f in flows:
+        try:
+            sessions[f] = processor.last_run(f)["flowsessionid"]
+        except Exception as e:
+            logger.warning("Última execução de '%s' indisponível: %s", f, e)
+    return sessions
+
+
+def _solution_groups(args, zip_path: Path) -> List[Any]:
+    """
+    Análise estática dos Cloud Flows. Se ela falhar, o grupo devolvido
+    registra a falha (RULE_ANALYSIS_FAILED), que leva ao exit code 2.
+    """
+    try:
+        return [analyze_cloud_flows(zip_path, args.cloud_flow_cache)]
+    except Exception as e:
+        logger.error("Falha na análise estática dos Cloud Flows: %s", e, exc_info=True)
+        failed = CloudFlowIssues()
+        failed.add(f"Falha na análise estática dos Cloud Flows: {e}", rule=RULE_ANALYSIS_FAILED)
+        return [failed]
+
+
+def _environment_args(args, name: str, url: str) -> argparse.Namespace:
+    """
+    Argumentos de um ambiente de --environments: CSVs e perfis vão para
+    um subdiretório com o nome do ambiente.
+    """
+    env = dict(vars(args), environment_name=name, environment_url=url, environments=None)
+    for opt in ("export_path", "profile_dir"):
+        if env[opt]:
+            env[opt] = str(Path(env[opt]) / sanitize_filename(name))
+    return argparse.Namespace(**env)
+
+
+def _in_daemon_thread(func: Callable[[Any], Any], arg: Any, name: str) -> Future:
+    """
+    Executa `func(arg)` numa thread daemon: um ambiente ainda em andamento
+    após a interrupção não impede o processo de terminar.
+    """
+    fut: Future = Future()
+    fut.set_running_or_notify_cancel()
+
+    def target() -> None:
+        try:
+            fut.set_result(func(arg))
+        except BaseException as e:
+            fut.set_exception(e)
+
+    threading.Thread(target=target, daemon=True, name=name).start()
+    return fut
+
+
+def _analyze_environments(args, zip_path: Path, started_at: float) -> int:
+    """
+    --environments: a mesma solution em vários ambientes ao mesmo tempo.
+    Cada ambiente tem seu Processor com FetchXML pela Web API e token próprio
+    (sem o profile global do pac) e seu governor de requisições; os flows de
+    todos os ambientes entram num único relatório, com a comparação entre eles.
+    """
+    temp_dir = unzip_solution(zip_path)
+    flows = Processor.list_desktop_flows(Path(temp_dir))
+    history = TimingHistory.load(args.timings_file)
+    solution_groups = _solution_groups(args, zip_path)
+    logger.info("Analisando %d flows em %d ambientes: %s", len(flows), len(args.environments),
+                ", ".join(name for name, _ in args.environments))
+    stop = threading.Event()
+    # Cada ambiente mede no seu histórico; os tempos são juntados ao terminar.
+    merged_history = TimingHistory()
+    history_lock = threading.Lock()
+
+    def run_environment(env: Tuple[str, str]) -> List[FlowOutcome]:
+        name, url = env
+        env_args = _environment_args(args, name, url)
+        env_history = TimingHistory(history.entries)
+        scheduler = FlowScheduler(
+            flows,
+            history=env_history,
+            deadline=args.deadline,
+            max_workers=args.max_workers,
+            fail_fast=args.fail_fast,
+            started_at=started_at,
+            stop=stop,
+        )
+        try:
+            stages = _online_stages(env_args, Path(temp_dir), Processor(env_args, Path(temp_dir)))
+        except Exception as e:
+            logger.error("[%s] Falha ao preparar a análise: %s", name, e, exc_info=True)
+            return [FlowOutcome(f, STATUS_FAILED, reason=f"falha na autenticação: {e}") for f in flows]
+        env_outcomes = scheduler.run_pipeline(stages)
+        measured = TimingHistory({o.flow: env_history.entries[o.flow]
+                                  for o in env_outcomes if o.status == STATUS_DONE})
+        with history_lock:
+            merged_history.merge(measured)
+        return env_outcomes
+
+    futures = [_in_daemon_thread(run_environment, env, f"bot_cab_env_{i}")
+               for i, env in enumerate(args.environments)]
+    interrupted = False
+    with sigterm_as_interrupt():
+        try:
+            wait(futures)
+        except KeyboardInterrupt:
+            logger.error("Execução interrompida; gravando os resultados parciais dos ambientes.")
+            interrupted = True
+            stop.set()
+            wait(futures, timeout=_STOP_GRACE_SECONDS)
+    for gov in all_governors().values():
+        logger.info("Governor Dataverse: %s", gov.snapshot())
+
+    outcomes: List[FlowOutcome] = []
+    for (name, _), fut in zip(args.environments, futures):
+        if not fut.done():
+            env_outcomes = [FlowOutcome(f, STATUS_SKIPPED, reason="execução interrompida") for f in flows]
+        elif fut.exception() is not None:
+            logger.error("[%s] Falha na análise: %s", name, fut.exception())
+            env_outcomes = [FlowOutcome(f, STATUS_FAILED, reason=str(fut.exception())) for f in flows]
+        else:
+            env_outcomes = fut.result()
+        for o in env_outcomes:
+            o.result["environment"] = name
+        done = sum(1 for o in env_outcomes if o.status == STATUS_DONE)
+        logger.info("[%s] %d de %d flows analisados", name, done, len(flows))
+        outcomes += env_outcomes
+
+    if args.output_markdown:
+        write_report(outcomes, args.output_markdown, solution_groups, profile_top=args.profile_top)
+    if args.timings_file and not interrupted:
+        with history_lock:
+            history.entries.update(merged_history.entries)
+            history.save(args.timings_file)
+
+    return exit_code_for(outcomes, solution_groups)
+
+
+def _incremental_context(args, snapshot: Optional[Snapshot]) -> Dict[str, Any]:
+    """
+    O que, além dos componentes, muda o resultado de um flow: resultados
+    guardados em outro contexto não são reaproveitados.
+    """
+    if args.offline:
+        return {"mode": "offline"}
+    if snapshot is not None:
+        return {"mode": "snapshot", "environment_url": snapshot.header.get("environment_url", ""),
+                "created_at": snapshot.header.get("created_at", ""), "profile_top": args.profile_top}
+    return {"mode": "online", "environment_url": args.environment_url, "profile_top": args.profile_top}
 
-    md_builder = MarkdownResponseBuilder(args.output_markdown)
-    results = [r for (r, _, _) in all_issue_groups]
-    issues = [g for (_, g, _) in all_issue_groups]
-    md_builder.build(results, issues)
 
-    exit_code = 1 if any(has for (_, _, has) in all_issue_groups) else 0
-    logger.info("Análise concluída. exit_code=%d", exit_code)
-    return exit_code
+def _stats_result(future: Optional[Future]) -> Optional[SolutionStats]:
+    if future is None:
+        return None
+    try:
+        return future.result()
+    except Exception as e:
+        logger.error("Falha ao consultar as estatísticas: %s", e, exc_info=True)
+        return None
@@ -0,0 +1,55 @@
+import logging
+import time
+from pathlib import Path
+
+from bot_cab.utils.io import unzip_solution
+from bot_cab.utils.signals import sigterm_as_interrupt
+from bot_cab.processing.processor import Processor
+from bot_cab.processing.pipeline import Stage
+from bot_cab.processing.request_governor import all_governors
+from bot_cab.processing.scheduler import FlowScheduler, STATUS_DONE
+from bot_cab.output.snapshot import SnapshotWriter
+
+logger = logging.getLogger("bot_cab.fetch")
+
+
+def run_fetch(args) -> int:
+    """
+    Subcomando `fetch`: busca sessões, detalhes e action logs de todos os
+    Desktop Flows da solution (como o `analisar`) e grava tudo, junto com o
+    .zip da solution, num snapshot para `analisar --from-snapshot`.
+    Retorna 0 se todos os flows foram buscados, 2 caso contrário.
+    """
+    started_at = time.monotonic()
+    logger.info("Buscando Solution '%s' para snapshot", args.solution_name)
+
+    temp_dir = unzip_solution(args.solution_zip_path)
+    flows = Processor.list_desktop_flows(Path(temp_dir))
+
+    with SnapshotWriter(args.snapshot, args.solution_name, args.environment_url,
+                        args.solution_zip_path) as writer:
+        processor = Processor(args, temp_dir)
+
+        def fetch(flow: str):
+            logger.info("Buscando Desktop Flow: %s", flow)
+            return processor.process(flow)
+
+        def store(result):
+            return writer.add(result), [], False
+
+        scheduler = FlowScheduler(flows, max_workers=args.max_workers, started_at=started_at)
+        with sigterm_as_interrupt():
+            outcomes = scheduler.run_pipeline([
+                Stage("busca", fetch, workers=args.max_workers),
+                Stage("gravacao", store),
+            ])
+        for gov in all_governors().values():
+            logger.info("Governor Dataverse: %s", gov.snapshot())
+
+        failed = [o for o in outcomes if o.status != STATUS_DONE]
+        for o in failed:
+            writer.add_failure(o.flow, o.reason or o.status)
+        writer.close(flows)
+
+    logger.info("Busca concluída: %d de %d flows no snapshot", len(flows) - len(failed), len(flows))
+    return 2 if failed else 0
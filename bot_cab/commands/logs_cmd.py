@@ -1,23 +1,111 @@
 import logging
 import os
+import re
+import sys
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
 
-from bot_cab.utils.auth import authenticate_az_cli, get_token
+from bot_cab.utils.auth import authenticate_az_cli, authenticate_pac_cli, get_token
+from bot_cab.utils.run import run_command
 from bot_cab.output.csv_export import CSVExporter
 from bot_cab.processing.dataverse_client import DataverseClient
+from bot_cab.processing.fetchxml_client import FetchXmlClient
 
 logger = logging.getLogger("bot_cab.logs")
 
+_GUID_RE = re.compile(r"^[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}$")
+
+COMBINED_EXPORT_NAME = "logs_sessoes"
+
+
+def _read_session_file(path: str) -> List[str]:
+    """
+    Lê ids de um arquivo (ou stdin com '-'): um por linha, ignorando
+    linhas em branco e comentários iniciados por '#'.
+    """
+    if path == "-":
+        lines = sys.stdin.read().splitlines()
+    else:
+        lines = Path(path).read_text(encoding="utf-8").splitlines()
+    return [ln.strip() for ln in lines if ln.strip() and not ln.strip().startswith("#")]
+
+
+def _collect_session_ids(args) -> List[str]:
+    """
+    Junta os ids vindos de --flow-session-id, --session-file e --fetchxml-filter,
+    removendo duplicatas (mantendo a ordem) e descartando valores que não são GUID.
+    No --fetchxml-filter os ids vêm da coluna flowsessionid (pelo cabeçalho);
+    lança ValueError se a consulta não a tiver.
+    """
+    candidates: List[str] = list(args.flow_session_ids or [])
+
+    if args.session_file:
+        candidates += _read_session_file(args.session_file)
+
+    if args.fetchxml_filter:
+        authenticate_pac_cli(
+            environment_name=args.environment_name,
+            pac_auth_mode=args.pac_auth_mode,
+            application_id=args.application_id,
+            tenant_id=args.tenant_id
+        )
+        client = FetchXmlClient(env_url=args.environment_url, run_cmd=run_command)
+        raw = client.fetch(template_path=Path(args.fetchxml_filter), replacements={})
+        try:
+            found = client.parse_column(raw, "flowsessionid")
+        except LookupError as e:
+            raise ValueError(f"FetchXML '{args.fetchxml_filter}' sem a coluna flowsessionid ({e})") from e
+        logger.info("FetchXML '%s' retornou %d sessões", args.fetchxml_filter, len(found))
+        candidates += found
+
+    seen = set()
+    session_ids: List[str] = []
+    for sid in candidates:
+        key = sid.lower()
+        if key in seen:
+            continue
+        if not _GUID_RE.match(sid):
+            logger.warning("Ignorando id de sessão inválido: %r", sid)
+            continue
+        seen.add(key)
+        session_ids.append(sid)
+    return session_ids
+
+
+def _download(client: DataverseClient, session_id: str, export_path: str,
+              combined: bool) -> Tuple[int, List[Dict[Any, Any]]]:
+    """
+    Baixa os logs de uma sessão e retorna (nº de ações, linhas p/ o CSV combinado).
+    No modo por sessão já grava o CSV e não devolve as linhas, para que a
+    memória não cresça com o número de sessões.
+    """
+    actions = client.get_action_logs(session_id)
+    if combined:
+        return len(actions), [dict(a, flowSessionId=session_id) for a in actions if isinstance(a, dict)]
+    CSVExporter(actions, export_path, session_id).export_csv()
+    return len(actions), []
+
 
 def run_logs(args) -> int:
     """
     Subcomando `logs`:
-      1) autentica no Azure CLI
-      2) obtém token Dataverse via get_token()
-      3) recupera action-by-action logs via Processor.get_action_logs()
-      4) exporta em CSV com CSVExporter
+      1) reúne os ids de sessão (argumentos, arquivo/stdin ou filtro FetchXML)
+      2) autentica no Azure CLI e obtém token Dataverse via get_token() uma única vez
+      3) baixa os action-by-action logs em paralelo com um único DataverseClient
+      4) exporta um CSV por sessão, ou um único CSV com --combined
+    Falhas de uma sessão não interrompem as demais. Retorna 1 se alguma falhar.
     """
+    try:
+        session_ids = _collect_session_ids(args)
+    except ValueError as e:
+        logger.error("%s", e)
+        return 1
+    if not session_ids:
+        logger.error("Nenhum id de sessão válido informado.")
+        return 1
 
-    logger.info("Iniciando exportação de logs da sessão %s", args.flow_session_id)
+    logger.info("Iniciando exportação de logs de %d sessões", len(session_ids))
 
     try:
         authenticate_az_cli()
@@ -25,24 +113,54 @@ def run_logs(args) -> int:
         logger.error("Falha ao autenticar Azure CLI: %s", e, exc_info=True)
         return 1
 
-    proc = DataverseClient(args.environment_url, args.tenant_id)
-
     try:
         token = get_token(
             environment_url=args.environment_url
         )
         os.environ["AZURE_AUTH_ACCESS_TOKEN"] = token
-        actions = proc.get_action_logs(args.flow_session_id)
     except Exception as e:
-        logger.error("Erro ao obter logs action-by-action: %s", e, exc_info=True)
+        logger.error("Erro ao obter token Dataverse: %s", e, exc_info=True)
         return 1
 
-    try:
-        exporter = CSVExporter(actions, args.export_path, args.flow_session_id)
-        exporter.export_csv()
-    except Exception as e:
-        logger.error("Falha ao exportar CSV: %s", e, exc_info=True)
-        return 1
+    workers = max(1, min(args.max_workers, len(session_ids)))
+    client = DataverseClient(args.environment_url, args.tenant_id, token=token, max_connections=workers)
+
+    combined: Dict[str, List[Dict[Any, Any]]] = {}
+    failures: Dict[str, str] = {}
+    done = 0
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot_cab_logs") as pool:
+        futures = {
+            pool.submit(_download, client, sid, args.export_path, args.combined): sid
+            for sid in session_ids
+        }
+        for fut in as_completed(futures):
+            sid = futures[fut]
+            done += 1
+            try:
+                count, rows = fut.result()
+            except Exception as e:
+                failures[sid] = str(e)
+                logger.error("[%d/%d] Sessão %s falhou: %s", done, len(session_ids), sid, e)
+                logger.debug("Detalhes da falha da sessão %s", sid, exc_info=True)
+                continue
+            logger.info("[%d/%d] Sessão %s: %d ações", done, len(session_ids), sid, count)
+            if args.combined:
+                combined[sid] = rows
 
-    logger.info("Logs exportados com sucesso em '%s_%s.csv'", args.export_path, args.flow_session_id)
+    logger.info("Governor Dataverse: %s", client.governor.snapshot())
+
+    if args.combined:
+        combined_rows = [row for sid in session_ids for row in combined.get(sid, [])]
+        try:
+            CSVExporter(combined_rows, args.export_path, COMBINED_EXPORT_NAME).export_csv()
+        except Exception as e:
+            logger.error("Falha ao exportar CSV combinado: %s", e, exc_info=True)
+            return 1
+
+    ok = len(session_ids) - len(failures)
+    logger.info("Exportação concluída: %d/%d sessões exportadas em '%s'", ok, len(session_ids), args.export_path)
+    if failures:
+        for sid, err in failures.items():
+            logger.warning("Sessão %s não exportada: %s", sid, err)
+        return 1
     return 0
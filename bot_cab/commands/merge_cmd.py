@@ -0,0 +1,72 @@
+import logging
+from typing import Dict, List
+
+from bot_cab.commands.report import exit_code_for, write_report
+from bot_cab.output.partial_result import outcome_from_dict, read_partial, solution_groups_from, stats_from
+from bot_cab.processing.scheduler import FlowOutcome, TimingHistory, STATUS_DONE, STATUS_SKIPPED
+
+logger = logging.getLogger("bot_cab.merge")
+
+
+def run_merge(args) -> int:
+    """
+    Subcomando `merge`:
+      1) lê os resultados parciais gravados por `analisar --shard i/N`
+      2) confere se todos os shards 1..N estão presentes (flows de shards
+         ausentes entram no relatório como não analisados)
+      3) gera o relatório Markdown final e, opcionalmente, atualiza o
+         histórico de tempos (--timings-file) para balancear a próxima execução
+    Retorna o mesmo exit code de `analisar` sem shards.
+    """
+    partials = [read_partial(p) for p in args.partials]
+
+    counts = {p["shard"][1] for p in partials}
+    if len(counts) != 1:
+        logger.error("Parciais de particionamentos diferentes (N=%s).", sorted(counts))
+        return 2
+    total = counts.pop()
+    seen = {p["shard"][0] for p in partials}
+    missing = sorted(set(range(1, total + 1)) - seen)
+    if missing:
+        logger.warning("Shards ausentes no merge: %s", ", ".join(f"{i}/{total}" for i in missing))
+
+    solutions = {p.get("solution_name") for p in partials}
+    if len(solutions) > 1:
+        logger.warning("Parciais de solutions diferentes: %s", sorted(solutions))
+
+    all_flows: List[str] = []
+    for p in partials:
+        all_flows += [f for f in p.get("all_flows", []) if f not in all_flows]
+
+    merged: Dict[str, FlowOutcome] = {}
+    for p in partials:
+        for entry in p.get("flows", []):
+            _, outcome = outcome_from_dict(entry)
+            if outcome.flow in merged:
+                logger.warning("Flow '%s' presente em mais de um shard; mantendo o primeiro.", outcome.flow)
+                continue
+            merged[outcome.flow] = outcome
+            if outcome.flow not in all_flows:
+                all_flows.append(outcome.flow)
+
+    outcomes = [
+        merged.get(f) or FlowOutcome(f, STATUS_SKIPPED, reason="shard ausente no merge")
+        for f in all_flows
+    ]
+    logger.info("Merge de %d parciais: %d flows", len(partials), len(outcomes))
+
+    solution_groups = next(
+        (g for g in (solution_groups_from(p) for p in partials) if g is not None), None)
+
+    stats = next((s for s in (stats_from(p) for p in partials) if s is not None), None)
+
+    write_report(outcomes, args.output_markdown, solution_groups, stats, args.profile_top)
+
+    if args.timings_file:
+        history = TimingHistory.load(args.timings_file)
+        for o in outcomes:
+            if o.status == STATUS_DONE:
+                history.record(o.flow, o.elapsed, len(o.result.get("actions") or []))
+        history.save(args.timings_file)
+
+    return exit_code_for(outcomes, solution_groups)
@@ -0,0 +1,63 @@
+"""
+Etapa final comum a `analisar` e `merge`: relatório Markdown e exit code.
+"""
+
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from bot_cab.output.md_builder import MarkdownResponseBuilder
+from bot_cab.processing.rules_engine import RULE_ANALYSIS_FAILED, IssueGroup
+from bot_cab.processing.scheduler import FlowOutcome, STATUS_DONE, STATUS_FAILED
+from bot_cab.processing.session_stats import SolutionStats
+
+logger = logging.getLogger("bot_cab.report")
+
+
+def outcome_entry(outcome: FlowOutcome) -> Tuple[Dict[str, Any], list, bool]:
+    """
+    Converte um FlowOutcome no trio (result, groups, has_issues) usado pelo relatório.
+    Flows pulados ou com falha entram no relatório marcados como tal.
+    """
+    if outcome.status == STATUS_DONE:
+        return outcome.result, outcome.groups, outcome.has_issues
+    result = {
+        "desktop_flow": outcome.flow,
+        "session_id": "N/A",
+        "start_time": "N/A",
+        "actions": [],
+        "status": outcome.status,
+        "status_reason": outcome.reason,
+        "environment": outcome.result.get("environment", ""),
+    }
+    return result, [], True
+
+
+def write_report(outcomes: List[FlowOutcome],
+                 output_markdown: str,
+                 solution_groups: Optional[List[IssueGroup]] = None,
+                 stats: Optional[SolutionStats] = None,
+                 profile_top: int = 10) -> None:
+    all_issue_groups = [outcome_entry(o) for o in outcomes]
+    md_builder = MarkdownResponseBuilder(output_markdown, profile_top)
+    results = [r for (r, _, _) in all_issue_groups]
+    issues = [g for (_, g, _) in all_issue_groups]
+    md_builder.build(results, issues, solution_groups, stats)
+
+
+def exit_code_for(outcomes: List[FlowOutcome],
+                  solution_groups: Optional[List[IssueGroup]] = None) -> int:
+    """
+    0 se nenhuma issue, 1 se houver issues (nos flows ou na análise estática
+    da solution) ou flows não analisados, 2 se a análise de algum flow ou a
+    análise estática da solution falhou (mesma semântica do run_analysis.sh).
+    """
+    solution_failed = any(i.rule == RULE_ANALYSIS_FAILED for g in solution_groups or [] for i in g)
+    if solution_failed or any(o.status == STATUS_FAILED for o in outcomes):
+        exit_code = 2
+    elif any(outcome_entry(o)[2] for o in outcomes) or any(solution_groups or []):
+        exit_code = 1
+    else:
+        exit_code = 0
+    skipped = sum(1 for o in outcomes if o.status not in (STATUS_DONE, STATUS_FAILED))
+    logger.info("Análise concluída. exit_code=%d (%d flows, %d não analisados)", exit_code, len(outcomes), skipped)
+    return exit_code
@@ -1,9 +1,28 @@
 
 """
-Constantes de arquivos FetchXML usados pelo Bot_CAB.
+Constantes usadas pelo Bot_CAB (arquivos FetchXML e limites de execução).
 """
 
 from pathlib import Path
 
 FETCH_LAST_RUN_FILE: Path = Path("fetch-last-run.xml")
 FETCH_LOGS_FILE:     Path = Path("fetch-logs.xml")
+
+# Execução de comandos externos (pac / az)
+COMMAND_TIMEOUT_SECONDS: float = 600.0
+MAX_CONCURRENT_COMMANDS: int   = 4
+
+# Downloads REST simultâneos (subcomando `logs`)
+MAX_CONCURRENT_DOWNLOADS: int  = 8
+
+# Governor de requisições ao Dataverse (limites de proteção do serviço)
+GOVERNOR_INITIAL_CONCURRENCY: int      = 4
+GOVERNOR_MAX_CONCURRENCY: int          = 16
+GOVERNOR_MAX_RETRIES: int              = 6
+GOVERNOR_LATENCY_TARGET_SECONDS: float = 20.0
+
+# Pipeline do `analisar` (busca -> regras -> exportação): itens em espera entre estágios
+PIPELINE_QUEUE_SIZE: int = 2
+
+# Estatísticas agregadas (`analisar --stats`): janela padrão das sessões, em dias
+STATS_WINDOW_DAYS: int = 30
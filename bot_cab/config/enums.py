@@ -1,5 +1,5 @@
 """
-Enumera categorias de issues detectadas pelo Bot_CAB.
+Enumera categorias de issues detectadas pelo Bot_CAB e status de sessões de Flow.
 """
 
 from enum import Enum
@@ -13,7 +13,51 @@ class IssueCategory(str, Enum):
     SOLUTION   = "Solution"
     SECURITY   = "Security"
     VALIDATION = "Validation"
+    CLOUD_FLOW = "CloudFlow"
 
     @classmethod
     def list(cls) -> List[str]:
         return [member.value for member in cls]
+
+class FlowSessionStatus(int, Enum):
+    """
+    Valores de `flowsession.statuscode` no Dataverse.
+    """
+    UNKNOWN      = -1
+    NOTSPECIFIED = 0
+    PAUSED       = 1
+    RUNNING      = 2
+    WAITING      = 3
+    SUCCEEDED    = 4
+    SKIPPED      = 5
+    SUSPENDED    = 6
+    CANCELLED    = 7
+    FAILED       = 8
+    FAULTED      = 9
+    TIMEDOUT     = 10
+    ABORTED      = 11
+    IGNORED      = 12
+    DELETED      = 13
+    TERMINATED   = 14
+
+    @classmethod
+    def parse(cls, value: str) -> "FlowSessionStatus":
+        """
+        Aceita o código numérico ou o rótulo (ex.: '4', 'Succeeded', 'Timed Out').
+        """
+        text = str(value or "").strip()
+        if not text:
+            return cls.UNKNOWN
+        if text.lstrip("-").isdigit():
+            try:
+                return cls(int(text))
+            except ValueError:
+                return cls.UNKNOWN
+        key = "".join(ch for ch in text.upper() if ch.isalpha())
+        return cls.__members__.get(key, cls.UNKNOWN)
+
+    @property
+    def is_failure(self) -> bool:
+        return self in (FlowSessionStatus.FAILED, FlowSessionStatus.FAULTED,
+                        FlowSessionStatus.TIMEDOUT, FlowSessionStatus.ABORTED,
+                        FlowSessionStatus.CANCELLED, FlowSessionStatus.TERMINATED)
@@ -1,14 +1,25 @@
 """
 Entry-point para o Bot_CAB CLI.
-Define subcomandos 'analisar' e 'logs'.
+Define subcomandos 'analisar', 'logs', 'merge' e 'fetch'.
+
+Os módulos dos subcomandos (e com eles azure.identity, requests e dateutil)
+só são importados depois que o argparse validou os argumentos, para que
+`--help` e erros de uso respondam rápido.
 """
 
 import sys
 import logging
+from importlib import import_module
 
 from bot_cab.cli.input_handler import CLIInputHandler
-from bot_cab.commands.analyze_cmd import run_analysis
-from bot_cab.commands.logs_cmd import run_logs
+
+# subcomando -> (módulo, função)
+COMMANDS = {
+    "analisar": ("bot_cab.commands.analyze_cmd", "run_analysis"),
+    "logs":     ("bot_cab.commands.logs_cmd",    "run_logs"),
+    "merge":    ("bot_cab.commands.merge_cmd",   "run_merge"),
+    "fetch":    ("bot_cab.commands.fetch_cmd",   "run_fetch"),
+}
 
 def setup_logging(verbose: bool) -> None:
     level = logging.DEBUG if verbose else logging.INFO
@@ -23,16 +34,23 @@ def main() -> int:
 
     logger.debug("Parâmetros iniciais: %s", args)
 
+    if args.command not in COMMANDS:
+        handler.parser.error(f"Subcomando desconhecido: {args.command}")
+
     try:
-        if args.command == "analisar":
-            return run_analysis(args)
-        elif args.command == "logs":
-            return run_logs(args)
-        else:
-            handler.parser.error(f"Subcomando desconhecido: {args.command}")
+        module_name, func_name = COMMANDS[args.command]
+        command = getattr(import_module(module_name), func_name)
+        return command(args)
     except Exception as e:
         logger.error("Erro fatal: %s", e, exc_info=True)
         return 2
+    finally:
+        if args.metrics_dir:
+            from bot_cab.utils.metrics import REGISTRY
+            try:
+                REGISTRY.write(args.metrics_dir)
+            except OSError as e:
+                logger.warning("Falha ao gravar métricas em %s: %s", args.metrics_dir, e)
 
 if __name__ == "__main__":
     sys.exit(main())
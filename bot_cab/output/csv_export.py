@@ -5,17 +5,19 @@ Exporta logs de ações para CSV (robusto contra keys variáveis entre linhas).
 import csv
 import json
 import logging
-import re
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import List, Dict, Any, Union
 
+from bot_cab.utils import metrics
+from bot_cab.utils.io import sanitize_filename
+
 logger = logging.getLogger(__name__)
 
-def _sanitize_filename(name: str) -> str:
-    safe = re.sub(r"[^\w\-\. ]+", "_", name)
-    safe = re.sub(r"\s+", "_", safe).strip("_")
-    return safe or "export"
+_EXPORT_FILES = metrics.counter(
+    "bot_cab_export_files", "Arquivos gravados pelos exportadores.", ("format",))
+_EXPORT_ROWS = metrics.counter(
+    "bot_cab_export_rows", "Linhas gravadas pelos exportadores.", ("format",))
 
 @dataclass
 class CSVExporter:
@@ -30,7 +32,7 @@ class CSVExporter:
 
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
-        safe = _sanitize_filename(self.desktop_flow)
+        safe = sanitize_filename(self.desktop_flow)
         self._filename = self.output_dir / f"{safe}.csv"
 
     def _normalize_row_keys(self, row: Dict[Any, Any]) -> Dict[str, Any]:
@@ -75,12 +77,16 @@ class CSVExporter:
             with self._filename.open("w", newline="", encoding="utf-8") as f:
                 w = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
                 w.writeheader()
+                written = 0
                 for idx, row in enumerate(normalized_rows):
                     safe_row = {k: row.get(k, "") for k in fieldnames}
                     try:
                         w.writerow(safe_row)
+                        written += 1
                     except Exception as e:
                         logger.error("Falha ao gravar linha %d no CSV: %s — linha: %r", idx, e, row)
+            _EXPORT_FILES.inc(format="csv")
+            _EXPORT_ROWS.inc(written, format="csv")
             logger.info("CSV salvo em %s", self._filename)
         except Exception as e:
             logger.error("Falha ao gravar CSV: %s", e)
@@ -0,0 +1,116 @@
+"""
+Estado da validação incremental (`analisar --incremental-state`), em JSON.
+
+Guarda o manifesto de componentes da última execução e, por Desktop Flow
+analisado com sucesso, a impressão digital dos componentes de que ele depende
+(no modo online, também da última sessão do flow) e o resultado (no mesmo
+formato do resultado parcial). Na execução seguinte, flows com a mesma
+impressão digital reaproveitam o resultado, marcado como tal no relatório;
+o estado é descartado se o contexto (modo, ambiente, snapshot) ou a versão
+das regras mudar.
+"""
+
+import json
+import logging
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from bot_cab.output.partial_result import outcome_from_dict, outcome_to_dict
+from bot_cab.processing.components import Component, diff_manifest
+from bot_cab.processing.scheduler import FlowOutcome, STATUS_DONE
+
+logger = logging.getLogger(__name__)
+
+STATE_FORMAT = "bot_cab.incremental"
+# Mude ao alterar as regras da RulesEngine: invalida os resultados guardados.
+STATE_VERSION = 1
+
+
+class IncrementalState:
+    """
+    Uso:
+        state = IncrementalState.load(path, context)
+        state.log_diff(components)
+        outcome = state.reuse(flow, fingerprint)     # None se mudou
+        state.record(flow, fingerprint, outcome)     # flows reanalisados
+        state.save(path, components)
+    """
+
+    def __init__(self,
+                 context: Dict[str, Any],
+                 manifest: Optional[Dict[str, str]] = None,
+                 flows: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.context = context
+        self.manifest: Dict[str, str] = dict(manifest or {})
+        self.flows: Dict[str, Dict[str, Any]] = dict(flows or {})
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]], context: Dict[str, Any]) -> "IncrementalState":
+        if not path or not Path(path).is_file():
+            return cls(context)
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (ValueError, OSError) as e:
+            logger.warning("Estado incremental inválido em %s: %s", path, e)
+            return cls(context)
+        if data.get("format") != STATE_FORMAT or data.get("version") != STATE_VERSION:
+            logger.info("Estado incremental de outra versão; revalidando tudo.")
+            return cls(context)
+        if data.get("context") != context:
+            logger.info("Estado incremental de outro contexto (%s); revalidando tudo.", data.get("context"))
+            return cls(context)
+        return cls(context, data.get("manifest"), data.get("flows"))
+
+    def log_diff(self, components: Dict[str, Component]) -> Dict[str, List[str]]:
+        diff = diff_manifest(self.manifest, components)
+        if self.manifest:
+            logger.info("Componentes desde a execução anterior: %d novos, %d alterados, %d removidos",
+                        len(diff["added"]), len(diff["changed"]), len(diff["removed"]))
+            for kind in ("added", "changed", "removed"):
+                for key in diff[kind]:
+                    logger.debug("Componente %s: %s", kind, key)
+        return diff
+
+    def reuse(self, flow: str, fingerprint: str) -> Optional[FlowOutcome]:
+        """
+        Resultado anterior do flow, se seus componentes não mudaram.
+        O result vem marcado com `carried_over` (data da análise original).
+        """
+        entry = self.flows.get(flow)
+        if not entry or entry.get("fingerprint") != fingerprint:
+            return None
+        _, outcome = outcome_from_dict(entry["outcome"])
+        outcome.result["carried_over"] = entry.get("analyzed_at", "")
+        return outcome
+
+    def record(self, flow: str, fingerprint: str, outcome: FlowOutcome) -> None:
+        """
+        Guarda o resultado de um flow reanalisado (só os concluídos: falhas e
+        flows pulados são refeitos na próxima execução).
+        """
+        if outcome.status != STATUS_DONE:
+            self.flows.pop(flow, None)
+            return
+        self.flows[flow] = {
+            "fingerprint": fingerprint,
+            "analyzed_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "outcome": outcome_to_dict(outcome, 0),
+        }
+
+    def save(self, path: Union[str, Path], components: Dict[str, Component], flows: List[str]) -> None:
+        """
+        Grava o manifesto atual; resultados de flows que saíram da solution são descartados.
+        """
+        keep = set(flows)
+        payload = {
+            "format": STATE_FORMAT,
+            "version": STATE_VERSION,
+            "context": self.context,
+            "manifest": {k: c.digest for k, c in components.items()},
+            "flows": {f: e for f, e in self.flows.items() if f in keep},
+        }
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        logger.debug("Estado incremental salvo em %s (%d flows)", p, len(payload["flows"]))
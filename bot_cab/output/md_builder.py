@@ -4,18 +4,31 @@ Gera e salva relatório Markdown (versão simples e direta).
 
 import logging
 from pathlib import Path
-from typing import List, Union, Dict, Any
+from typing import List, Optional, Union, Dict, Any
 from bot_cab.processing.rules_engine import IssueGroup
+from bot_cab.processing.session_details import SessionDetails
+from bot_cab.processing.profiler import ExecutionProfile
+from bot_cab.processing.desktop_scripts import DesktopFlowIndex
+from bot_cab.processing.session_stats import SolutionStats
+from bot_cab.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+_EXPORT_FILES = metrics.counter(
+    "bot_cab_export_files", "Arquivos gravados pelos exportadores.", ("format",))
+_REPORT_BYTES = metrics.counter(
+    "bot_cab_report_bytes", "Bytes de relatório Markdown gravados.")
+
 class MarkdownResponseBuilder:
-    def __init__(self, output_path: str) -> None:
+    def __init__(self, output_path: str, profile_top: int = 10) -> None:
         self.output_path = Path(output_path)
+        self.profile_top = profile_top
 
-    def build(self, results: List[Union[dict, str]], issues: List[List[IssueGroup]]) -> None:
+    def build(self, results: List[Union[dict, str]], issues: List[List[IssueGroup]],
+              solution_groups: Optional[List[IssueGroup]] = None,
+              stats: Optional[SolutionStats] = None) -> None:
         normalized = self._normalize_results(results)
-        md = self.render_markdown(normalized, issues)
+        md = self.render_markdown(normalized, issues, solution_groups, stats)
         self.save(md)
 
     def _normalize_results(self, results: List[Union[dict, str]]) -> List[Dict[str, Any]]:
@@ -32,48 +45,205 @@ class MarkdownResponseBuilder:
                 })
         return out
 
-    def render_markdown(self, results: List[Dict[str, Any]], issues: List[List[IssueGroup]]) -> str:
+    def render_markdown(self, results: List[Dict[str, Any]], issues: List[List[IssueGroup]],
+                        solution_groups: Optional[List[IssueGroup]] = None,
+                        stats: Optional[SolutionStats] = None) -> str:
         lines: List[str] = ["# Relatório Bot_CAB\n"]
 
+        not_analyzed = [r for r in results if r.get("status") in ("skipped", "failed")]
+        if not_analyzed:
+            lines += [
+                f"> ⚠️ **Relatório parcial:** {len(not_analyzed)} de {len(results)} flows não foram analisados.",
+                "",
+            ]
+        carried = [r for r in results if r.get("carried_over")]
+        if carried:
+            lines += [
+                f"> ♻️ **Validação incremental:** {len(carried)} de {len(results)} flows sem alterações; "
+                "resultados reaproveitados da execução anterior (marcados com ♻️).",
+                "",
+            ]
+
+        if solution_groups is not None:
+            lines.append("## ☁️ Solution (análise estática)")
+            if any(solution_groups):
+                lines += self._render_groups([g for g in solution_groups if g], level=3)
+            else:
+                lines.append("### ✅ Nenhuma Issue Encontrada\n")
+
+        if stats is not None:
+            lines += self._render_stats(stats)
+
+        if any(r.get("environment") for r in results):
+            lines += self._render_comparison(results, issues)
+
         for result, issue in zip(results, issues):
             flow = result.get("desktop_flow", "N/A")
+            if result.get("environment"):
+                flow = f"{flow} ({result['environment']})"
+            status = result.get("status")
+            if status == "skipped":
+                lines += [f"## Flow: {flow}", f"### ⏭️ Não analisado: {result.get('status_reason', '')}", ""]
+                continue
+            if status == "failed":
+                lines += [f"## Flow: {flow}", f"### ❌ Falha na análise: {result.get('status_reason', '')}", ""]
+                continue
             sess = result.get("session_id", "N/A")
             ts = result.get("start_time", "N/A")
             actions = result.get("actions", []) or []
 
-            lines += [f"## Flow: {flow}", f"- Session ID: {sess}", f"- Início: {ts}", ""]
-            lines += ["### Actions", "|Name|Status|Início|Fim|", "|---|---|---|---|"]
-            for a in actions:
-                if isinstance(a, dict):
-                    lines.append(
-                        f"|{a.get('systemActionName','')}|{a.get('status','')}|{a.get('startTime','')}|{a.get('endTime','')}|"
-                    )
-                else:
-                    lines.append(f"|{str(a)}||||")
+            carried_over = result.get("carried_over")
+            lines += [f"## Flow: {flow}", f"- Session ID: {sess}", f"- Início: {ts}"]
+            if carried_over:
+                lines.append(f"- ♻️ Reaproveitado da análise de {carried_over} (componentes sem alteração)")
+            details = result.get("details")
+            if isinstance(details, SessionDetails):
+                lines.append(f"- Status: {details.status.name.title()}")
+                if details.error_code:
+                    lines.append(f"- Erro: {details.error_code} — {details.error_message}")
             lines.append("")
+            script = result.get("script")
+            if isinstance(script, DesktopFlowIndex):
+                lines += self._render_script(script)
+            else:
+                lines += ["### Actions", "|Name|Status|Início|Fim|", "|---|---|---|---|"]
+                for a in actions:
+                    if isinstance(a, dict):
+                        lines.append(
+                            f"|{a.get('systemActionName','')}|{a.get('status','')}|{a.get('startTime','')}|{a.get('endTime','')}|"
+                        )
+                    else:
+                        lines.append(f"|{str(a)}||||")
+                lines.append("")
+
+            profile = result.get("profile")
+            if isinstance(profile, ExecutionProfile) and profile.action_count:
+                lines += self._render_profile(profile, self.profile_top)
 
             if issue:
-                lines.append("### ⚠️ Issues")
-                for grp in issue:
-                    if isinstance(grp, IssueGroup):
-                        category = grp.category
-                        messages = grp.get_messages()
-                    else:
-                        category = str(grp)
-                        messages = []
-                    lines.append(f"#### {category}")
-                    if messages:
-                        for msg in messages:
-                            lines.append(f"- {msg}")
-                    else:
-                        lines.append("- (sem mensagens)")
-                    lines.append("")
+                lines.append("### ⚠️ Issues (♻️ reaproveitadas)" if carried_over else "### ⚠️ Issues")
+                lines += self._render_groups(issue)
             else:
                 lines.append("### ✅ Nenhuma Issue Encontrada\n")
 
         return "\n".join(lines)
 
+    def _render_script(self, script: DesktopFlowIndex) -> List[str]:
+        lines = [
+            "### 🧩 Script (análise offline)",
+            f"- {len(script.functions)} subfluxos, {script.action_count} ações, {script.lines} linhas",
+            "",
+            "|Subfluxo|Linha|Ações|Chama|",
+            "|---|---|---|---|",
+        ]
+        for name, fn in script.functions.items():
+            calls = ", ".join(dict.fromkeys(fn.get("calls", [])))
+            lines.append(f"|{name}|{fn.get('line', '')}|{fn.get('actions', 0)}|{calls}|")
+        lines.append("")
+        return lines
+
+    def _render_comparison(self, results: List[Dict[str, Any]], issues: List[List[IssueGroup]]) -> List[str]:
+        """
+        Uma linha por flow e uma coluna por ambiente; 'Divergência' marca os
+        flows cujas issues não são as mesmas em todos os ambientes analisados.
+        """
+        envs: List[str] = []
+        cells: Dict[str, Dict[str, str]] = {}
+        keys: Dict[str, Dict[str, set]] = {}
+        for result, issue in zip(results, issues):
+            env = result.get("environment", "")
+            flow = result.get("desktop_flow", "N/A")
+            if env not in envs:
+                envs.append(env)
+            status = result.get("status")
+            if status == "skipped":
+                cell = "⏭️ não analisado"
+            elif status == "failed":
+                cell = "❌ falha"
+            else:
+                details = result.get("details")
+                run = details.status.name.title() if isinstance(details, SessionDetails) else "?"
+                count = sum(len(g) for g in issue if isinstance(g, IssueGroup))
+                cell = f"{'⚠️' if issue else '✅'} {run} · {count} issues"
+                keys.setdefault(flow, {})[env] = {e.key for g in issue if isinstance(g, IssueGroup) for e in g}
+            cells.setdefault(flow, {})[env] = cell
+
+        lines = [
+            "## 🔀 Comparação entre ambientes",
+            "",
+            "|Flow|" + "|".join(envs) + "|Divergência|",
+            "|---|" + "---|" * (len(envs) + 1),
+        ]
+        for flow, row in cells.items():
+            analyzed = list(keys.get(flow, {}).values())
+            diverges = len(analyzed) > 1 and any(k != analyzed[0] for k in analyzed[1:])
+            lines.append(f"|{flow}|" + "|".join(row.get(env, "") for env in envs) +
+                         f"|{'≠' if diverges else ''}|")
+        lines.append("")
+        return lines
+
+    def _render_stats(self, stats: SolutionStats) -> List[str]:
+        lines = [f"## 📊 Estatísticas (Dataverse, últimos {stats.days} dias)", ""]
+        for table in stats.tables:
+            lines.append(f"### {table.title}")
+            if table.error:
+                lines += [f"- ⚠️ Indisponível: {table.error}", ""]
+                continue
+            if not table.rows:
+                lines += ["- (sem registros)", ""]
+                continue
+            lines.append("|" + "|".join(label for _, label in table.columns) + "|")
+            lines.append("|" + "---|" * len(table.columns))
+            for row in table.rows:
+                lines.append("|" + "|".join(row.get(alias, "") for alias, _ in table.columns) + "|")
+            lines.append("")
+        return lines
+
+    def _render_groups(self, groups: List[IssueGroup], level: int = 4) -> List[str]:
+        lines: List[str] = []
+        for grp in groups:
+            if isinstance(grp, IssueGroup):
+                category = grp.category
+                entries = list(grp)
+            else:
+                category = str(grp)
+                entries = []
+            lines.append(f"{'#' * level} {category}")
+            if entries:
+                for entry in entries:
+                    lines.append(f"- {entry.display()}")
+                    if entry.samples:
+                        lines.append(f"  - ex.: {'; '.join(entry.samples)}")
+            else:
+                lines.append("- (sem mensagens)")
+            lines.append("")
+        return lines
+
+    def _render_profile(self, profile: ExecutionProfile, top: int = 10) -> List[str]:
+        lines = [
+            "### ⏱️ Perfil de Execução",
+            f"- Duração: {profile.total_seconds:.3f}s ({profile.action_count} ações)",
+            "",
+            "|SubFluxo|Chamadas|Self (s)|Total (s)|",
+            "|---|---|---|---|",
+        ]
+        subflows = sorted(profile.subflows.items(), key=lambda kv: -kv[1]["total"])[:top]
+        for name, st in subflows:
+            lines.append(f"|{name}|{st['calls']}|{st['self']:.3f}|{st['total']:.3f}|")
+        lines += ["", "|Tipo de Ação|Qtde|Total (s)|", "|---|---|---|"]
+        kinds = sorted(profile.action_types.items(), key=lambda kv: -kv[1]["total"])[:top]
+        for name, st in kinds:
+            lines.append(f"|{name}|{st['count']}|{st['total']:.3f}|")
+        if profile.slowest:
+            lines += ["", "|Ação mais lenta|SubFluxo|Início|Duração (s)|", "|---|---|---|---|"]
+            for a in profile.slowest:
+                lines.append(f"|{a['action']}|{a['function']}|{a['start']}|{a['seconds']:.3f}|")
+        lines.append("")
+        return lines
+
     def save(self, content: str) -> None:
         self.output_path.parent.mkdir(parents=True, exist_ok=True)
         self.output_path.write_text(content, encoding="utf-8")
+        _EXPORT_FILES.inc(format="markdown")
+        _REPORT_BYTES.inc(len(content.encode("utf-8")))
         logger.info("Relatório salvo em %s", self.output_path)
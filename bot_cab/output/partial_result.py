@@ -0,0 +1,134 @@
+"""
+Resultado parcial de um shard do `analisar` (JSON compacto e versionado).
+
+Guarda, por flow: status no scheduler, sessão analisada (sem as linhas de
+flowlog), actions resumidas (apenas as colunas do relatório), perfil de
+execução, grupos de issues e tempo gasto. O subcomando `merge` junta os
+parciais de todos os shards no relatório final.
+"""
+
+import json
+import logging
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from bot_cab.processing.desktop_scripts import DesktopFlowIndex
+from bot_cab.processing.profiler import ExecutionProfile
+from bot_cab.processing.rules_engine import IssueGroup
+from bot_cab.processing.scheduler import FlowOutcome, STATUS_DONE
+from bot_cab.processing.session_details import SessionDetails
+from bot_cab.processing.session_stats import SolutionStats
+
+logger = logging.getLogger(__name__)
+
+PARTIAL_FORMAT = "bot_cab.partial"
+PARTIAL_VERSION = 3
+
+# Colunas das actions usadas pelo relatório Markdown.
+_ACTION_FIELDS = ("systemActionName", "status", "startTime", "endTime")
+
+
+def _result_to_dict(result: Dict[str, Any]) -> Dict[str, Any]:
+    details = result.get("details")
+    profile = result.get("profile")
+    script = result.get("script")
+    return {
+        "desktop_flow": result.get("desktop_flow", ""),
+        "session_id": result.get("session_id", "N/A"),
+        "start_time": result.get("start_time", "N/A"),
+        "details": details.to_dict(include_logs=False) if isinstance(details, SessionDetails) else None,
+        "actions": [[a.get(k, "") for k in _ACTION_FIELDS] for a in result.get("actions") or []
+                    if isinstance(a, dict)],
+        "profile": profile.to_dict() if isinstance(profile, ExecutionProfile) else None,
+        "script": script.to_dict() if isinstance(script, DesktopFlowIndex) else None,
+        "carried_over": result.get("carried_over", ""),
+    }
+
+
+def _result_from_dict(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "desktop_flow": data.get("desktop_flow", ""),
+        "session_id": data.get("session_id", "N/A"),
+        "start_time": data.get("start_time", "N/A"),
+        "details": SessionDetails.from_dict(data["details"]) if data.get("details") else None,
+        "actions": [dict(zip(_ACTION_FIELDS, row)) for row in data.get("actions", [])],
+        "profile": ExecutionProfile.from_dict(data["profile"]) if data.get("profile") else None,
+        "script": DesktopFlowIndex.from_dict(data["script"]) if data.get("script") else None,
+        "carried_over": data.get("carried_over", ""),
+    }
+
+
+def outcome_to_dict(outcome: FlowOutcome, index: int) -> Dict[str, Any]:
+    return {
+        "flow": outcome.flow,
+        "index": index,
+        "status": outcome.status,
+        "reason": outcome.reason,
+        "elapsed": round(outcome.elapsed, 3),
+        "has_issues": outcome.has_issues,
+        "result": _result_to_dict(outcome.result) if outcome.status == STATUS_DONE else None,
+        "groups": [g.to_dict() for g in outcome.groups],
+    }
+
+
+def outcome_from_dict(data: Dict[str, Any]) -> Tuple[int, FlowOutcome]:
+    outcome = FlowOutcome(
+        flow=data["flow"],
+        status=data["status"],
+        result=_result_from_dict(data["result"]) if data.get("result") else {},
+        groups=[IssueGroup.from_dict(g) for g in data.get("groups", [])],
+        has_issues=data.get("has_issues", False),
+        elapsed=data.get("elapsed", 0.0),
+        reason=data.get("reason", ""),
+    )
+    return data.get("index", 0), outcome
+
+
+def write_partial(path: Union[str, Path],
+                  solution_name: str,
+                  shard: Tuple[int, int],
+                  all_flows: List[str],
+                  outcomes: List[FlowOutcome],
+                  solution_groups: Optional[List[IssueGroup]] = None,
+                  stats: Optional[SolutionStats] = None) -> Path:
+    """
+    Grava o parcial do shard. `all_flows` é a lista completa da solution
+    (para o merge reconstruir a ordem original e detectar flows faltando).
+    `solution_groups` (análise estática da solution) e `stats` vão só no
+    shard que os calculou.
+    """
+    position = {f: i for i, f in enumerate(all_flows)}
+    payload = {
+        "format": PARTIAL_FORMAT,
+        "version": PARTIAL_VERSION,
+        "solution_name": solution_name,
+        "shard": list(shard),
+        "all_flows": all_flows,
+        "flows": [outcome_to_dict(o, position.get(o.flow, -1)) for o in outcomes],
+        "solution_groups": None if solution_groups is None else [g.to_dict() for g in solution_groups],
+        "stats": None if stats is None else stats.to_dict(),
+    }
+    p = Path(path)
+    p.parent.mkdir(parents=True, exist_ok=True)
+    p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+    logger.info("Resultado parcial do shard %d/%d salvo em %s", shard[0], shard[1], p)
+    return p
+
+
+def solution_groups_from(data: Dict[str, Any]) -> Optional[List[IssueGroup]]:
+    groups = data.get("solution_groups")
+    return None if groups is None else [IssueGroup.from_dict(g) for g in groups]
+
+
+def stats_from(data: Dict[str, Any]) -> Optional[SolutionStats]:
+    stats = data.get("stats")
+    return None if stats is None else SolutionStats.from_dict(stats)
+
+
+def read_partial(path: Union[str, Path]) -> Dict[str, Any]:
+    data = json.loads(Path(path).read_text(encoding="utf-8"))
+    if data.get("format") != PARTIAL_FORMAT:
+        raise ValueError(f"{path} não é um resultado parcial do Bot_CAB")
+    if data.get("version") != PARTIAL_VERSION:
+        raise ValueError(f"{path}: versão {data.get('version')} não suportada (esperada {PARTIAL_VERSION})")
+    return data
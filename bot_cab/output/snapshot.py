@@ -0,0 +1,209 @@
+"""
+Snapshot de uma busca (`fetch`) para reanálise offline (`analisar --from-snapshot`).
+
+Arquivo único, versionado:
+    MAGIC | solution .zip | bloco zlib por flow ... | índice JSON | rodapé
+O rodapé (offset do índice + MAGIC) fica no fim, então o arquivo é gravado
+em streaming, um flow por vez. A leitura usa mmap e só descomprime o flow
+pedido, sem carregar o snapshot inteiro em memória.
+"""
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Union
+
+from bot_cab.processing.session_details import SessionDetails
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FORMAT = "bot_cab.snapshot"
+SNAPSHOT_VERSION = 1
+
+_MAGIC = b"BOTCABSN"
+_FOOTER = struct.Struct("<Q8s")
+_COMPRESS_LEVEL = 6
+
+
+class SnapshotWriter:
+    """
+    Uso:
+        with SnapshotWriter(path, "MinhaSolution", env_url, zip_path) as w:
+            w.add(processor.process(flow))      # seguro entre threads
+            w.add_failure(flow, "motivo")
+    O arquivo é gravado em <path>.tmp e renomeado no close().
+    """
+
+    def __init__(self,
+                 path: Union[str, Path],
+                 solution_name: str,
+                 environment_url: str,
+                 solution_zip: Union[str, Path]):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._tmp = self.path.with_name(self.path.name + ".tmp")
+        self._fh = open(self._tmp, "wb")
+        self._lock = threading.Lock()
+        self._header: Dict[str, Any] = {
+            "format": SNAPSHOT_FORMAT,
+            "version": SNAPSHOT_VERSION,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "solution_name": solution_name,
+            "environment_url": environment_url,
+            "flows": [],
+            "entries": {},
+            "failures": {},
+        }
+        self._fh.write(_MAGIC)
+        self._header["solution_zip"] = self._write(Path(solution_zip).read_bytes())
+
+    def _write(self, blob: bytes) -> List[int]:
+        offset = self._fh.tell()
+        self._fh.write(blob)
+        return [offset, len(blob)]
+
+    def add(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Grava a saída de Processor.process de um flow e devolve um resumo leve.
+        """
+        flow = result["desktop_flow"]
+        details = result.get("details")
+        payload = {
+            "desktop_flow": flow,
+            "session_id": result.get("session_id", "N/A"),
+            "start_time": result.get("start_time", "N/A"),
+            "details": details.to_dict(include_logs=True) if isinstance(details, SessionDetails) else None,
+            "actions": result.get("actions") or [],
+            "prefix": result.get("prefix", ""),
+        }
+        raw = json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        blob = zlib.compress(raw, _COMPRESS_LEVEL)
+        with self._lock:
+            self._header["entries"][flow] = self._write(blob) + [len(raw)]
+        logger.debug("Snapshot: %s gravado (%d -> %d bytes)", flow, len(raw), len(blob))
+        return {"desktop_flow": flow, "session_id": payload["session_id"],
+                "action_count": len(payload["actions"])}
+
+    def add_failure(self, flow: str, reason: str) -> None:
+        with self._lock:
+            self._header["failures"][flow] = reason
+
+    def close(self, flows: List[str]) -> Path:
+        """
+        Grava o índice (com a ordem original dos flows) e publica o arquivo.
+        """
+        with self._lock:
+            self._header["flows"] = list(flows)
+            header = json.dumps(self._header, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+            offset = self._fh.tell()
+            self._fh.write(header)
+            self._fh.write(_FOOTER.pack(offset, _MAGIC))
+            self._fh.close()
+        os.replace(self._tmp, self.path)
+        logger.info("Snapshot salvo em %s (%d flows, %d falhas, %.1f MB)",
+                    self.path, len(self._header["entries"]), len(self._header["failures"]),
+                    self.path.stat().st_size / 1e6)
+        return self.path
+
+    def abort(self) -> None:
+        if not self._fh.closed:
+            self._fh.close()
+        if self._tmp.exists():
+            self._tmp.unlink()
+
+    def __enter__(self) -> "SnapshotWriter":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        if exc_type is not None:
+            self.abort()
+
+
+class Snapshot:
+    """
+    Leitura (mmap) de um snapshot gravado por SnapshotWriter.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = Path(path)
+        self._fh = open(self.path, "rb")
+        try:
+            self._mm = mmap.mmap(self._fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            self._fh.close()
+            raise ValueError(f"{path} não é um snapshot do Bot_CAB (arquivo vazio)")
+        try:
+            self.header = self._read_header()
+        except ValueError:
+            self.close()
+            raise
+
+    def _read_header(self) -> Dict[str, Any]:
+        mm = self._mm
+        if len(mm) < len(_MAGIC) + _FOOTER.size or mm[:len(_MAGIC)] != _MAGIC:
+            raise ValueError(f"{self.path} não é um snapshot do Bot_CAB")
+        offset, magic = _FOOTER.unpack(mm[len(mm) - _FOOTER.size:])
+        if magic != _MAGIC:
+            raise ValueError(f"{self.path}: snapshot incompleto (sem índice)")
+        header = json.loads(mm[offset:len(mm) - _FOOTER.size].decode("utf-8"))
+        if header.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{self.path} não é um snapshot do Bot_CAB")
+        if header.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"{self.path}: versão {header.get('version')} não suportada "
+                             f"(esperada {SNAPSHOT_VERSION})")
+        return header
+
+    @property
+    def flows(self) -> List[str]:
+        return list(self.header.get("flows", []))
+
+    @property
+    def solution_name(self) -> str:
+        return self.header.get("solution_name", "")
+
+    def failure(self, flow: str) -> Optional[str]:
+        return self.header.get("failures", {}).get(flow)
+
+    def missing_reason(self, flow: str) -> Optional[str]:
+        """
+        Por que o flow não pode ser lido (motivo gravado pelo `fetch`), ou None.
+        """
+        if flow in self.header.get("entries", {}):
+            return None
+        return self.failure(flow) or f"flow '{flow}' ausente no snapshot"
+
+    def extract_solution(self, dest: Union[str, Path]) -> Path:
+        offset, length = self.header["solution_zip"]
+        p = Path(dest)
+        p.write_bytes(self._mm[offset:offset + length])
+        return p
+
+    def load(self, flow: str) -> Dict[str, Any]:
+        """
+        Reconstrói a saída de Processor.process do flow.
+        Lança LookupError se o flow não foi buscado (com o motivo gravado).
+        """
+        entry = self.header.get("entries", {}).get(flow)
+        if entry is None:
+            raise LookupError(self.missing_reason(flow))
+        offset, length, _ = entry
+        data = json.loads(zlib.decompress(self._mm[offset:offset + length]))
+        if data.get("details"):
+            data["details"] = SessionDetails.from_dict(data["details"])
+        return data
+
+    def close(self) -> None:
+        self._mm.close()
+        self._fh.close()
+
+    def __enter__(self) -> "Snapshot":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,325 @@
+"""
+Análise estática das definições de Cloud Flow (Workflows/*.json) da solution.
+
+Lê as definições direto do .zip (uma por vez, sem extrair), calcula o hash
+do conteúdo e só analisa o que não está no cache. As definições novas são
+analisadas em paralelo num pool de processos. Não depende de ambiente.
+
+Regras:
+  - connection references fora do prefixo do publisher
+  - URLs fixas nos inputs de triggers/ações
+  - segredos fixos (senhas, chaves, tokens, assinaturas SAS)
+  - ações de conector/HTTP sem retryPolicy (ou com retryPolicy 'none')
+"""
+
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import urlparse
+from xml.etree.ElementTree import fromstring
+
+from bot_cab.processing.rules_engine import CloudFlowIssues
+from bot_cab.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_CACHE_RESULTS = metrics.counter(
+    "bot_cab_cloud_flow_cache", "Definições de Cloud Flow por resultado do cache.", ("result",))
+_ANALYSIS_SECONDS = metrics.histogram(
+    "bot_cab_cloud_flow_analysis_seconds", "Duração da análise estática de Cloud Flows.")
+
+# Mude ao alterar as regras: invalida o cache.
+RULES_VERSION = 1
+CACHE_FORMAT = "bot_cab.cloudflow_cache"
+
+# Abaixo disso o custo de subir o pool de processos não compensa.
+_POOL_MIN_DEFINITIONS = 8
+
+_WORKFLOWS_DIR = "Workflows/"
+_GUID_SUFFIX = re.compile(r"-[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}$")
+_URL = re.compile(r"^https?://", re.I)
+# Nomes de campo com segredo, comparados com os segmentos finais da chave
+# (snake/camel/kebab): 'dbPassword' e 'x-api-key' casam, 'continuationToken' não.
+_SECRET_NAMES = frozenset((
+    "password", "passwd", "pwd", "secret", "clientsecret", "apikey", "accesstoken",
+    "token", "sharedaccesskey", "connectionstring", "sig",
+))
+# Genéricos demais como sufixo: só a chave inteira conta ('token', não 'csrfToken').
+_WHOLE_KEY_ONLY = frozenset(("token", "sig"))
+_KEY_SEGMENT = re.compile(r"[A-Z]+(?![a-z])|[A-Z]?[a-z]+|\d+")
+_AUTH_HEADER = re.compile(r"^(bearer|basic)\s+\S{8,}", re.I)
+_SAS_SIGNATURE = re.compile(r"[?&]sig=[^&]{16,}", re.I)
+_IGNORED_HOSTS = ("schema.management.azure.com",)
+_RETRY_ACTION_TYPES = {"http", "openapiconnection", "apiconnection", "openapiconnectionwebhook",
+                       "apiconnectionwebhook", "httpwebhook"}
+
+
+def _flow_name(member: str) -> str:
+    stem = Path(member).stem
+    return _GUID_SUFFIX.sub("", stem) or stem
+
+
+def _is_secret_key(key: str) -> bool:
+    segments = [s.lower() for s in _KEY_SEGMENT.findall(key)]
+    for i in range(len(segments)):
+        name = "".join(segments[i:])
+        if name in _SECRET_NAMES and (i == 0 or name not in _WHOLE_KEY_ONLY):
+            return True
+    return False
+
+
+def _is_literal(value: str) -> bool:
+    """
+    String fixa, sem expressões ('@...' ou '@{...}').
+    """
+    return bool(value) and not value.startswith("@") and "@{" not in value
+
+
+def _walk_actions(actions: Dict[str, Any], path: str = "") -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """
+    Percorre ações aninhadas (Scope/If/Switch/Foreach/Until).
+    """
+    for name, action in (actions or {}).items():
+        if not isinstance(action, dict):
+            continue
+        here = f"{path}/{name}" if path else name
+        yield here, action
+        yield from _walk_actions(action.get("actions"), here)
+        otherwise = action.get("else")
+        if isinstance(otherwise, dict):
+            yield from _walk_actions(otherwise.get("actions"), here)
+        for case in (action.get("cases") or {}).values():
+            if isinstance(case, dict):
+                yield from _walk_actions(case.get("actions"), here)
+        default = action.get("default")
+        if isinstance(default, dict):
+            yield from _walk_actions(default.get("actions"), here)
+
+
+def _walk_values(node: Any, key: str = "") -> Iterator[Tuple[str, str]]:
+    """
+    (chave, valor) de todas as strings de um inputs.
+    """
+    if isinstance(node, dict):
+        for k, v in node.items():
+            yield from _walk_values(v, str(k))
+    elif isinstance(node, list):
+        for v in node:
+            yield from _walk_values(v, key)
+    elif isinstance(node, str):
+        yield key, node
+
+
+def _check_inputs(group: CloudFlowIssues, flow: str, where: str, inputs: Any) -> None:
+    for key, value in _walk_values(inputs):
+        if not _is_literal(value):
+            continue
+        if _is_secret_key(key) or _AUTH_HEADER.match(value) or _SAS_SIGNATURE.search(value):
+            group.add(f"Cloud Flow '{flow}': segredo fixo no campo '{key}'.",
+                      rule="cloud_hardcoded_secret", subject=f"{flow}|{key}", location=where)
+        elif _URL.match(value):
+            host = urlparse(value).netloc.lower()
+            if host and host not in _IGNORED_HOSTS:
+                group.add(f"Cloud Flow '{flow}': URL fixa '{host}' (use variável de ambiente).",
+                          rule="cloud_hardcoded_url", subject=f"{flow}|{host}", location=where)
+
+
+def analyze_definition(member: str, data: bytes, prefix: str) -> List[Dict[str, Any]]:
+    """
+    Analisa uma definição de Cloud Flow e retorna as issues (Issue.to_dict()).
+    Função de módulo para poder rodar no pool de processos.
+    """
+    flow = _flow_name(member)
+    group = CloudFlowIssues()
+    try:
+        doc = json.loads(data)
+    except ValueError as e:
+        group.add(f"Cloud Flow '{flow}': definição JSON inválida ({e}).",
+                  rule="cloud_invalid_json", subject=flow)
+        return group.to_dict()["issues"]
+
+    props = doc.get("properties", doc) if isinstance(doc, dict) else {}
+    definition = props.get("definition")
+    if not isinstance(definition, dict):
+        return []
+
+    if prefix:
+        for name, ref in (props.get("connectionReferences") or {}).items():
+            logical = ((ref or {}).get("connection") or {}).get("connectionReferenceLogicalName", "")
+            if logical and not logical.startswith(prefix):
+                group.add(f"Cloud Flow '{flow}': ConnectionReference '{logical}' fora do prefixo '{prefix}'.",
+                          rule="cloud_connref_prefix", subject=f"{flow}|{logical}", location=name)
+
+    for name, trigger in (definition.get("triggers") or {}).items():
+        if isinstance(trigger, dict):
+            _check_inputs(group, flow, f"trigger {name}", trigger.get("inputs"))
+
+    for where, action in _walk_actions(definition.get("actions")):
+        inputs = action.get("inputs")
+        _check_inputs(group, flow, where, inputs)
+        if str(action.get("type", "")).lower() in _RETRY_ACTION_TYPES:
+            policy = inputs.get("retryPolicy") if isinstance(inputs, dict) else None
+            if not isinstance(policy, dict) or str(policy.get("type", "")).lower() == "none":
+                group.add(f"Cloud Flow '{flow}': ações de conector/HTTP sem retryPolicy.",
+                          rule="cloud_retry_policy", subject=flow, location=where)
+
+    return group.to_dict()["issues"]
+
+
+def solution_prefix(zip_path: Union[str, Path]) -> str:
+    """
+    Prefixo de customização do publisher (solution.xml), ex.: 'cr123_'.
+    """
+    try:
+        with zipfile.ZipFile(zip_path) as z:
+            root = fromstring(z.read("solution.xml"))
+    except (KeyError, zipfile.BadZipFile, OSError) as e:
+        logger.warning("Não foi possível ler o prefixo do publisher: %s", e)
+        return ""
+    prefix = (root.findtext(".//Publisher/CustomizationPrefix") or "").strip()
+    return f"{prefix}_" if prefix else ""
+
+
+class DefinitionCache:
+    """
+    Cache em JSON: sha256(definição + nome do membro + prefixo + versão das
+    regras) -> issues. O nome entra na chave porque compõe as mensagens.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> None:
+        self.entries: Dict[str, List[Dict[str, Any]]] = dict(entries or {})
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]]) -> "DefinitionCache":
+        if not path or not Path(path).is_file():
+            return cls()
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (ValueError, OSError) as e:
+            logger.warning("Cache de Cloud Flows inválido em %s: %s", path, e)
+            return cls()
+        if data.get("format") != CACHE_FORMAT or data.get("rules_version") != RULES_VERSION:
+            logger.info("Cache de Cloud Flows de outra versão; descartado.")
+            return cls()
+        return cls(data.get("entries"))
+
+    def save(self, path: Union[str, Path]) -> None:
+        if not self.dirty:
+            return
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"format": CACHE_FORMAT, "rules_version": RULES_VERSION, "entries": self.entries}
+        p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        logger.debug("Cache de Cloud Flows salvo em %s (%d entradas)", p, len(self.entries))
+
+    @staticmethod
+    def key(member: str, data: bytes, prefix: str) -> str:
+        h = hashlib.sha256(data)
+        h.update(f"\0{member}\0{prefix}\0{RULES_VERSION}".encode())
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[List[Dict[str, Any]]]:
+        return self.entries.get(key)
+
+    def put(self, key: str, issues: List[Dict[str, Any]]) -> None:
+        self.entries[key] = issues
+        self.dirty = True
+
+
+class CloudFlowAnalyzer:
+    def __init__(self,
+                 prefix: str = "",
+                 cache: Optional[DefinitionCache] = None,
+                 max_workers: Optional[int] = None):
+        self.prefix = prefix
+        self.cache = cache or DefinitionCache()
+        self.max_workers = max_workers or os.cpu_count() or 1
+
+    def analyze_zip(self, zip_path: Union[str, Path]) -> CloudFlowIssues:
+        """
+        Analisa todas as definições Workflows/*.json do .zip.
+        As issues saem na ordem das definições no .zip.
+        """
+        t0 = time.monotonic()
+        with zipfile.ZipFile(zip_path) as z:
+            members = [n for n in z.namelist()
+                       if n.startswith(_WORKFLOWS_DIR) and n.lower().endswith(".json")]
+            per_member = self._analyze_members(z, members)
+
+        group = CloudFlowIssues()
+        for member in members:
+            group.merge(per_member.get(member, []))
+        elapsed = time.monotonic() - t0
+        _ANALYSIS_SECONDS.observe(elapsed)
+        logger.info("Cloud Flows: %d definições analisadas em %.2fs (%d issues distintas)",
+                    len(members), elapsed, len(group))
+        return group
+
+    def _analyze_members(self, z: zipfile.ZipFile, members: List[str]) -> Dict[str, List[Dict[str, Any]]]:
+        results: Dict[str, List[Dict[str, Any]]] = {}
+        pool = self._make_pool(len(members))
+        running: Dict[Future, Tuple[str, str]] = {}
+        max_in_flight = self.max_workers * 2
+
+        def collect(done) -> None:
+            for fut in done:
+                member, key = running.pop(fut)
+                results[member] = fut.result()
+                self.cache.put(key, results[member])
+
+        try:
+            for member in members:
+                data = z.read(member)
+                key = self.cache.key(member, data, self.prefix)
+                cached = self.cache.get(key)
+                if cached is not None:
+                    _CACHE_RESULTS.inc(result="hit")
+                    results[member] = cached
+                    continue
+                _CACHE_RESULTS.inc(result="miss")
+                if pool is None:
+                    results[member] = analyze_definition(member, data, self.prefix)
+                    self.cache.put(key, results[member])
+                    continue
+                if len(running) >= max_in_flight:
+                    done, _ = wait(list(running), return_when=FIRST_COMPLETED)
+                    collect(done)
+                running[pool.submit(analyze_definition, member, data, self.prefix)] = (member, key)
+            if running:
+                done, _ = wait(list(running))
+                collect(done)
+        finally:
+            if pool is not None:
+                pool.shutdown(wait=True)
+        return results
+
+    def _make_pool(self, count: int) -> Optional[ProcessPoolExecutor]:
+        if count < _POOL_MIN_DEFINITIONS or self.max_workers < 2:
+            return None
+        try:
+            return ProcessPoolExecutor(max_workers=min(self.max_workers, count))
+        except (OSError, NotImplementedError) as e:
+            logger.warning("Pool de processos indisponível (%s); analisando em série.", e)
+            return None
+
+
+def analyze_cloud_flows(zip_path: Union[str, Path],
+                        cache_path: Optional[Union[str, Path]] = None,
+                        max_workers: Optional[int] = None) -> CloudFlowIssues:
+    """
+    Atalho: lê o prefixo do publisher, analisa com cache opcional em disco.
+    """
+    cache = DefinitionCache.load(cache_path)
+    analyzer = CloudFlowAnalyzer(solution_prefix(zip_path), cache, max_workers)
+    group = analyzer.analyze_zip(zip_path)
+    if cache_path:
+        cache.save(cache_path)
+    return group
@@ -0,0 +1,158 @@
+"""
+Manifesto de componentes da solution descompactada, para validação incremental.
+
+Cada componente (workflow, connection reference, definição de variável de
+ambiente, work queue) recebe um hash do seu conteúdo. A impressão digital de
+um Desktop Flow combina o hash do próprio workflow, dos componentes que ele
+referencia pelo nome e da estrutura da solution verificada pela RulesEngine
+(e, no modo online, da sessão analisada); se ela não mudou entre duas
+execuções, o resultado anterior pode ser reaproveitado.
+"""
+
+import hashlib
+import logging
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Iterable, List, Tuple, Union
+from xml.etree.ElementTree import Element, parse, tostring
+
+logger = logging.getLogger(__name__)
+
+KIND_WORKFLOW = "workflow"
+KIND_CONNECTION_REFERENCE = "connectionreference"
+KIND_ENVIRONMENT_VARIABLE = "environmentvariable"
+KIND_WORK_QUEUE = "workqueue"
+# Entradas de RulesEngine._check_solution_structure (nomes das connection
+# references, presença de variáveis de ambiente/work queues, categorias dos workflows).
+STRUCTURE_KEY = "solution:estrutura"
+
+_ENV_VAR_DIR = "environmentvariabledefinitions"
+_WORKFLOW_FILES = ("JsonFileName", "XamlFileName")
+
+
+@dataclass(frozen=True)
+class Component:
+    kind: str
+    name: str
+    digest: str
+    refs: Tuple[str, ...] = ()
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.name}"
+
+
+def _digest(*parts: Union[bytes, str]) -> str:
+    h = hashlib.sha256()
+    for part in parts:
+        h.update(part.encode("utf-8") if isinstance(part, str) else part)
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def _element_digest(elem: Element, *extra: bytes) -> str:
+    return _digest(tostring(elem, encoding="utf-8"), *extra)
+
+
+def _name_of(elem: Element, *fields: str) -> str:
+    for f in fields:
+        value = (elem.attrib.get(f) or elem.findtext(f) or "").strip()
+        if value:
+            return value
+    return ""
+
+
+def _workflow_files(base: Path, wf: Element) -> List[bytes]:
+    blobs = []
+    for tag in _WORKFLOW_FILES:
+        rel = (wf.findtext(tag) or "").strip().lstrip("/\\")
+        if rel and (base / rel).is_file():
+            blobs.append((base / rel).read_bytes())
+    return blobs
+
+
+def _env_var_components(base: Path) -> List[Component]:
+    root = base / _ENV_VAR_DIR
+    if not root.is_dir():
+        return []
+    components = []
+    for entry in sorted(root.iterdir()):
+        files = sorted(p for p in entry.rglob("*") if p.is_file()) if entry.is_dir() else [entry]
+        parts: List[Union[bytes, str]] = []
+        for p in files:
+            parts += [p.relative_to(root).as_posix(), p.read_bytes()]
+        components.append(Component(KIND_ENVIRONMENT_VARIABLE, entry.name, _digest(*parts)))
+    return components
+
+
+def _referenced(text: str, candidates: Iterable[Component]) -> Tuple[str, ...]:
+    """
+    Componentes citados pelo nome no conteúdo do workflow. Um falso positivo
+    só faz o flow ser revalidado sem necessidade.
+    """
+    return tuple(sorted(c.key for c in candidates if c.name and c.name in text))
+
+
+def solution_components(unzip_dir: Union[str, Path]) -> Dict[str, Component]:
+    """
+    {chave: Component} da solution descompactada (chave = 'tipo:nome').
+    """
+    base = Path(unzip_dir)
+    cust = parse(base / "customizations.xml").getroot()
+
+    others: List[Component] = []
+    for i, cref in enumerate(cust.iter("connectionreference")):
+        name = _name_of(cref, "connectionreferencelogicalname") or f"#{i}"
+        others.append(Component(KIND_CONNECTION_REFERENCE, name, _element_digest(cref)))
+    for i, wq in enumerate(cust.iter("workqueue")):
+        name = _name_of(wq, "name", "Name", "workqueueid") or f"#{i}"
+        others.append(Component(KIND_WORK_QUEUE, name, _element_digest(wq)))
+    others += _env_var_components(base)
+
+    components: Dict[str, Component] = {c.key: c for c in others}
+    categories = []
+    for wf in cust.iter("Workflow"):
+        name = (wf.attrib.get("Name") or "").strip()
+        categories.append(wf.findtext("Category") or "")
+        files = _workflow_files(base, wf)
+        text = tostring(wf, encoding="unicode") + "".join(b.decode("utf-8", "replace") for b in files)
+        comp = Component(KIND_WORKFLOW, name, _element_digest(wf, *files), _referenced(text, others))
+        components[comp.key] = comp
+
+    crefs = sorted(c.name for c in others if c.kind == KIND_CONNECTION_REFERENCE)
+    structure = _digest(
+        "\n".join(crefs),
+        str((base / _ENV_VAR_DIR).is_dir()),
+        str(bool(cust.findall(".//workqueues"))),
+        ",".join(sorted(set(categories))),
+    )
+    kind, _, name = STRUCTURE_KEY.partition(":")
+    components[STRUCTURE_KEY] = Component(kind, name, structure)
+    logger.debug("Manifesto da solution: %d componentes", len(components))
+    return components
+
+
+def flow_fingerprint(flow: str, components: Dict[str, Component], session_id: str = "") -> str:
+    """
+    Hash das entradas das regras de um Desktop Flow: o próprio workflow,
+    seus componentes referenciados, a estrutura da solution e, no modo
+    online, a última sessão (as regras de runtime dependem dela).
+    """
+    own = components.get(f"{KIND_WORKFLOW}:{flow}")
+    keys = [STRUCTURE_KEY] + ([own.key, *own.refs] if own else [])
+    parts = [f"{k}={components[k].digest if k in components else ''}" for k in keys]
+    if session_id:
+        parts.append(f"session={session_id}")
+    return _digest(*parts)
+
+
+def diff_manifest(previous: Dict[str, str], components: Dict[str, Component]) -> Dict[str, List[str]]:
+    """
+    Compara o manifesto anterior ({chave: hash}) com o atual.
+    """
+    current = {k: c.digest for k, c in components.items()}
+    return {
+        "added": sorted(k for k in current if k not in previous),
+        "changed": sorted(k for k in current if k in previous and previous[k] != current[k]),
+        "removed": sorted(k for k in previous if k not in current),
+    }
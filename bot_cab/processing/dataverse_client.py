@@ -1,38 +1,76 @@
 """
-DataverseClient: obtém logs action-by-action via REST usando Azure CLI token.
+DataverseClient: obtém logs action-by-action (e FetchXML) via REST usando Azure CLI token.
 """
 
 import logging
+import re
+import threading
+import time
+import xml.etree.ElementTree as ET
 import requests
-from typing import Any, Dict, List
+from requests.adapters import HTTPAdapter
+from typing import Any, Dict, Iterator, List, Optional
+from urllib.parse import quote, unquote
 
 from bot_cab.utils.auth import get_token, authenticate_az_cli
+from bot_cab.processing.request_governor import get_governor
+from bot_cab.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+_FORMATTED_VALUE = "OData.Community.Display.V1.FormattedValue"
+_FETCH_ANNOTATIONS = ",".join((
+    _FORMATTED_VALUE,
+    "Microsoft.Dynamics.CRM.fetchxmlpagingcookie",
+    "Microsoft.Dynamics.CRM.morerecords",
+))
+_PAGING_COOKIE = re.compile(r'pagingcookie="([^"]*)"')
+
+_HTTP_REQUESTS = metrics.counter(
+    "bot_cab_http_requests", "Requisições HTTP ao Dataverse.", ("operation", "status"))
+_HTTP_BYTES = metrics.counter(
+    "bot_cab_http_response_bytes", "Bytes recebidos do Dataverse.", ("operation",))
+_HTTP_SECONDS = metrics.histogram(
+    "bot_cab_http_request_duration_seconds", "Latência das requisições ao Dataverse.", ("operation",))
+
 class DataverseClient:
     """
     Cliente para chamadas REST ao Dataverse.
+
+    O token é obtido uma única vez (sob demanda) e reutilizado por todas as
+    chamadas, inclusive quando a mesma instância é compartilhada entre threads.
+    Todas as requisições passam pelo RequestGovernor do ambiente.
     """
 
     def __init__(self,
                  env_url: str,
-                 tenant_id: str):
+                 tenant_id: str,
+                 token: Optional[str] = None,
+                 max_connections: int = 10):
         self.env_url = env_url
         self.tenant_id = tenant_id
+        self._token = token
+        self._token_lock = threading.Lock()
 
-    def get_action_logs(self, session_id: str, timeout: int = 30) -> List[Dict[str, Any]]:
-        """
-        Retorna a lista de 'actions' de uma Flow Session via API REST.
-        """
-        authenticate_az_cli()
-        token = get_token(
-            environment_url=self.env_url
-        )
+        self._session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_connections)
+        self._session.mount("https://", adapter)
+        self._session.mount("http://", adapter)
+        self.governor = get_governor(env_url)
 
-        url = f"{self.env_url}/api/data/v9.2/flowsessions({session_id})/additionalcontext/$value"
+    def _get_token(self, refresh: bool = False) -> str:
+        with self._token_lock:
+            if self._token is None or refresh:
+                if self._token is None:
+                    authenticate_az_cli()
+                self._token = get_token(
+                    environment_url=self.env_url,
+                    force_refresh=refresh
+                )
+            return self._token
 
-        headers = {
+    def _headers(self, token: str) -> Dict[str, str]:
+        return {
             "Authorization": f"Bearer {token}",
             "Accept": "application/json",
             "Content-Type": "application/json; charset=utf-8",
@@ -40,9 +78,40 @@ class DataverseClient:
             "OData-Version": "4.0"
         }
 
-        logger.debug("Requisitando action logs: %s", url)
-        resp = requests.get(url, headers=headers, timeout=timeout)
+    def _get(self, url: str, timeout: int, operation: str,
+             extra_headers: Optional[Dict[str, str]] = None) -> requests.Response:
+        """
+        GET sob o governor; em 401 renova o token uma vez (exportações longas).
+        """
+        def attempt(headers: Dict[str, str]) -> requests.Response:
+            t0 = time.monotonic()
+            resp = self._session.get(url, headers=headers, timeout=timeout)
+            _HTTP_SECONDS.observe(time.monotonic() - t0, operation=operation)
+            _HTTP_REQUESTS.inc(operation=operation, status=resp.status_code)
+            _HTTP_BYTES.inc(len(resp.content or b""), operation=operation)
+            return resp
+
+        def send(token: str) -> requests.Response:
+            headers = self._headers(token)
+            if extra_headers:
+                headers.update(extra_headers)
+            return self.governor.request(lambda: attempt(headers))
+
+        resp = send(self._get_token())
+        if resp.status_code == 401:
+            logger.info("Token rejeitado (401); renovando e repetindo a requisição.")
+            resp = send(self._get_token(refresh=True))
         resp.raise_for_status()
+        return resp
+
+    def get_action_logs(self, session_id: str, timeout: int = 30) -> List[Dict[str, Any]]:
+        """
+        Retorna a lista de 'actions' de uma Flow Session via API REST.
+        """
+        url = f"{self.env_url}/api/data/v9.2/flowsessions({session_id})/additionalcontext/$value"
+
+        logger.debug("Requisitando action logs: %s", url)
+        resp = self._get(url, timeout, "action_logs")
 
         try:
             data = resp.json()
@@ -50,3 +119,68 @@ class DataverseClient:
         except ValueError:
             logger.error("Falha ao decodificar JSON de action logs")
             return []
+
+    def fetch_xml(self, entity_set: str, fetch_xml: str, timeout: int = 60,
+                  max_pages: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Executa FetchXML direto pela Web API (sem PAC CLI):
+          GET /api/data/v9.2/<entity_set>?fetchXml=<xml>
+        Retorna as linhas de 'value' (com anotações de valores formatados)
+        de todas as páginas (ou das `max_pages` primeiras).
+        """
+        rows: List[Dict[str, Any]] = []
+        for n, page in enumerate(self.fetch_xml_pages(entity_set, fetch_xml, timeout), start=1):
+            rows += page
+            if max_pages is not None and n >= max_pages:
+                break
+        return rows
+
+    def aggregate(self, query: Any, timeout: int = 60) -> List[Dict[str, str]]:
+        """
+        Como FetchXmlClient.aggregate (AggregateQuery), mas pela Web API:
+        uma linha por grupo, {alias: valor}, com o rótulo formatado das
+        colunas agrupadas (ex.: statuscode), como na tabela do `pac env fetch`.
+        """
+        rows = self.fetch_xml(f"{query.entity}s", query.to_xml(), timeout)
+        out: List[Dict[str, str]] = []
+        for row in rows:
+            values = {k.rsplit(".", 1)[-1].lower(): v for k, v in row.items() if "@" not in k}
+            formatted = {k.split("@", 1)[0].rsplit(".", 1)[-1].lower(): v
+                         for k, v in row.items() if k.endswith("@" + _FORMATTED_VALUE)}
+            row_out = {}
+            for col in query.columns:
+                key = col.alias.lower()
+                # contagens ficam com o número bruto (o formatado tem separador de milhar)
+                value = values.get(key) if col.aggregate else formatted.get(key, values.get(key))
+                row_out[col.alias] = "" if value is None else str(value)
+            out.append(row_out)
+        return out
+
+    def fetch_xml_pages(self, entity_set: str, fetch_xml: str,
+                        timeout: int = 60) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Como fetch_xml, mas entrega uma página por vez, seguindo o paging
+        cookie enquanto o Dataverse indicar mais registros.
+        """
+        root = ET.fromstring(fetch_xml)
+        page = int(root.get("page") or 1)
+        while True:
+            root.set("page", str(page))
+            url = f"{self.env_url}/api/data/v9.2/{entity_set}?fetchXml={quote(ET.tostring(root, encoding='unicode'))}"
+            logger.debug("Executando FetchXML via Web API em %s (página %d)", entity_set, page)
+            resp = self._get(
+                url, timeout, "fetch_xml",
+                extra_headers={"Prefer": f'odata.include-annotations="{_FETCH_ANNOTATIONS}"'}
+            )
+            try:
+                data = resp.json()
+            except ValueError:
+                logger.error("Falha ao decodificar JSON do FetchXML")
+                return
+            yield data.get("value", [])
+            if not data.get("@Microsoft.Dynamics.CRM.morerecords"):
+                return
+            cookie = _PAGING_COOKIE.search(data.get("@Microsoft.Dynamics.CRM.fetchxmlpagingcookie") or "")
+            if cookie:
+                root.set("paging-cookie", unquote(unquote(cookie.group(1))))
+            page += 1
@@ -0,0 +1,273 @@
+"""
+Índice estático dos scripts de Desktop Flow (Category=6) da solution.
+
+O script (Robin) vem do clientdata do Workflow em customizations.xml (ou do
+JSON referenciado por JsonFileName) e é tokenizado em tabelas de subfluxos
+(FUNCTION ... END FUNCTION), chamadas (CALL) e ações (Modulo.Acao / palavras
+reservadas). O índice é guardado em cache pelo hash do script, então as
+regras que dependem só do código rodam offline em milissegundos.
+"""
+
+import hashlib
+import json
+import logging
+import re
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
+from xml.etree.ElementTree import parse
+
+from bot_cab.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_CACHE_RESULTS = metrics.counter(
+    "bot_cab_script_index_cache", "Scripts de Desktop Flow por resultado do cache de índice.", ("result",))
+
+# Mude ao alterar o tokenizador: invalida o cache.
+INDEX_VERSION = 1
+CACHE_FORMAT = "bot_cab.script_index_cache"
+
+MAIN_FUNCTION = "main"
+CLEANUP_FUNCTION = "empty"
+
+_SCRIPT_KEYS = ("script", "definition", "scriptdefinition", "robinscript")
+_FUNCTION = re.compile(r"^FUNCTION\s+([^\s(]+)", re.I)
+_END_FUNCTION = re.compile(r"^END\s+FUNCTION\b", re.I)
+_CALL = re.compile(r"^CALL\s+([^\s(]+)", re.I)
+_ACTION = re.compile(r"^([A-Za-z_]\w*\.[A-Za-z_]\w*)(?:\.[A-Za-z_]\w*)*\b")
+_KEYWORD = re.compile(
+    r"^(SET|IF|ELSE\s+IF|ELSE|LOOP\s+FOREACH|LOOP\s+WHILE|LOOP|EXIT\s+LOOP|NEXT\s+LOOP|EXIT\s+FUNCTION|"
+    r"EXIT|WAIT|LABEL|GOTO|ON\s+BLOCK\s+ERROR|BLOCK|SWITCH|CASE|DEFAULT|RETURN|STOP\s+FLOW|THROW\s+ERROR)\b", re.I)
+
+
+@dataclass
+class DesktopFlowIndex:
+    """
+    Tabelas do script de um Desktop Flow:
+      functions: {nome: {"line": n, "actions": n, "calls": [subfluxos]}}
+      calls:     [(chamador, chamado, linha)]
+      actions:   {tipo de ação: ocorrências}
+    """
+    flow: str = ""
+    functions: Dict[str, Dict[str, Any]] = field(default_factory=dict)
+    calls: List[Tuple[str, str, int]] = field(default_factory=list)
+    actions: Dict[str, int] = field(default_factory=dict)
+    lines: int = 0
+
+    @property
+    def action_count(self) -> int:
+        return sum(self.actions.values())
+
+    def function(self, name: str) -> Optional[str]:
+        """
+        Nome do subfluxo como declarado (a linguagem não diferencia caixa).
+        """
+        wanted = name.lower()
+        return next((f for f in self.functions if f.lower() == wanted), None)
+
+    def reachable(self, start: str = MAIN_FUNCTION) -> Set[str]:
+        """
+        Subfluxos alcançáveis a partir de `start` (nomes em minúsculas).
+        """
+        graph: Dict[str, List[str]] = {}
+        for caller, callee, _ in self.calls:
+            graph.setdefault(caller.lower(), []).append(callee.lower())
+        seen = {start.lower()}
+        todo = deque(seen)
+        while todo:
+            for callee in graph.get(todo.popleft(), []):
+                if callee not in seen:
+                    seen.add(callee)
+                    todo.append(callee)
+        return seen
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "flow": self.flow,
+            "functions": self.functions,
+            "calls": [list(c) for c in self.calls],
+            "actions": self.actions,
+            "lines": self.lines,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "DesktopFlowIndex":
+        return cls(
+            flow=data.get("flow", ""),
+            functions=data.get("functions", {}),
+            calls=[tuple(c) for c in data.get("calls", [])],
+            actions=data.get("actions", {}),
+            lines=data.get("lines", 0),
+        )
+
+
+def tokenize_script(script: str, flow: str = "") -> DesktopFlowIndex:
+    """
+    Tokeniza o script linha a linha. Linhas fora de FUNCTION pertencem a Main
+    (formato antigo, sem subfluxos declarados).
+    """
+    index = DesktopFlowIndex(flow=flow)
+    current = MAIN_FUNCTION
+    in_comment = False
+    lines = script.splitlines()
+    index.lines = len(lines)
+
+    def enter(name: str, line: int) -> None:
+        index.functions.setdefault(name, {"line": line, "actions": 0, "calls": []})
+
+    for n, raw in enumerate(lines, start=1):
+        line = raw.strip()
+        if in_comment:
+            in_comment = "#/" not in line
+            continue
+        if not line or line.startswith("#") or line.startswith("**"):
+            continue
+        if line.startswith("/#"):
+            in_comment = "#/" not in line
+            continue
+
+        m = _FUNCTION.match(line)
+        if m:
+            current = m.group(1)
+            enter(current, n)
+            continue
+        if _END_FUNCTION.match(line):
+            current = MAIN_FUNCTION
+            continue
+
+        call = _CALL.match(line)
+        action = None if call else _ACTION.match(line)
+        keyword = None if call or action else _KEYWORD.match(line)
+        if call:
+            kind = "CALL"
+        elif action:
+            kind = action.group(1)
+        elif keyword:
+            kind = " ".join(keyword.group(1).split()).upper()
+        else:
+            continue
+
+        enter(current, n)
+        fn = index.functions[current]
+        if call:
+            fn["calls"].append(call.group(1))
+            index.calls.append((current, call.group(1), n))
+        fn["actions"] += 1
+        index.actions[kind] = index.actions.get(kind, 0) + 1
+
+    return index
+
+
+def _find_script(node: Any) -> Optional[str]:
+    """
+    Procura o script dentro do clientdata (JSON aninhado, às vezes como string).
+    """
+    if isinstance(node, dict):
+        for k, v in node.items():
+            if k.lower() in _SCRIPT_KEYS and isinstance(v, str):
+                nested = _parse_json(v)
+                found = _find_script(nested) if nested is not None else v
+                if found:
+                    return found
+        for v in node.values():
+            found = _find_script(v)
+            if found:
+                return found
+    elif isinstance(node, list):
+        for v in node:
+            found = _find_script(v)
+            if found:
+                return found
+    elif isinstance(node, str):
+        nested = _parse_json(node)
+        if nested is not None:
+            return _find_script(nested)
+    return None
+
+
+def _parse_json(text: str) -> Optional[Any]:
+    text = text.strip()
+    if not text or text[0] not in "{[":
+        return None
+    try:
+        return json.loads(text)
+    except ValueError:
+        return None
+
+
+def _script_from_clientdata(text: str) -> str:
+    data = _parse_json(text)
+    if data is None:
+        return text
+    return _find_script(data) or ""
+
+
+def read_desktop_flow_scripts(unzip_dir: Union[str, Path]) -> Dict[str, str]:
+    """
+    {nome do Desktop Flow: script} a partir da solution descompactada.
+    """
+    base = Path(unzip_dir)
+    cust = parse(base / "customizations.xml").getroot()
+    scripts: Dict[str, str] = {}
+    for wf in cust.findall(".//Workflow"):
+        if wf.findtext("Category") != "6":
+            continue
+        name = (wf.attrib.get("Name") or "").strip()
+        text = wf.findtext("ClientData") or wf.attrib.get("ClientData") or ""
+        json_file = (wf.findtext("JsonFileName") or "").strip().lstrip("/\\")
+        if not text and json_file and (base / json_file).is_file():
+            text = (base / json_file).read_text(encoding="utf-8-sig")
+        script = _script_from_clientdata(text) if text else ""
+        if not script:
+            logger.warning("Desktop Flow '%s' sem script no clientdata.", name)
+        scripts[name] = script
+    return scripts
+
+
+class ScriptIndexCache:
+    """
+    Cache em JSON: sha256(script + versão do tokenizador) -> índice.
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.entries: Dict[str, Dict[str, Any]] = dict(entries or {})
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]]) -> "ScriptIndexCache":
+        if not path or not Path(path).is_file():
+            return cls()
+        try:
+            data = json.loads(Path(path).read_text(encoding="utf-8"))
+        except (ValueError, OSError) as e:
+            logger.warning("Cache de índice de scripts inválido em %s: %s", path, e)
+            return cls()
+        if data.get("format") != CACHE_FORMAT or data.get("index_version") != INDEX_VERSION:
+            logger.info("Cache de índice de scripts de outra versão; descartado.")
+            return cls()
+        return cls(data.get("entries"))
+
+    def save(self, path: Union[str, Path]) -> None:
+        if not self.dirty:
+            return
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        payload = {"format": CACHE_FORMAT, "index_version": INDEX_VERSION, "entries": self.entries}
+        p.write_text(json.dumps(payload, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+        logger.debug("Cache de índice de scripts salvo em %s (%d entradas)", p, len(self.entries))
+
+    def index(self, flow: str, script: str) -> DesktopFlowIndex:
+        key = hashlib.sha256(f"{INDEX_VERSION}\0{script}".encode("utf-8")).hexdigest()
+        cached = self.entries.get(key)
+        if cached is not None:
+            _CACHE_RESULTS.inc(result="hit")
+            index = DesktopFlowIndex.from_dict(cached)
+        else:
+            _CACHE_RESULTS.inc(result="miss")
+            index = tokenize_script(script)
+            self.entries[key] = index.to_dict()
+            self.dirty = True
+        index.flow = flow
+        return index
@@ -1,29 +1,176 @@
 """
 FetchXmlClient: lida com templates FetchXML e invocação do PAC CLI.
+
+Também monta consultas agregadas (aggregate="true", groupby/count/avg...),
+para que o Dataverse faça a redução e o PAC CLI devolva só uma linha por grupo.
 """
 
 import logging
+import os
+import re
+import tempfile
+from contextlib import contextmanager
+from dataclasses import dataclass, field
 from pathlib import Path
 import xml.etree.ElementTree as ET
-from typing import Callable, Dict
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from bot_cab.utils.run import stream_command
 
 logger = logging.getLogger(__name__)
 
+AGGREGATES = ("count", "countcolumn", "sum", "avg", "min", "max")
+
+
+@dataclass(frozen=True)
+class AggregateColumn:
+    """
+    Coluna de uma consulta agregada: agrupamento (aggregate vazio) ou
+    agregação. `link` é o alias do link-entity (vazio = entidade raiz).
+    """
+    alias: str
+    attribute: str
+    aggregate: str = ""
+    link: str = ""
+    distinct: bool = False
+    dategrouping: str = ""
+
+
+@dataclass(frozen=True)
+class LinkEntity:
+    """
+    link-entity da consulta; `parent` é o alias do link onde ele fica aninhado.
+    """
+    name: str
+    from_attr: str
+    to_attr: str
+    alias: str
+    link_type: str = "inner"
+    parent: str = ""
+
+
+@dataclass(frozen=True)
+class Condition:
+    attribute: str
+    operator: str
+    values: Tuple[str, ...] = ()
+    link: str = ""
+
+
+@dataclass
+class AggregateQuery:
+    """
+    Uso:
+        q = AggregateQuery("flowsession", [
+            AggregateColumn("status", "statuscode"),
+            AggregateColumn("runs", "flowsessionid", aggregate="count"),
+        ])
+        rows = fetch_client.aggregate(q)   # [{"status": "Succeeded", "runs": "42"}, ...]
+    """
+    entity: str
+    columns: List[AggregateColumn]
+    links: List[LinkEntity] = field(default_factory=list)
+    conditions: List[Condition] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        known = {""} | {link.alias for link in self.links}
+        for col in self.columns:
+            if col.aggregate and col.aggregate not in AGGREGATES:
+                raise ValueError(f"agregação inválida '{col.aggregate}' (use {', '.join(AGGREGATES)})")
+            if col.link not in known:
+                raise ValueError(f"coluna '{col.alias}' em link-entity desconhecido '{col.link}'")
+        for link in self.links:
+            if link.parent not in known:
+                raise ValueError(f"link-entity '{link.alias}' aninhado em alias desconhecido '{link.parent}'")
+        for cond in self.conditions:
+            if cond.link not in known:
+                raise ValueError(f"condição sobre link-entity desconhecido '{cond.link}'")
+
+    @property
+    def aliases(self) -> List[str]:
+        return [c.alias for c in self.columns]
+
+    def to_xml(self) -> str:
+        fetch = ET.Element("fetch", {"version": "1.0", "mapping": "logical", "aggregate": "true"})
+        nodes = {"": ET.SubElement(fetch, "entity", {"name": self.entity})}
+        for link in self.links:
+            nodes[link.alias] = ET.Element("link-entity", {
+                "name": link.name, "from": link.from_attr, "to": link.to_attr,
+                "alias": link.alias, "link-type": link.link_type,
+            })
+
+        for col in self.columns:
+            attrs = {"name": col.attribute, "alias": col.alias}
+            if col.aggregate:
+                attrs["aggregate"] = col.aggregate
+                if col.distinct:
+                    attrs["distinct"] = "true"
+            else:
+                attrs["groupby"] = "true"
+                if col.dategrouping:
+                    attrs["dategrouping"] = col.dategrouping
+            ET.SubElement(nodes[col.link], "attribute", attrs)
+
+        filters: Dict[str, ET.Element] = {}
+        for cond in self.conditions:
+            if cond.link not in filters:
+                filters[cond.link] = ET.SubElement(nodes[cond.link], "filter", {"type": "and"})
+            attrs = {"attribute": cond.attribute, "operator": cond.operator}
+            if len(cond.values) == 1 and cond.operator not in ("in", "not-in"):
+                attrs["value"] = cond.values[0]
+            node = ET.SubElement(filters[cond.link], "condition", attrs)
+            if "value" not in attrs:
+                for value in cond.values:
+                    ET.SubElement(node, "value").text = value
+
+        # links depois de atributos e filtros do pai
+        for link in self.links:
+            nodes[link.parent].append(nodes[link.alias])
+        return ET.tostring(fetch, encoding="unicode")
+
+
+def parse_aggregate_table(raw: Sequence[str], aliases: Sequence[str]) -> List[Dict[str, str]]:
+    """
+    Decodifica a tabela de largura fixa do `pac env fetch` de uma consulta
+    agregada: o cabeçalho é a linha cujas colunas são os aliases (o PAC CLI
+    pode prefixá-los com o alias do link-entity, ex.: 'wf.flow').
+    """
+    wanted = {a.lower() for a in aliases}
+    columns: List[Tuple[str, int]] = []
+    rows: List[Dict[str, str]] = []
+    for line in raw:
+        if not columns:
+            spans = [(m.group(0).lower().rsplit(".", 1)[-1], m.start()) for m in re.finditer(r"\S+", line)]
+            if spans and {name for name, _ in spans} == wanted:
+                columns = spans
+            continue
+        if not line.strip() or set(line.strip()) <= {"-", " "}:
+            continue
+        row: Dict[str, str] = {}
+        for i, (name, start) in enumerate(columns):
+            end = columns[i + 1][1] if i + 1 < len(columns) else None
+            row[name] = line[start:end].strip()
+        rows.append({a: row.get(a.lower(), "") for a in aliases})
+    if not columns:
+        logger.warning("Cabeçalho (%s) não encontrado na saída do FetchXML agregado.", ", ".join(aliases))
+    return rows
+
+
 class FetchXmlClient:
     """
     Cliente para executar fetchxml via PAC CLI e parsear resultados básicos.
     """
 
-    def __init__(self, env_url: str, run_cmd: Callable[[list[str], bool], str]):
+    def __init__(self,
+                 env_url: str,
+                 run_cmd: Callable[[list[str], bool], str],
+                 stream_cmd: Optional[Callable[..., int]] = None):
         self.env_url = env_url
         self.run_cmd = run_cmd
+        self.stream_cmd = stream_cmd or stream_command
 
-    def fetch(self, template_path: Path, replacements: Dict[str, str]) -> str:
-        """
-        Carrega o template XML, aplica substituições e executa:
-          pac env fetch --environment <env_url> --xmlFile <temp_file>
-        Retorna o stdout cru.
-        """
+    @staticmethod
+    def _apply(template_path: Path, replacements: Dict[str, str]) -> ET.ElementTree:
         tree = ET.parse(template_path)
         root = tree.getroot()
 
@@ -31,22 +178,105 @@ class FetchXmlClient:
             attr = "name" if key == "flow_name" else "flowsessionid"
             for cond in root.findall(f".//condition[@attribute='{attr}']"):
                 cond.set("value", val)
+        return tree
 
-        tree.write(template_path, encoding="utf-8", xml_declaration=True)
+    def render_xml(self, template_path: Path, replacements: Dict[str, str]) -> str:
+        """
+        Template com as substituições aplicadas, como texto (para a Web API).
+        """
+        return ET.tostring(self._apply(template_path, replacements).getroot(), encoding="unicode")
 
-        logger.debug("Executando FetchXML: %s", template_path)
-        result = self.run_cmd([
+    @contextmanager
+    def _render(self, template_path: Path, replacements: Dict[str, str]) -> Iterator[Path]:
+        """
+        Aplica as substituições nas conditions do template XML e grava o
+        resultado em um arquivo temporário (o template original não é alterado,
+        então várias consultas podem rodar em paralelo).
+        """
+        tree = self._apply(template_path, replacements)
+
+        fd, tmp = tempfile.mkstemp(prefix=f"{Path(template_path).stem}_", suffix=".xml")
+        os.close(fd)
+        try:
+            tree.write(tmp, encoding="utf-8", xml_declaration=True)
+            yield Path(tmp)
+        finally:
+            os.unlink(tmp)
+
+    def _command(self, template_path: Path) -> list:
+        return [
             "pac", "env", "fetch",
             "--environment", self.env_url,
             "--xmlFile", str(template_path)
-        ])
-        return result
+        ]
+
+    def fetch(self, template_path: Path, replacements: Dict[str, str]) -> str:
+        """
+        Carrega o template XML, aplica substituições e executa:
+          pac env fetch --environment <env_url> --xmlFile <temp_file>
+        Retorna o stdout cru.
+        """
+        with self._render(template_path, replacements) as xml_file:
+            logger.debug("Executando FetchXML: %s", template_path)
+            return self.run_cmd(self._command(xml_file))
+
+    def fetch_lines(self,
+                    template_path: Path,
+                    replacements: Dict[str, str],
+                    on_line: Callable[[str], None]) -> None:
+        """
+        Como fetch(), mas entrega o stdout linha a linha para `on_line`
+        (ex.: SessionDetailsDecoder.feed) sem montar a saída inteira em memória.
+        """
+        with self._render(template_path, replacements) as xml_file:
+            logger.debug("Executando FetchXML (streaming): %s", template_path)
+            self.stream_cmd(self._command(xml_file), on_line=on_line)
+
+    def aggregate(self, query: AggregateQuery) -> List[Dict[str, str]]:
+        """
+        Executa uma consulta agregada (a redução é feita pelo Dataverse) e
+        retorna uma linha por grupo: {alias: valor}.
+        """
+        fd, tmp = tempfile.mkstemp(prefix=f"aggregate_{query.entity}_", suffix=".xml")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as fh:
+                fh.write(query.to_xml())
+            logger.debug("Executando FetchXML agregado sobre %s", query.entity)
+            raw = self.run_cmd(self._command(Path(tmp)))
+        finally:
+            os.unlink(tmp)
+        return parse_aggregate_table(raw.splitlines(), query.aliases)
+
+    def parse_column(self, raw: str, column: str) -> List[str]:
+        """
+        Valores de uma coluna da tabela do `pac env fetch`, localizada pelo
+        cabeçalho (o PAC CLI pode prefixá-la com o alias do link-entity).
+        Lança LookupError se nenhuma linha do cabeçalho tiver a coluna.
+        """
+        wanted = column.lower()
+        span: Optional[Tuple[int, Optional[int]]] = None
+        values: List[str] = []
+        for line in raw.splitlines():
+            if span is None:
+                names = [(m.group(0).lower().rsplit(".", 1)[-1], m.start()) for m in re.finditer(r"\S+", line)]
+                for i, (name, start) in enumerate(names):
+                    if name == wanted:
+                        span = (start, names[i + 1][1] if i + 1 < len(names) else None)
+                        break
+                continue
+            if not line.strip() or set(line.strip()) <= {"-", " "}:
+                continue
+            value = line[span[0]:span[1]].strip()
+            if value:
+                values.append(value)
+        if span is None:
+            raise LookupError(f"coluna '{column}' não encontrada na saída do FetchXML")
+        return values
 
     def parse_runs(self, raw: str) -> dict:
         """
         Converte a saída bruta em JSON-Python via regex e retorna dict com key 'runs'.
         """
-        import re
         pattern = re.compile(r"([A-Fa-f0-9-]{35,36})\s+(\d{1,2}/\d{1,2}/\d{4}\s+\d{1,2}:\d{2}\s+(?:AM|PM))?")
         runs = []
         for line in raw.splitlines():
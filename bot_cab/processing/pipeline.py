@@ -0,0 +1,160 @@
+"""
+StagedPipeline: estágios produtor/consumidor ligados por filas limitadas.
+
+Cada estágio tem seu próprio conjunto de threads; um item só passa ao
+estágio seguinte quando há vaga na fila dele (backpressure), então a busca
+do próximo flow (rede) se sobrepõe às regras/exportação do anterior (CPU e
+disco) sem acumular mais que `capacity` flows em memória.
+"""
+
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Any, Callable, List, Sequence
+
+from bot_cab.config.constants import PIPELINE_QUEUE_SIZE
+from bot_cab.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_STAGE_SECONDS = metrics.histogram(
+    "bot_cab_pipeline_stage_seconds", "Tempo de processamento por estágio do pipeline.", ("stage",))
+_STAGE_WAIT_SECONDS = metrics.histogram(
+    "bot_cab_pipeline_queue_wait_seconds", "Espera na fila de entrada de cada estágio.", ("stage",))
+
+_STOP = object()
+_POLL_SECONDS = 0.2
+
+
+@dataclass
+class Stage:
+    """
+    Um estágio do pipeline: `func` recebe a saída do estágio anterior.
+    """
+    name: str
+    func: Callable[[Any], Any]
+    workers: int = 1
+    queue_size: int = PIPELINE_QUEUE_SIZE
+
+
+class StagedPipeline:
+    """
+    Uso:
+        with StagedPipeline([Stage("busca", fetch, 4), Stage("regras", analyze)]) as p:
+            fut = p.submit(flow)          # bloqueia se a 1ª fila estiver cheia
+            value, busy_seconds = fut.result()
+
+    O Future de cada item termina com (saída do último estágio, soma do tempo
+    de processamento nos estágios) ou com a exceção do estágio que falhou.
+    """
+
+    def __init__(self, stages: Sequence[Stage]) -> None:
+        if not stages:
+            raise ValueError("pipeline sem estágios")
+        self.stages = list(stages)
+        self._queues: List[queue.Queue] = [queue.Queue(maxsize=max(1, s.queue_size)) for s in self.stages]
+        self._threads: List[List[threading.Thread]] = []
+        self._aborted = threading.Event()
+        self._entering = 0
+        self._entering_lock = threading.Lock()
+        for index, stage in enumerate(self.stages):
+            threads = [
+                threading.Thread(target=self._worker, args=(index,), daemon=True,
+                                 name=f"bot_cab_{stage.name}_{n}")
+                for n in range(max(1, stage.workers))
+            ]
+            for t in threads:
+                t.start()
+            self._threads.append(threads)
+
+    @property
+    def capacity(self) -> int:
+        """
+        Máximo de itens em andamento (em fila ou em processamento).
+        """
+        return sum(max(1, s.workers) + max(1, s.queue_size) for s in self.stages)
+
+    @property
+    def accepting(self) -> bool:
+        """
+        Há worker livre no primeiro estágio (um worker esperando vaga no
+        estágio seguinte conta como ocupado). Admitir só nesse caso evita
+        enfileirar na entrada flows que o prazo ou o fail-fast descartariam,
+        e o submit não bloqueia o scheduler.
+        """
+        with self._entering_lock:
+            return self._entering < max(1, self.stages[0].workers)
+
+    def submit(self, value: Any) -> Future:
+        fut: Future = Future()
+        fut.set_running_or_notify_cancel()
+        with self._entering_lock:
+            self._entering += 1
+        self._put(0, (fut, value, 0.0, time.monotonic()))
+        return fut
+
+    def _put(self, index: int, item: tuple) -> None:
+        while not self._aborted.is_set():
+            try:
+                self._queues[index].put(item, timeout=_POLL_SECONDS)
+                return
+            except queue.Full:
+                continue
+
+    def _worker(self, index: int) -> None:
+        stage = self.stages[index]
+        inbox = self._queues[index]
+        last = index == len(self.stages) - 1
+        while True:
+            item = inbox.get()
+            if item is _STOP or self._aborted.is_set():
+                return
+            fut, value, busy, queued_at = item
+            t0 = time.monotonic()
+            _STAGE_WAIT_SECONDS.observe(t0 - queued_at, stage=stage.name)
+            try:
+                value = stage.func(value)
+            except BaseException as e:
+                fut.set_exception(e)
+            else:
+                elapsed = time.monotonic() - t0
+                _STAGE_SECONDS.observe(elapsed, stage=stage.name)
+                if last:
+                    fut.set_result((value, busy + elapsed))
+                else:
+                    self._put(index + 1, (fut, value, busy + elapsed, time.monotonic()))
+            if index == 0:
+                # só libera a vaga depois de entregar ao estágio seguinte: um
+                # worker bloqueado pela backpressure continua ocupado
+                with self._entering_lock:
+                    self._entering -= 1
+
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        wait=True: drena os estágios em ordem e aguarda as threads.
+        wait=False: abandona os itens ainda em fila (threads daemon encerram
+        após o item atual), usado em prazo esgotado/interrupção.
+        """
+        if not wait:
+            self._aborted.set()
+            for q, threads in zip(self._queues, self._threads):
+                for _ in threads:
+                    try:
+                        q.put_nowait(_STOP)
+                    except queue.Full:
+                        break
+            return
+        for q, threads in zip(self._queues, self._threads):
+            for _ in threads:
+                q.put(_STOP)
+            for t in threads:
+                t.join()
+
+    def __enter__(self) -> "StagedPipeline":
+        return self
+
+    def __exit__(self, exc_type, *exc) -> None:
+        self.shutdown(wait=exc_type is None)
@@ -1,30 +1,50 @@
 """
 Processor: orquestra fetchXML, Dataverse REST, unzip e retorno de resultados.
+
+Os FetchXML rodam pelo PAC CLI (profile global do `pac auth`) ou, com
+fetch_via="webapi", direto pela Web API com o token do próprio ambiente,
+o que permite vários ambientes no mesmo processo sem disputar o profile.
 """
 import logging
 from pathlib import Path
-from dateutil import parser as date_parser
 
 from bot_cab.utils.auth import authenticate_pac_cli, authenticate_az_cli
 from bot_cab.processing.fetchxml_client import FetchXmlClient
-from bot_cab.processing.dataverse_client import DataverseClient
+from bot_cab.processing.session_details import SessionDetailsDecoder
 from bot_cab.config.constants import FETCH_LAST_RUN_FILE, FETCH_LOGS_FILE
 
 logger = logging.getLogger(__name__)
 
+_FLOW_SESSIONS = "flowsessions"
+
+
+def _web_api_row(row: dict) -> dict:
+    """
+    Linha da Web API no formato das colunas do `pac env fetch`
+    ({atributo ou alias.atributo: texto}), sem as anotações OData.
+    """
+    return {k.lower(): "" if v is None else str(v) for k, v in row.items() if "@" not in k}
+
 class Processor:
     def __init__(self, args, unzip_dir: Path):
+        # requests só é necessário com ambiente (o modo --offline não o importa)
+        from bot_cab.processing.dataverse_client import DataverseClient
+
         self.args = args
         self.unzip_dir = unzip_dir
+        self.web_api = getattr(args, "fetch_via", "pac") == "webapi"
 
-        authenticate_pac_cli(
-            environment_name=args.environment_name,
-            pac_auth_mode=args.pac_auth_mode,
-            application_id=args.application_id,
-            tenant_id=args.tenant_id
-        )
+        if not self.web_api:
+            authenticate_pac_cli(
+                environment_name=args.environment_name,
+                pac_auth_mode=args.pac_auth_mode,
+                application_id=args.application_id,
+                tenant_id=args.tenant_id
+            )
         authenticate_az_cli()
 
+        # última execução já consultada (validação incremental), por flow
+        self._last_runs: dict = {}
         self.fetch_client = FetchXmlClient(
             env_url=args.environment_url,
             run_cmd=lambda cmd: __import__("bot_cab.utils.run", fromlist=["run_command"]).run_command(cmd)
@@ -34,9 +54,22 @@ class Processor:
             tenant_id=args.tenant_id
         )
 
-    def get_desktop_flows_name(self) -> list[str]:
+    @property
+    def aggregate_client(self):
+        """
+        Cliente das consultas agregadas (--stats) pelo mesmo caminho dos
+        FetchXML: PAC CLI ou, com fetch_via="webapi", a Web API do ambiente.
+        """
+        return self.dataverse if self.web_api else self.fetch_client
+
+    @staticmethod
+    def list_desktop_flows(unzip_dir: Path) -> list[str]:
+        """
+        Nomes dos Desktop Flows (Category=6) da solution descompactada.
+        Não depende de autenticação.
+        """
         from xml.etree.ElementTree import parse
-        cust = parse(self.unzip_dir / "customizations.xml").getroot()
+        cust = parse(Path(unzip_dir) / "customizations.xml").getroot()
         flows = [
             wf.attrib.get("Name").strip()
             for wf in cust.findall(".//Workflow")
@@ -45,24 +78,31 @@ class Processor:
         logger.debug("Desktop flows encontrados: %s", flows)
         return flows
 
+    def get_desktop_flows_name(self) -> list[str]:
+        return self.list_desktop_flows(self.unzip_dir)
+
     def process(self, flow_name: str) -> dict:
         if not flow_name:
             raise ValueError("flow_name é obrigatório")
 
-        raw_last = self.fetch_client.fetch(
-            template_path=Path(FETCH_LAST_RUN_FILE),
-            replacements={"flow_name": flow_name}
-        )
-        runs = self.fetch_client.parse_runs(raw_last)
-        runs0 = runs["runs"][0]
+        runs0 = self._last_runs.pop(flow_name, None) or self._fetch_last_run(flow_name)
         session_id = runs0["flowsessionid"]
         start_time = self._parse_datetime(runs0["startedon"])
 
-        raw_logs = self.fetch_client.fetch(
-            template_path=Path(FETCH_LOGS_FILE),
-            replacements={"flow_name": flow_name, "session_id": session_id}
-        )
-        details = raw_logs.splitlines()
+        decoder = SessionDetailsDecoder()
+        replacements = {"flow_name": flow_name, "session_id": session_id}
+        if self.web_api:
+            fetch_xml = self.fetch_client.render_xml(Path(FETCH_LOGS_FILE), replacements)
+            for page in self.dataverse.fetch_xml_pages(_FLOW_SESSIONS, fetch_xml):
+                for row in page:
+                    decoder.feed_row(_web_api_row(row))
+        else:
+            self.fetch_client.fetch_lines(
+                template_path=Path(FETCH_LOGS_FILE),
+                replacements=replacements,
+                on_line=decoder.feed
+            )
+        details = decoder.result()
 
         actions = self.dataverse.get_action_logs(session_id)
 
@@ -77,7 +117,36 @@ class Processor:
             "prefix": ""
         }
 
+    def last_run(self, flow_name: str) -> dict:
+        """
+        Última execução do flow ({flowsessionid, startedon}). Fica guardada
+        para o process() seguinte do mesmo flow analisar a mesma sessão.
+        """
+        run = self._fetch_last_run(flow_name)
+        self._last_runs[flow_name] = run
+        return run
+
+    def _fetch_last_run(self, flow_name: str) -> dict:
+        if self.web_api:
+            return self._last_run_web_api(flow_name)
+        raw_last = self.fetch_client.fetch(
+            template_path=Path(FETCH_LAST_RUN_FILE),
+            replacements={"flow_name": flow_name}
+        )
+        runs = self.fetch_client.parse_runs(raw_last)
+        return runs["runs"][0]
+
+    def _last_run_web_api(self, flow_name: str) -> dict:
+        fetch_xml = self.fetch_client.render_xml(Path(FETCH_LAST_RUN_FILE), {"flow_name": flow_name})
+        rows = self.dataverse.fetch_xml(_FLOW_SESSIONS, fetch_xml, max_pages=1)
+        if not rows:
+            raise LookupError(f"nenhuma execução encontrada para '{flow_name}'")
+        row = _web_api_row(rows[0])
+        return {"flowsessionid": row.get("flowsessionid", ""), "startedon": row.get("startedon", "")}
+
     def _parse_datetime(self, timestr: str) -> str:
+        from dateutil import parser as date_parser
+
         try:
             dt = date_parser.parse(timestr)
             return dt.strftime("%Y-%m-%d %H:%M:%S")
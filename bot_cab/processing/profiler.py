@@ -0,0 +1,240 @@
+"""
+Perfil de execução de uma sessão de Desktop Flow a partir do log de ações.
+
+Reconstrói a árvore de chamadas pelo aninhamento de `functionName` (na ordem
+do log) e os tempos de cada ação. Um subfluxo novo só é aninhado no anterior
+se a última ação registrada nele (a chamada) ainda estiver em andamento;
+caso contrário o anterior já terminou e os dois são irmãos.
+Calcula:
+  - tempo próprio (self) e total por subfluxo; o tempo da ação de chamada
+    que cobre um subfluxo conta só no subfluxo (self e pilhas colapsadas);
+  - tempo por tipo de ação (`systemActionName`);
+  - as N ações mais lentas;
+  - pilhas colapsadas ("main;f_Login;ClickBase <µs>") para flame graph.
+Uma única passada sobre as ações (O(n), top-N via heap de tamanho N).
+"""
+
+import heapq
+import logging
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+ROOT_FUNCTION = "main"
+
+# epoch memoizado da parte 'YYYY-MM-DDTHH:MM:SS' dos timestamps
+_SECONDS_CACHE: Dict[str, Optional[float]] = {}
+_SECONDS_CACHE_MAX = 100_000
+
+
+def _timestamp(value: Any) -> Optional[float]:
+    """
+    Converte '2025-05-13T14:19:40.2951812Z' em epoch (float). Aceita até 7+
+    casas decimais (formato do Dataverse), que o fromisoformat não aceita.
+    A parte até os segundos é memoizada: numa sessão, milhares de ações
+    compartilham o mesmo segundo.
+    """
+    if not value:
+        return None
+    s = str(value)
+    if len(s) > 20 and s[19] == "." and s[-1] == "Z" and s[20:-1].isdigit():
+        base_key, frac = s[:19], float("0." + s[20:-1])
+    else:
+        if s.endswith("Z"):
+            s = s[:-1]
+        frac = 0.0
+        dot = s.find(".")
+        if dot != -1:
+            end = dot + 1
+            while end < len(s) and s[end].isdigit():
+                end += 1
+            frac = float("0" + s[dot:end]) if end > dot + 1 else 0.0
+            s = s[:dot] + s[end:]
+        base_key = s
+
+    base = _SECONDS_CACHE.get(base_key)
+    if base is None and base_key not in _SECONDS_CACHE:
+        try:
+            dt = datetime.fromisoformat(base_key)
+        except ValueError:
+            dt = None
+        if dt is not None and dt.tzinfo is None:
+            dt = dt.replace(tzinfo=timezone.utc)
+        base = dt.timestamp() if dt is not None else None
+        if len(_SECONDS_CACHE) > _SECONDS_CACHE_MAX:
+            _SECONDS_CACHE.clear()
+        _SECONDS_CACHE[base_key] = base
+    return None if base is None else base + frac
+
+
+@dataclass
+class _Frame:
+    name: str
+    start: float
+    end: float
+    # fim da última ação registrada neste frame (a chamada, se houver subfluxo)
+    last_action_end: float
+    last_action_key: str = ""
+    # ação do chamador ainda em andamento quando o frame começou (pilha colapsada e fim)
+    call_key: str = ""
+    call_end: float = 0.0
+
+
+@dataclass
+class ExecutionProfile:
+    """
+    Resultado do profiler (tempos em segundos).
+    """
+    total_seconds: float = 0.0
+    action_count: int = 0
+    subflows: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    action_types: Dict[str, Dict[str, float]] = field(default_factory=dict)
+    slowest: List[Dict[str, Any]] = field(default_factory=list)
+    collapsed: Dict[str, int] = field(default_factory=dict)
+
+    def write_collapsed(self, path: Union[str, Path]) -> Path:
+        """
+        Grava as pilhas colapsadas (formato do flamegraph.pl / speedscope), em µs.
+        """
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        with p.open("w", encoding="utf-8") as f:
+            for stack, micros in sorted(self.collapsed.items()):
+                f.write(f"{stack} {micros}\n")
+        logger.info("Flame graph (pilhas colapsadas) salvo em %s", p)
+        return p
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "total_seconds": self.total_seconds,
+            "action_count": self.action_count,
+            "subflows": self.subflows,
+            "action_types": self.action_types,
+            "slowest": self.slowest,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExecutionProfile":
+        return cls(
+            total_seconds=data.get("total_seconds", 0.0),
+            action_count=data.get("action_count", 0),
+            subflows=data.get("subflows", {}),
+            action_types=data.get("action_types", {}),
+            slowest=data.get("slowest", []),
+        )
+
+
+class ActionProfiler:
+    def __init__(self, top_n: int = 10) -> None:
+        self.top_n = top_n
+
+    def profile(self, actions: Iterable[Dict[str, Any]]) -> ExecutionProfile:
+        prof = ExecutionProfile()
+        stack: List[_Frame] = []
+        on_stack: Dict[str, int] = {}
+        stack_key = ""
+        heap: List[Tuple[float, int, Dict[str, Any]]] = []
+        first_start: Optional[float] = None
+        last_end: Optional[float] = None
+
+        def push(name: str, at: float) -> None:
+            nonlocal stack_key
+            frame = _Frame(name, at, at, at)
+            if stack and stack[-1].last_action_end > at:
+                frame.call_key = stack[-1].last_action_key
+                frame.call_end = stack[-1].last_action_end
+            stack.append(frame)
+            on_stack[name] = on_stack.get(name, 0) + 1
+            stack_key = f"{stack_key};{name}" if stack_key else name
+            sub = prof.subflows.setdefault(name, {"calls": 0, "self": 0.0, "total": 0.0})
+            sub["calls"] += 1
+
+        def pop() -> None:
+            nonlocal stack_key
+            frame = stack.pop()
+            on_stack[frame.name] -= 1
+            # recursão: o total só conta na saída da chamada mais externa
+            if not on_stack[frame.name]:
+                prof.subflows[frame.name]["total"] += frame.end - frame.start
+            if stack:
+                stack[-1].end = max(stack[-1].end, frame.end)
+                if frame.call_key:
+                    # a ação de chamada já contou o tempo do subfluxo: tira do chamador
+                    span = max(min(frame.end, frame.call_end) - frame.start, 0.0)
+                    prof.subflows[stack[-1].name]["self"] -= span
+                    micros = prof.collapsed.get(frame.call_key, 0) - int(round(span * 1_000_000))
+                    prof.collapsed[frame.call_key] = max(micros, 0)
+            cut = stack_key.rfind(";")
+            stack_key = stack_key[:cut] if cut != -1 else ""
+
+        for idx, a in enumerate(actions):
+            if not isinstance(a, dict):
+                continue
+            start = _timestamp(a.get("startTime"))
+            end = _timestamp(a.get("endTime"))
+            if start is None:
+                continue
+            if end is None or end < start:
+                end = start
+            duration = end - start
+            func = a.get("functionName") or ROOT_FUNCTION
+            action_name = a.get("systemActionName") or "?"
+
+            if not stack:
+                push(func, start)
+            elif stack[-1].name != func:
+                if on_stack.get(func):
+                    while stack[-1].name != func:
+                        pop()
+                else:
+                    # volta ao chamador dos subfluxos que já terminaram
+                    while len(stack) > 1 and stack[-1].last_action_end <= start:
+                        pop()
+                    push(func, start)
+
+            key = f"{stack_key};{action_name}"
+            top = stack[-1]
+            top.end = max(top.end, end)
+            top.last_action_end = end
+            top.last_action_key = key
+            prof.subflows[func]["self"] += duration
+
+            kind = prof.action_types.setdefault(action_name, {"count": 0, "total": 0.0})
+            kind["count"] += 1
+            kind["total"] += duration
+
+            prof.collapsed[key] = prof.collapsed.get(key, 0) + int(round(duration * 1_000_000))
+
+            entry = (duration, -idx, a)
+            if len(heap) < self.top_n:
+                heapq.heappush(heap, entry)
+            elif duration > heap[0][0]:
+                heapq.heapreplace(heap, entry)
+
+            first_start = start if first_start is None else min(first_start, start)
+            last_end = end if last_end is None else max(last_end, end)
+            prof.action_count += 1
+
+        while stack:
+            pop()
+
+        prof.total_seconds = (last_end - first_start) if first_start is not None else 0.0
+        prof.slowest = [
+            {
+                "action": a.get("systemActionName", ""),
+                "function": a.get("functionName") or ROOT_FUNCTION,
+                "start": a.get("startTime", ""),
+                "seconds": duration,
+            }
+            for duration, _, a in sorted(heap, reverse=True)
+        ]
+        logger.debug("Perfil calculado: %d ações, %d subfluxos, %.3fs",
+                     prof.action_count, len(prof.subflows), prof.total_seconds)
+        return prof
+
+
+def profile_actions(actions: Iterable[Dict[str, Any]], top_n: int = 10) -> ExecutionProfile:
+    return ActionProfiler(top_n=top_n).profile(actions)
@@ -0,0 +1,194 @@
+"""
+RequestGovernor: controla a vazão das chamadas HTTP ao Dataverse frente aos
+limites de proteção do serviço (HTTP 429 + Retry-After).
+
+- Limita as requisições simultâneas a `limit`, ajustado por AIMD: cresce
+  +1 a cada `limit` respostas rápidas e cai pela metade em 429 (ou latência
+  acima do alvo), no máximo uma redução por janela de cooldown.
+- Em 429/503, bloqueia novas requisições até o fim do Retry-After e repete
+  a requisição (backoff exponencial quando o header não vem).
+- Um governor por ambiente (host), compartilhado por todos os clientes.
+"""
+
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable, Dict, Iterator, Optional
+from urllib.parse import urlparse
+
+from bot_cab.config.constants import (
+    GOVERNOR_INITIAL_CONCURRENCY,
+    GOVERNOR_MAX_CONCURRENCY,
+    GOVERNOR_MAX_RETRIES,
+    GOVERNOR_LATENCY_TARGET_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUS = (429, 503)
+_DECREASE_COOLDOWN_SECONDS = 1.0
+_MAX_BACKOFF_SECONDS = 60.0
+
+
+def _retry_after_seconds(value: Optional[str]) -> Optional[float]:
+    """
+    Retry-After pode vir em segundos ou como data HTTP.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RequestGovernor:
+    def __init__(self,
+                 name: str = "",
+                 initial: int = GOVERNOR_INITIAL_CONCURRENCY,
+                 min_limit: int = 1,
+                 max_limit: int = GOVERNOR_MAX_CONCURRENCY,
+                 max_retries: int = GOVERNOR_MAX_RETRIES,
+                 latency_target: float = GOVERNOR_LATENCY_TARGET_SECONDS):
+        self.name = name
+        self.min_limit = min_limit
+        self.max_limit = max(min_limit, max_limit)
+        self.max_retries = max_retries
+        self.latency_target = latency_target
+
+        self._limit = float(min(max(initial, min_limit), self.max_limit))
+        self._in_flight = 0
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._cond = threading.Condition()
+
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Estado atual (para logs e métricas).
+        """
+        with self._cond:
+            return {
+                "name": self.name,
+                "limit": self.limit,
+                "in_flight": self._in_flight,
+                "blocked_for": round(max(0.0, self._blocked_until - time.monotonic()), 3),
+                "requests": self.requests,
+                "throttled": self.throttled,
+                "retries": self.retries,
+            }
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """
+        Aguarda uma vaga (respeitando limite e Retry-After) e a libera ao final.
+        """
+        with self._cond:
+            while True:
+                wait_for = self._blocked_until - time.monotonic()
+                if wait_for <= 0 and self._in_flight < self.limit:
+                    break
+                self._cond.wait(timeout=wait_for if wait_for > 0 else None)
+            self._in_flight += 1
+            self.requests += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._in_flight -= 1
+                self._cond.notify_all()
+
+    def on_success(self, latency: float) -> None:
+        if latency > self.latency_target:
+            self._decrease(f"latência {latency:.1f}s acima do alvo")
+            return
+        with self._cond:
+            if self._limit < self.max_limit:
+                old = self.limit
+                self._limit = min(self.max_limit, self._limit + 1.0 / self._limit)
+                if self.limit != old:
+                    logger.debug("Governor %s: limite %d -> %d", self.name, old, self.limit)
+                    self._cond.notify_all()
+
+    def on_throttle(self, retry_after: float) -> None:
+        with self._cond:
+            self.throttled += 1
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        self._decrease(f"throttling, aguardando {retry_after:.1f}s")
+
+    def _decrease(self, reason: str) -> None:
+        with self._cond:
+            now = time.monotonic()
+            if now - self._last_decrease < _DECREASE_COOLDOWN_SECONDS:
+                return
+            self._last_decrease = now
+            old = self.limit
+            self._limit = max(float(self.min_limit), self._limit / 2)
+            new, in_flight = self.limit, self._in_flight
+        logger.warning("Governor %s: %s; limite %d -> %d (em voo: %d)",
+                       self.name, reason, old, new, in_flight)
+
+    def request(self, send: Callable[[], Any]) -> Any:
+        """
+        Executa `send()` (ex.: lambda: session.get(...)) sob o governor,
+        repetindo em 429/503. Retorna a última resposta (o chamador decide
+        sobre raise_for_status).
+        """
+        attempt = 0
+        while True:
+            with self.slot():
+                t0 = time.monotonic()
+                resp = send()
+                latency = time.monotonic() - t0
+
+            if resp.status_code not in THROTTLE_STATUS:
+                self.on_success(latency)
+                return resp
+
+            retry_after = _retry_after_seconds(resp.headers.get("Retry-After"))
+            if retry_after is None:
+                retry_after = min(_MAX_BACKOFF_SECONDS, 2.0 ** attempt)
+            if attempt >= self.max_retries:
+                logger.error("Governor %s: desistindo após %d tentativas (HTTP %d).",
+                             self.name, attempt + 1, resp.status_code)
+                return resp
+            self.on_throttle(retry_after)
+            attempt += 1
+            with self._cond:
+                self.retries += 1
+
+
+_GOVERNORS: Dict[str, RequestGovernor] = {}
+_GOVERNORS_LOCK = threading.Lock()
+
+
+def get_governor(env_url: str) -> RequestGovernor:
+    """
+    Governor compartilhado do ambiente (os limites do Dataverse são por
+    usuário/ambiente, então todo o tráfego para o mesmo host passa por ele).
+    """
+    host = urlparse(env_url).netloc or env_url
+    with _GOVERNORS_LOCK:
+        gov = _GOVERNORS.get(host)
+        if gov is None:
+            gov = _GOVERNORS[host] = RequestGovernor(name=host)
+        return gov
+
+
+def all_governors() -> Dict[str, RequestGovernor]:
+    with _GOVERNORS_LOCK:
+        return dict(_GOVERNORS)
@@ -7,26 +7,80 @@ sobre o resultado de um Desktop Flow e a solução descompactada.
 
 import logging
 from abc import ABC, abstractproperty
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import List, Tuple, Iterator
+from typing import Any, Dict, List, Optional, Tuple, Iterator
+
+from bot_cab.processing.session_details import SessionDetails
+from bot_cab.processing.desktop_scripts import CLEANUP_FUNCTION, MAIN_FUNCTION, DesktopFlowIndex
+from bot_cab.config.enums import IssueCategory
+from bot_cab.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+_ACTIONS_PROCESSED = metrics.counter(
+    "bot_cab_actions_processed", "Ações de log avaliadas pela RulesEngine.")
+_ISSUES = metrics.counter(
+    "bot_cab_issues", "Issues encontradas, por categoria.", ("category",))
+
+# Prefixo obrigatório dos subfluxos.
+SUBFLOW_PREFIX = "f_"
+# Nomes isentos do prefixo: no log de ações (regra original) só Main; no
+# script também o subfluxo de limpeza, exigido por _check_script.
+LOG_EXEMPT_SUBFLOWS = (MAIN_FUNCTION,)
+SCRIPT_EXEMPT_SUBFLOWS = (MAIN_FUNCTION, CLEANUP_FUNCTION)
+# Regra da issue que registra uma análise que falhou (exit code 2, não 1).
+RULE_ANALYSIS_FAILED = "analysis_failed"
+
 # --- Issue e IssueGroup -----------------------------------------------------
 
-@dataclass(frozen=True)
+# Locais de exemplo guardados por issue agregada.
+MAX_ISSUE_SAMPLES = 3
+
+IssueKey = Tuple[str, str, str]
+
+@dataclass
 class Issue:
     """
-    Representa uma issue detectada, com categoria e mensagem.
+    Representa um problema distinto detectado (categoria + regra + sujeito),
+    com o número de ocorrências e alguns locais de exemplo.
     """
     category: str
     message: str
+    rule: str = ""
+    subject: str = ""
+    count: int = 1
+    samples: List[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> IssueKey:
+        return (self.category, self.rule or self.message, self.subject)
+
+    def display(self) -> str:
+        """
+        Mensagem para o relatório, com o total de ocorrências quando > 1.
+        """
+        if self.count <= 1:
+            return self.message
+        count = format(self.count, ",").replace(",", " ")
+        return f"{self.message.rstrip('.')} (×{count})"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "message": self.message,
+            "rule": self.rule,
+            "subject": self.subject,
+            "count": self.count,
+            "samples": list(self.samples),
+        }
 
 class IssueGroup(ABC):
     """
     Agrupa issues por categoria.
     Subclasses devem definir a propriedade `category`.
+
+    Ocorrências repetidas do mesmo problema (mesma regra e sujeito, ou a mesma
+    mensagem quando não há regra) são agregadas em uma única Issue.
     """
     @property
     @abstractproperty
@@ -35,14 +89,24 @@ class IssueGroup(ABC):
 
     def __init__(self) -> None:
         self.issues: List[Issue] = []
+        self._by_key: Dict[IssueKey, Issue] = {}
 
-    def add(self, message: str) -> None:
+    def add(self, message: str, rule: str = "", subject: str = "",
+            location: Optional[str] = None) -> None:
         """
-        Adiciona uma nova issue ao grupo.
+        Registra uma ocorrência de issue. `location` (ex.: a ação que a
+        causou) é guardado como exemplo, até MAX_ISSUE_SAMPLES por issue.
         """
-        issue = Issue(self.category, message)
-        self.issues.append(issue)
-        logger.debug("Issue adicionada [%s]: %s", self.category, message)
+        key = (self.category, rule or message, subject)
+        issue = self._by_key.get(key)
+        if issue is None:
+            issue = Issue(self.category, message, rule, subject, count=0)
+            self._by_key[key] = issue
+            self.issues.append(issue)
+            logger.debug("Issue adicionada [%s]: %s", self.category, message)
+        issue.count += 1
+        if location and len(issue.samples) < MAX_ISSUE_SAMPLES:
+            issue.samples.append(location)
 
     def has_issues(self) -> bool:
         """
@@ -59,11 +123,53 @@ class IssueGroup(ABC):
     def __iter__(self) -> Iterator[Issue]:
         return iter(self.issues)
 
+    @property
+    def occurrences(self) -> int:
+        """
+        Total de ocorrências (soma das contagens das issues distintas).
+        """
+        return sum(issue.count for issue in self.issues)
+
     def get_messages(self) -> List[str]:
         """
-        Retorna apenas as mensagens.
+        Retorna apenas as mensagens (com o total de ocorrências).
         """
-        return [issue.message for issue in self.issues]
+        return [issue.display() for issue in self.issues]
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"category": self.category, "issues": [i.to_dict() for i in self.issues]}
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "IssueGroup":
+        """
+        Recria o grupo (da subclasse da categoria) a partir de to_dict().
+        """
+        cls = _GROUPS_BY_CATEGORY.get(data.get("category", ""), ValidationIssues)
+        group = cls()
+        group.merge(data.get("issues", []))
+        return group
+
+    def merge(self, items: List[Dict[str, Any]]) -> None:
+        """
+        Soma issues já agregadas (formato de Issue.to_dict()) a este grupo.
+        """
+        for item in items:
+            issue = Issue(
+                self.category,
+                item.get("message", ""),
+                item.get("rule", ""),
+                item.get("subject", ""),
+                count=item.get("count", 1),
+                samples=list(item.get("samples", [])),
+            )
+            existing = self._by_key.get(issue.key)
+            if existing is None:
+                self._by_key[issue.key] = issue
+                self.issues.append(issue)
+                continue
+            existing.count += issue.count
+            room = MAX_ISSUE_SAMPLES - len(existing.samples)
+            existing.samples += issue.samples[:max(room, 0)]
 
 class SubFlowIssues(IssueGroup):
     @property
@@ -90,8 +196,28 @@ class SecurityIssues(IssueGroup):
     def category(self) -> str:
         return "Security"
 
+class CloudFlowIssues(IssueGroup):
+    @property
+    def category(self) -> str:
+        return "CloudFlow"
+
+_GROUPS_BY_CATEGORY = {
+    cls().category: cls
+    for cls in (SubFlowIssues, ExecutionIssues, ValidationIssues, SolutionIssues, SecurityIssues,
+                CloudFlowIssues)
+}
+
 # --- RulesEngine ------------------------------------------------------------
 
+def _follows_subflow_naming(name: str, exempt: Tuple[str, ...]) -> bool:
+    """
+    Regra de naming comum ao log de ações e ao script: prefixo 'f_', ou
+    um dos nomes isentos (em minúsculas).
+    """
+    lowered = name.lower()
+    return lowered.startswith(SUBFLOW_PREFIX) or lowered in exempt
+
+
 class RulesEngine:
     """
     Aplica validações em:
@@ -102,7 +228,7 @@ class RulesEngine:
     """
 
     def __init__(self,
-                 details: List[str],
+                 details: SessionDetails,
                  actions: List[dict],
                  unzipped_folder: Path,
                  prefix: str):
@@ -128,7 +254,20 @@ class RulesEngine:
         self._check_security()
         self._check_subflows()
         self._check_solution_structure()
+        return self._collect()
 
+    def analyze_script(self, index: DesktopFlowIndex) -> Tuple[List[IssueGroup], bool]:
+        """
+        Checagens que dependem só do código do Desktop Flow (modo offline):
+        naming de subfluxos, CALLs para subfluxos inexistentes, subfluxo de
+        limpeza alcançável a partir de Main, e a estrutura da Solution.
+        """
+        logger.info("Iniciando análise estática do script de %s", index.flow)
+        self._check_script(index)
+        self._check_solution_structure()
+        return self._collect()
+
+    def _collect(self) -> Tuple[List[IssueGroup], bool]:
         all_groups = [
             self.subflow_issues,
             self.execution_issues,
@@ -138,19 +277,26 @@ class RulesEngine:
         ]
         groups_with_issues = [g for g in all_groups if g]
         has_issues = bool(groups_with_issues)
+
+        _ACTIONS_PROCESSED.inc(len(self.actions or []))
+        for g in groups_with_issues:
+            _ISSUES.inc(g.occurrences, category=IssueCategory(g.category).value)
         logger.info("Análise finalizada: %d grupos com issues", len(groups_with_issues))
         return groups_with_issues, has_issues
 
     def _check_execution(self) -> None:
         """
         Verifica:
-         - execução bem sucedida ('Succeeded' em details),
+         - execução bem sucedida (statuscode da sessão em details),
          - presença de logs action-by-action,
          - existência de 'LogMessage' e 'Empty'
         """
         logger.debug("Verificando execução do Desktop Flow")
-        #if not any("Succeeded" in d for d in self.details):
-        #    self.execution_issues.add("Desktop Flow não foi executado com sucesso.")
+        if self.details is not None and self.details.failed:
+            msg = f"Desktop Flow não foi executado com sucesso (status {self.details.status.name})."
+            if self.details.error_code:
+                msg += f" Erro {self.details.error_code}: {self.details.error_message}"
+            self.execution_issues.add(msg)
         if not self.actions:
             self.execution_issues.add("Nenhum log de ação disponível.")
         #if not any(a.get("systemActionName") == "LogMessage" for a in self.actions):
@@ -174,11 +320,43 @@ class RulesEngine:
         Verifica se funções/subfluxos seguem prefixo 'f_' ou são 'main'.
         """
         logger.debug("Verificando naming de subfluxos")
-        for a in self.actions:
+        for i, a in enumerate(self.actions):
             func = a.get("functionName", "")
-            if func and not func.lower().startswith("f_") and func.lower() != "main":
-                self.subflow_issues.add(f"SubFluxo '{func}' não segue prefixo 'f_'.")
+            if func and not _follows_subflow_naming(func, LOG_EXEMPT_SUBFLOWS):
+                self.subflow_issues.add(
+                    f"SubFluxo '{func}' não segue prefixo 'f_'.",
+                    rule="subflow_prefix",
+                    subject=func,
+                    location=f"ação #{i} {a.get('systemActionName', '')} {a.get('startTime', '')}".strip(),
+                )
     
+    def _check_script(self, index: DesktopFlowIndex) -> None:
+        """
+        Mesmas regras de _check_subflows/_check_execution, sobre o índice do script.
+        """
+        logger.debug("Verificando script do Desktop Flow")
+        if not index.functions:
+            self.execution_issues.add("Script do Desktop Flow não encontrado ou vazio.")
+            return
+        for name, fn in index.functions.items():
+            if not _follows_subflow_naming(name, SCRIPT_EXEMPT_SUBFLOWS):
+                self.subflow_issues.add(
+                    f"SubFluxo '{name}' não segue prefixo 'f_'.",
+                    rule="subflow_prefix",
+                    subject=name,
+                    location=f"linha {fn['line']}",
+                )
+        for caller, callee, line in index.calls:
+            if index.function(callee) is None:
+                self.subflow_issues.add(
+                    f"CALL para subfluxo inexistente '{callee}'.",
+                    rule="undefined_subflow",
+                    subject=callee,
+                    location=f"{caller}, linha {line}",
+                )
+        if CLEANUP_FUNCTION not in index.reachable():
+            self.execution_issues.add("SubFluxo de limpeza ('Empty') não é chamado a partir de Main.")
+
     def _check_solution_structure(self) -> None:
         """
         Verifica estrutura da solução descompactada:
@@ -0,0 +1,289 @@
+"""
+FlowScheduler: executa a análise dos Desktop Flows respeitando um prazo total.
+
+- Ordena os flows pelo custo esperado (histórico de tempos / tamanho do log de ações).
+- Não inicia um flow cujo custo esperado não cabe no tempo restante.
+- Ao atingir o prazo (ou receber SIGTERM/SIGINT, ou o evento `stop`), devolve
+  o que já terminou e marca o restante como pulado, para que o relatório
+  parcial sempre seja gravado.
+- Em modo fail-fast, na primeira issue encontrada descarta os flows pendentes
+  e os que ainda estão nos estágios.
+- `run_pipeline` executa cada flow em estágios (StagedPipeline) com filas limitadas.
+"""
+
+import json
+import logging
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, Union
+
+from bot_cab.processing.pipeline import Stage, StagedPipeline
+from bot_cab.utils.shard import parse_shard
+
+logger = logging.getLogger(__name__)
+
+# Custo assumido para flows sem histórico.
+DEFAULT_FLOW_COST_SECONDS = 60.0
+# Estimativa a partir do tamanho do log de ações (quando só há a contagem).
+BASE_FLOW_COST_SECONDS = 15.0
+SECONDS_PER_ACTION = 0.002
+# Intervalo para reavaliar admissão, prazo e parada enquanto há flows em andamento.
+_POLL_SECONDS = 0.2
+# Folga reservada no fim do prazo para gravar relatório/CSVs.
+MIN_RESERVE_SECONDS = 5.0
+RESERVE_FRACTION = 0.05
+
+STATUS_DONE    = "done"
+STATUS_SKIPPED = "skipped"
+STATUS_FAILED  = "failed"
+
+FlowTask = Callable[[str], Tuple[Dict[str, Any], list, bool]]
+
+
+@dataclass
+class FlowOutcome:
+    """
+    Resultado da execução (ou não) de um flow pelo scheduler.
+    """
+    flow: str
+    status: str
+    result: Dict[str, Any] = field(default_factory=dict)
+    groups: list = field(default_factory=list)
+    has_issues: bool = False
+    elapsed: float = 0.0
+    reason: str = ""
+
+
+class TimingHistory:
+    """
+    Histórico de custo por flow, persistido em JSON:
+      {"<flow>": {"seconds": 12.3, "actions": 4567}, ...}
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, float]]] = None) -> None:
+        self.entries: Dict[str, Dict[str, float]] = dict(entries or {})
+
+    @classmethod
+    def load(cls, path: Optional[Union[str, Path]]) -> "TimingHistory":
+        if not path or not Path(path).is_file():
+            return cls()
+        try:
+            return cls(json.loads(Path(path).read_text(encoding="utf-8")))
+        except (ValueError, OSError) as e:
+            logger.warning("Histórico de tempos inválido em %s: %s", path, e)
+            return cls()
+
+    def save(self, path: Union[str, Path]) -> None:
+        p = Path(path)
+        p.parent.mkdir(parents=True, exist_ok=True)
+        p.write_text(json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8")
+        logger.debug("Histórico de tempos salvo em %s", p)
+
+    def record(self, flow: str, seconds: float, actions: int) -> None:
+        self.entries[flow] = {"seconds": round(seconds, 3), "actions": actions}
+
+    def merge(self, other: "TimingHistory") -> None:
+        """
+        Junta o histórico de outra execução (ex.: outro ambiente); para um
+        flow presente nos dois, fica o maior tempo, que é o que limita o prazo.
+        """
+        for flow, entry in other.entries.items():
+            mine = self.entries.get(flow)
+            if mine is None or entry.get("seconds", 0) >= mine.get("seconds", 0):
+                self.entries[flow] = dict(entry)
+
+    def _known_costs(self) -> List[float]:
+        return [e["seconds"] for e in self.entries.values() if e.get("seconds")]
+
+    def estimate(self, flow: str) -> float:
+        """
+        Custo esperado em segundos: tempo da última execução; senão, derivado
+        do nº de ações; senão, a mediana dos flows conhecidos (ou o default).
+        """
+        entry = self.entries.get(flow, {})
+        if entry.get("seconds"):
+            return float(entry["seconds"])
+        if entry.get("actions"):
+            return BASE_FLOW_COST_SECONDS + SECONDS_PER_ACTION * float(entry["actions"])
+        known = self._known_costs()
+        return statistics.median(known) if known else DEFAULT_FLOW_COST_SECONDS
+
+
+def assign_shard(flows: List[str], history: TimingHistory, index: int, count: int) -> List[str]:
+    """
+    Particiona os flows em `count` shards balanceados pelo custo esperado
+    (LPT: do mais caro ao mais barato, cada flow vai para o shard com menor
+    carga; empates pelo menor índice) e retorna os do shard `index` (1-based).
+    Determinístico: todos os agentes calculam a mesma partição a partir do
+    mesmo histórico.
+    """
+    loads = [0.0] * count
+    assigned: Dict[int, List[str]] = {i: [] for i in range(count)}
+    for flow in sorted(set(flows), key=lambda f: (-history.estimate(f), f)):
+        target = min(range(count), key=lambda i: (loads[i], i))
+        loads[target] += history.estimate(flow)
+        assigned[target].append(flow)
+    chosen = set(assigned[index - 1])
+    logger.info("Shard %d/%d: %d de %d flows (custo esperado %.1fs)",
+                index, count, len(chosen), len(flows), loads[index - 1])
+    return [f for f in flows if f in chosen]
+
+
+class FlowScheduler:
+    def __init__(self,
+                 flows: List[str],
+                 history: Optional[TimingHistory] = None,
+                 deadline: Optional[float] = None,
+                 max_workers: int = 1,
+                 fail_fast: bool = False,
+                 started_at: Optional[float] = None,
+                 stop: Optional[threading.Event] = None):
+        self.flows = list(flows)
+        self.history = history or TimingHistory()
+        self.deadline = deadline
+        self.max_workers = max(1, max_workers)
+        self.fail_fast = fail_fast
+        self.started_at = time.monotonic() if started_at is None else started_at
+        self.reserve = max(MIN_RESERVE_SECONDS, RESERVE_FRACTION * deadline) if deadline else 0.0
+        # Sinal externo de parada (ex.: SIGTERM tratado em outra thread).
+        self.stop = stop
+
+    def order(self) -> List[str]:
+        """
+        Com prazo, menores primeiro (maximiza flows concluídos no orçamento);
+        sem prazo, maiores primeiro (reduz o tempo total com vários workers).
+        Empates por nome, para a ordem ser determinística.
+        """
+        cost = {f: self.history.estimate(f) for f in self.flows}
+        if self.deadline:
+            return sorted(self.flows, key=lambda f: (cost[f], f))
+        return sorted(self.flows, key=lambda f: (-cost[f], f))
+
+    def remaining(self) -> Optional[float]:
+        """
+        Segundos ainda disponíveis para trabalho (já descontada a reserva).
+        """
+        if not self.deadline:
+            return None
+        return self.deadline - self.reserve - (time.monotonic() - self.started_at)
+
+    def _fits(self, flow: str) -> bool:
+        remaining = self.remaining()
+        return remaining is None or self.history.estimate(flow) <= remaining
+
+    def run(self, task: FlowTask) -> List[FlowOutcome]:
+        """
+        Executa `task(flow) -> (result, groups, has_issues)` para cada flow,
+        até `max_workers` em paralelo (threads daemon do pipeline: um flow
+        abandonado no prazo não impede o processo de terminar).
+        Retorna um FlowOutcome por flow, na ordem original da lista.
+        """
+        return self.run_pipeline([Stage("analise", task, workers=self.max_workers)])
+
+    def run_pipeline(self, stages: Sequence[Stage]) -> List[FlowOutcome]:
+        """
+        Como `run`, mas cada flow atravessa os estágios (ex.: busca -> regras
+        -> exportação) de um StagedPipeline; o último estágio devolve
+        (result, groups, has_issues). Um flow só é admitido quando há worker
+        livre no primeiro estágio (prazo e fail-fast valem como em `run`), e o
+        tempo registrado no histórico é a soma do processamento nos estágios
+        (sem a espera em fila). As threads são daemon: flows abandonados no
+        prazo não seguram o fim do processo.
+        """
+        pipeline = StagedPipeline(stages)
+        logger.debug("Pipeline: %s", " -> ".join(f"{s.name}×{s.workers}" for s in stages))
+        return self._run(pipeline)
+
+    def _run(self, pipeline: StagedPipeline) -> List[FlowOutcome]:
+        pending: Deque[str] = deque(self.order())
+        running: Dict[Future, Tuple[str, float]] = {}
+        outcomes: Dict[str, FlowOutcome] = {}
+        stop_reason = ""
+        abandoned = False
+        completed = False
+
+        def skip_all(flows, reason: str) -> None:
+            for f in flows:
+                outcomes[f] = FlowOutcome(f, STATUS_SKIPPED, reason=reason)
+
+        def abandon(reason: str, pending_reason: str = "") -> None:
+            nonlocal abandoned
+            skip_all([f for f, _ in running.values()], reason)
+            skip_all(pending, pending_reason or reason)
+            running.clear()
+            pending.clear()
+            abandoned = True
+
+        try:
+            while pending or running:
+                if self.stop is not None and self.stop.is_set():
+                    logger.error("Parada solicitada com %d flows em andamento.", len(running))
+                    abandon("execução interrompida")
+                    break
+
+                while pending and not stop_reason and pipeline.accepting:
+                    flow = pending[0]
+                    if not self._fits(flow):
+                        stop_reason = "prazo insuficiente (--deadline)"
+                        logger.warning("Orçamento de tempo esgotado: %d flows não serão iniciados.", len(pending))
+                        break
+                    pending.popleft()
+                    logger.debug("Iniciando flow %s (custo esperado %.1fs)", flow, self.history.estimate(flow))
+                    running[pipeline.submit(flow)] = (flow, time.monotonic())
+
+                if stop_reason and pending:
+                    skip_all(pending, stop_reason)
+                    pending.clear()
+                if not running:
+                    break
+
+                remaining = self.remaining()
+                timeout = _POLL_SECONDS if remaining is None else max(min(remaining, _POLL_SECONDS), 0)
+                done, _ = wait(list(running), timeout=timeout, return_when=FIRST_COMPLETED)
+                if not done:
+                    if remaining is not None and self.remaining() <= 0:
+                        logger.error("Prazo atingido com %d flows em andamento.", len(running))
+                        abandon("prazo atingido durante a execução", "prazo insuficiente (--deadline)")
+                        break
+                    continue
+
+                for fut in done:
+                    flow, t0 = running.pop(fut)
+                    outcome = self._collect(fut, flow, t0)
+                    outcomes[flow] = outcome
+                    if self.fail_fast and outcome.status != STATUS_SKIPPED and \
+                            (outcome.has_issues or outcome.status == STATUS_FAILED) and not stop_reason:
+                        stop_reason = f"fail-fast: issue bloqueante em '{flow}'"
+                        logger.warning("Fail-fast: cancelando %d flows pendentes e %d em andamento após '%s'.",
+                                       len(pending), len(running), flow)
+                if stop_reason.startswith("fail-fast") and (running or pending):
+                    # Descarta o que está em fila nos estágios sem esperar.
+                    abandon(stop_reason)
+                    break
+        except KeyboardInterrupt:
+            logger.error("Execução interrompida; gravando resultados parciais.")
+            skip_all([f for f, _ in running.values()], "execução interrompida")
+            skip_all(pending, "execução interrompida")
+        else:
+            completed = not abandoned
+        finally:
+            pipeline.shutdown(wait=completed)
+
+        return [outcomes[f] for f in self.flows]
+
+    def _collect(self, fut: Future, flow: str, t0: float) -> FlowOutcome:
+        try:
+            (result, groups, has_issues), elapsed = fut.result()
+        except Exception as e:
+            elapsed = time.monotonic() - t0
+            logger.error("Falha ao analisar flow %s: %s", flow, e, exc_info=True)
+            return FlowOutcome(flow, STATUS_FAILED, elapsed=elapsed, reason=str(e))
+
+        self.history.record(flow, elapsed, len(result.get("actions") or []))
+        logger.info("Flow %s concluído em %.1fs", flow, elapsed)
+        return FlowOutcome(flow, STATUS_DONE, result, groups, has_issues, elapsed)
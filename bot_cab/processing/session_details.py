@@ -0,0 +1,197 @@
+"""
+Decodifica a saída tabular do `pac env fetch` para o fetch-logs.xml.
+
+O outer join com `flowlog` repete as colunas da sessão em toda linha de log;
+aqui a sessão é guardada uma única vez e cada flowlog vira uma tupla compacta,
+sem duplicatas. Os objetos FlowLogEntry (e o JSON de `data`) só são montados
+quando `SessionDetails.logs` / `FlowLogEntry.data` são acessados.
+"""
+
+import json
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from bot_cab.config.enums import FlowSessionStatus
+
+logger = logging.getLogger(__name__)
+
+# Colunas de flowlog conforme os atributos/aliases do fetch-logs.xml
+# (mesma ordem dos campos de FlowLogEntry).
+_LOG_COLUMNS = ("fl.flowlogid", "fl.createdon", "fl.type", "fl.level", "fl.data",
+                "wqi.name", "wqi.createdon")
+
+_GUID_RE = re.compile(r"[0-9A-Fa-f]{8}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{4}-[0-9A-Fa-f]{12}")
+
+
+@dataclass(frozen=True)
+class FlowLogEntry:
+    """
+    Uma linha de `flowlog` (com o work queue item associado, se houver).
+    """
+    flowlogid: str
+    createdon: str
+    type: str
+    level: str
+    raw_data: str
+    workqueueitem: str = ""
+    workqueueitem_createdon: str = ""
+
+    @property
+    def data(self) -> Any:
+        """
+        Conteúdo de `data` decodificado como JSON (ou o texto cru, se não for JSON).
+        """
+        if not self.raw_data:
+            return None
+        try:
+            return json.loads(self.raw_data)
+        except ValueError:
+            return self.raw_data
+
+
+@dataclass
+class SessionDetails:
+    """
+    Sessão decodificada do fetch-logs.xml.
+    """
+    session_id: str = ""
+    flow_name: str = ""
+    started_on: str = ""
+    completed_on: str = ""
+    status: FlowSessionStatus = FlowSessionStatus.UNKNOWN
+    error_code: str = ""
+    error_message: str = ""
+    user: str = ""
+    _log_rows: List[Tuple[str, ...]] = field(default_factory=list, repr=False)
+    _logs: Optional[List[FlowLogEntry]] = field(default=None, repr=False)
+
+    @property
+    def succeeded(self) -> bool:
+        return self.status is FlowSessionStatus.SUCCEEDED
+
+    @property
+    def failed(self) -> bool:
+        return self.status.is_failure
+
+    @property
+    def log_count(self) -> int:
+        return len(self._log_rows)
+
+    @property
+    def logs(self) -> List[FlowLogEntry]:
+        if self._logs is None:
+            self._logs = [FlowLogEntry(*row) for row in self._log_rows]
+        return self._logs
+
+    def to_dict(self, include_logs: bool = True) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "flow_name": self.flow_name,
+            "started_on": self.started_on,
+            "completed_on": self.completed_on,
+            "status": self.status.name,
+            "error_code": self.error_code,
+            "error_message": self.error_message,
+            "user": self.user,
+            "logs": [list(row) for row in self._log_rows] if include_logs else [],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SessionDetails":
+        return cls(
+            session_id=data.get("session_id", ""),
+            flow_name=data.get("flow_name", ""),
+            started_on=data.get("started_on", ""),
+            completed_on=data.get("completed_on", ""),
+            status=FlowSessionStatus.parse(data.get("status", "")),
+            error_code=data.get("error_code", ""),
+            error_message=data.get("error_message", ""),
+            user=data.get("user", ""),
+            _log_rows=[tuple(row) for row in data.get("logs", [])],
+        )
+
+
+def _column_spans(header: str) -> List[Tuple[str, int]]:
+    return [(m.group(0).lower(), m.start()) for m in re.finditer(r"\S+", header)]
+
+
+class SessionDetailsDecoder:
+    """
+    Decodificador incremental: recebe as linhas do stdout do `pac env fetch`
+    uma a uma (feed) e monta o SessionDetails sem guardar o texto bruto.
+
+    A tabela do PAC CLI tem largura fixa: as posições das colunas são tiradas
+    do cabeçalho (linha que contém 'flowsessionid') e cada linha é fatiada
+    por essas posições; linhas antes do cabeçalho (status de conexão) são ignoradas.
+    """
+
+    def __init__(self) -> None:
+        self.details = SessionDetails()
+        self._columns: List[Tuple[str, int]] = []
+        self._seen_logs = set()
+        self._session_filled = False
+
+    def feed(self, line: str) -> None:
+        if not self._columns:
+            if re.search(r"(^|\s)flowsessionid(\s|$)", line, re.IGNORECASE):
+                self._columns = _column_spans(line)
+            return
+        if not line.strip() or set(line.strip()) <= {"-", " "}:
+            return
+
+        self.feed_row(self._slice(line))
+
+    def feed_row(self, row: Dict[str, str]) -> None:
+        """
+        Uma linha já separada em colunas ({atributo ou alias.atributo: valor}),
+        ex.: uma linha do FetchXML executado pela Web API.
+        """
+        if not _GUID_RE.fullmatch(row.get("flowsessionid", "")):
+            return
+        if not self._session_filled:
+            self._fill_session(row)
+
+        log_id = row.get("fl.flowlogid", "")
+        if log_id and log_id not in self._seen_logs:
+            self._seen_logs.add(log_id)
+            self.details._log_rows.append(tuple(row.get(c, "") for c in _LOG_COLUMNS))
+
+    def feed_all(self, lines: Iterable[str]) -> "SessionDetailsDecoder":
+        for line in lines:
+            self.feed(line)
+        return self
+
+    def _slice(self, line: str) -> Dict[str, str]:
+        row: Dict[str, str] = {}
+        for i, (name, start) in enumerate(self._columns):
+            end = self._columns[i + 1][1] if i + 1 < len(self._columns) else None
+            row[name] = line[start:end].strip()
+        return row
+
+    def _fill_session(self, row: Dict[str, str]) -> None:
+        d = self.details
+        d.session_id = row.get("flowsessionid", "")
+        d.flow_name = row.get("wf.name", "")
+        d.started_on = row.get("startedon", "")
+        d.completed_on = row.get("completedon", "")
+        d.status = FlowSessionStatus.parse(row.get("statuscode", ""))
+        d.error_code = row.get("errorcode", "")
+        d.error_message = row.get("errormessage", "")
+        d.user = row.get("user.domainname", "") or row.get("user.fullname", "")
+        self._session_filled = True
+
+    def result(self) -> SessionDetails:
+        if not self._columns and not self._session_filled:
+            logger.warning("Cabeçalho 'flowsessionid' não encontrado na saída do FetchXML de logs.")
+        logger.debug("Sessão %s decodificada: status=%s, %d flowlogs",
+                     self.details.session_id, self.details.status.name, self.details.log_count)
+        return self.details
+
+
+def decode_session_details(raw: str) -> SessionDetails:
+    """
+    Atalho para decodificar uma saída já capturada como str.
+    """
+    return SessionDetailsDecoder().feed_all(raw.splitlines()).result()
@@ -0,0 +1,154 @@
+"""
+Estatísticas de execução dos Desktop Flows da solution, calculadas pelo
+próprio Dataverse (FetchXML agregado): execuções por status, frequência dos
+códigos de erro e backlog de work queue items (o link `workqueueitem` do
+fetch-logs.xml). Cada métrica custa uma única resposta pequena, com uma linha
+por grupo, em vez de baixar as linhas brutas e contar localmente.
+"""
+
+import logging
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Tuple
+
+from bot_cab.processing.fetchxml_client import (
+    AggregateColumn,
+    AggregateQuery,
+    Condition,
+    FetchXmlClient,
+    LinkEntity,
+)
+from bot_cab.utils import metrics
+
+logger = logging.getLogger(__name__)
+
+_STATS_QUERIES = metrics.counter(
+    "bot_cab_stats_queries", "Consultas agregadas de estatísticas por resultado.", ("metric", "result"))
+
+
+@dataclass
+class StatsTable:
+    """
+    Resultado de uma métrica: colunas (alias, rótulo) e uma linha por grupo.
+    `error` guarda o motivo quando a consulta falhou (ex.: limite de 50 000
+    registros das consultas agregadas).
+    """
+    name: str
+    title: str
+    columns: List[Tuple[str, str]]
+    rows: List[Dict[str, str]] = field(default_factory=list)
+    error: str = ""
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "title": self.title,
+            "columns": [list(c) for c in self.columns],
+            "rows": [[r.get(alias, "") for alias, _ in self.columns] for r in self.rows],
+            "error": self.error,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "StatsTable":
+        columns = [tuple(c) for c in data.get("columns", [])]
+        aliases = [alias for alias, _ in columns]
+        return cls(
+            name=data.get("name", ""),
+            title=data.get("title", ""),
+            columns=columns,
+            rows=[dict(zip(aliases, row)) for row in data.get("rows", [])],
+            error=data.get("error", ""),
+        )
+
+
+@dataclass
+class SolutionStats:
+    days: int
+    tables: List[StatsTable] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"days": self.days, "tables": [t.to_dict() for t in self.tables]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "SolutionStats":
+        return cls(days=data.get("days", 0),
+                   tables=[StatsTable.from_dict(t) for t in data.get("tables", [])])
+
+
+def _workflow_link(flows: List[str], parent: str = "") -> Tuple[LinkEntity, Condition]:
+    link = LinkEntity("workflow", "workflowid", "regardingobjectid", "wf", parent=parent)
+    return link, Condition("name", "in", tuple(flows), link="wf")
+
+
+def _session_window(days: int, link: str = "") -> Condition:
+    return Condition("startedon", "last-x-days", (str(days),), link=link)
+
+
+def stats_queries(flows: List[str], days: int) -> List[Tuple[StatsTable, AggregateQuery]]:
+    """
+    Consultas das métricas, agrupadas por flow (uma consulta por métrica para
+    a solution inteira), restritas às sessões dos últimos `days` dias.
+    """
+    wf, in_flows = _workflow_link(flows)
+    runs = AggregateQuery(
+        "flowsession",
+        [AggregateColumn("flow", "name", link="wf"),
+         AggregateColumn("status", "statuscode"),
+         AggregateColumn("runs", "flowsessionid", aggregate="count")],
+        links=[wf],
+        conditions=[_session_window(days), in_flows],
+    )
+    errors = AggregateQuery(
+        "flowsession",
+        [AggregateColumn("flow", "name", link="wf"),
+         AggregateColumn("errorcode", "errorcode"),
+         AggregateColumn("runs", "flowsessionid", aggregate="count")],
+        links=[wf],
+        conditions=[_session_window(days), Condition("errorcode", "not-null"), in_flows],
+    )
+    # workqueueitem <- flowlog -> flowsession -> workflow; o join com flowlog
+    # repete o item, por isso a contagem é distinta.
+    wq_wf, wq_in_flows = _workflow_link(flows, parent="fs")
+    backlog = AggregateQuery(
+        "workqueueitem",
+        [AggregateColumn("flow", "name", link="wf"),
+         AggregateColumn("status", "statuscode"),
+         AggregateColumn("items", "workqueueitemid", aggregate="countcolumn", distinct=True)],
+        links=[
+            LinkEntity("flowlog", "workqueueitemid", "workqueueitemid", "fl"),
+            LinkEntity("flowsession", "flowsessionid", "flowsessionid", "fs", parent="fl"),
+            wq_wf,
+        ],
+        conditions=[_session_window(days, link="fs"), wq_in_flows],
+    )
+    return [
+        (StatsTable("runs_by_status", "Execuções por status",
+                    [("flow", "Flow"), ("status", "Status"), ("runs", "Execuções")]), runs),
+        (StatsTable("error_codes", "Códigos de erro",
+                    [("flow", "Flow"), ("errorcode", "Código"), ("runs", "Execuções")]), errors),
+        (StatsTable("workqueue_backlog", "Work queue items por status",
+                    [("flow", "Flow"), ("status", "Status"), ("items", "Itens")]), backlog),
+    ]
+
+
+def collect_stats(client: FetchXmlClient, flows: List[str], days: int) -> SolutionStats:
+    """
+    Executa as consultas agregadas (`client` é o FetchXmlClient ou, com
+    --fetch-via webapi, o DataverseClient: ambos têm `aggregate`). A falha
+    de uma métrica fica registrada na tabela e não impede as demais.
+    """
+    stats = SolutionStats(days=days)
+    if not flows:
+        return stats
+    for table, query in stats_queries(flows, days):
+        try:
+            table.rows = client.aggregate(query)
+        except Exception as e:
+            table.error = str(e) or type(e).__name__
+            _STATS_QUERIES.inc(metric=table.name, result="error")
+            logger.warning("Estatística '%s' indisponível: %s", table.title, table.error)
+            logger.debug("Detalhes da falha da estatística %s", table.name, exc_info=True)
+        else:
+            _STATS_QUERIES.inc(metric=table.name, result="ok")
+            logger.info("Estatística '%s': %d grupos", table.title, len(table.rows))
+        stats.tables.append(table)
+    return stats
@@ -5,31 +5,64 @@ from __future__ import annotations
 
 import shutil
 import logging
-from typing import Optional
+import threading
+import time
+from typing import Dict, Optional
 
 from bot_cab.utils.run import run_command
-from azure.identity import DefaultAzureCredential
+from bot_cab.utils import metrics
 
 logger = logging.getLogger(__name__)
 
+# Tokens reaproveitados até faltar esta margem para expirar.
+_TOKEN_EXPIRY_MARGIN_SECONDS = 300
+
+_TOKEN_CACHE: Dict[str, object] = {}
+# _TOKEN_LOCK protege só o cache e o mapa de locks; a chamada de rede usa o
+# lock do ambiente, para que ambientes diferentes obtenham tokens em paralelo.
+_TOKEN_LOCK = threading.Lock()
+_ENV_LOCKS: Dict[str, threading.Lock] = {}
+
+_TOKEN_REQUESTS = metrics.counter(
+    "bot_cab_token_requests", "Pedidos de token Dataverse (hit = cache).", ("result",))
+
 def get_token(
-    environment_url: str
+    environment_url: str,
+    force_refresh: bool = False
 ) -> str:
     """
     Retorna um token a ser usado como federated token.
-    - Se id_token já foi fornecido, retorna ele (não loga).
+    - Reaproveita o token em cache para o mesmo environment_url enquanto válido
+      (force_refresh=True ignora o cache, ex.: após um HTTP 401).
     - Caso contrário, tenta obter via AzurePipelinesCredential (quando disponível),
       ou via AzureCliCredential como fallback.
     """
-    
-    try:
-        logger.info("Tentando obter token com AzurePipelinesCredential (OIDC).")
-        cred = DefaultAzureCredential()
-        tk = cred.get_token(f"{environment_url}/.default")
-        logger.info(f"Token obtido via AzurePipelinesCredential. {tk.token}")
-        return tk.token
-    except Exception as e:
-        logger.warning("Falha ao obter token via AzurePipelinesCredential: %s", e)
+    with _TOKEN_LOCK:
+        env_lock = _ENV_LOCKS.setdefault(environment_url, threading.Lock())
+    with env_lock:
+        with _TOKEN_LOCK:
+            cached = _TOKEN_CACHE.get(environment_url)
+        if cached is not None and not force_refresh \
+                and cached.expires_on - _TOKEN_EXPIRY_MARGIN_SECONDS > time.time():
+            _TOKEN_REQUESTS.inc(result="hit")
+            return cached.token
+
+        try:
+            # import tardio: azure.identity é pesado e só é necessário aqui
+            from azure.identity import DefaultAzureCredential
+
+            logger.info("Tentando obter token com AzurePipelinesCredential (OIDC).")
+            cred = DefaultAzureCredential()
+            tk = cred.get_token(f"{environment_url}/.default")
+            logger.info("Token obtido via AzurePipelinesCredential (expira em %ds).",
+                        int(tk.expires_on - time.time()))
+            with _TOKEN_LOCK:
+                _TOKEN_CACHE[environment_url] = tk
+            _TOKEN_REQUESTS.inc(result="miss")
+            return tk.token
+        except Exception as e:
+            _TOKEN_REQUESTS.inc(result="error")
+            logger.warning("Falha ao obter token via AzurePipelinesCredential: %s", e)
 
     raise RuntimeError(
         "Não foi possível obter federated token automaticamente. "
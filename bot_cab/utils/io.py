@@ -1,8 +1,9 @@
 """
-Operações de I/O (unzip de solução).
+Operações de I/O (unzip de solução, nomes de arquivo seguros).
 """
 
 import logging
+import re
 import zipfile
 from pathlib import Path
 
@@ -22,3 +23,12 @@ def unzip_solution(zip_path: Path, dest_dir: Path = None) -> Path:
         logger.error("Arquivo ZIP inválido: %s", zip_path)
         raise
     return dest_dir
+
+
+def sanitize_filename(name: str) -> str:
+    """
+    Nome de flow/ambiente como nome de arquivo ou diretório seguro.
+    """
+    safe = re.sub(r"[^\w\-\. ]+", "_", name)
+    safe = re.sub(r"\s+", "_", safe).strip("_")
+    return safe or "export"
@@ -0,0 +1,181 @@
+"""
+Métricas do Bot_CAB (contadores e histogramas em memória).
+
+Coletadas ao longo da execução por run_command, get_token, DataverseClient,
+RulesEngine e exportadores, e gravadas ao final em:
+  - metrics.prom  (formato texto OpenMetrics)
+  - metrics.json  (resumo para dashboards)
+"""
+
+import json
+import logging
+import threading
+import time
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any, Dict, List, Sequence, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _fmt_number(value: float) -> str:
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str], lock: threading.Lock) -> None:
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = lock
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(n, "")) for n in self.labelnames)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, *args) -> None:
+        super().__init__(*args)
+        self.values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self.values[key] = self.values.get(key, 0.0) + amount
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}_total{_fmt_labels(self.labelnames, k)} {_fmt_number(v)}"
+                for k, v in sorted(self.values.items())]
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(zip(self.labelnames, k)), "value": v}
+                for k, v in sorted(self.values.items())]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, *args, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        super().__init__(*args)
+        self.buckets = tuple(sorted(buckets))
+        # por label: [contagem por bucket (não cumulativa) + overflow, soma]
+        self.values: Dict[LabelValues, List[Any]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        idx = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self.values.get(key)
+            if entry is None:
+                entry = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            entry[0][idx] += 1
+            entry[1] += value
+
+    def _cumulative(self, counts: List[int]) -> List[Tuple[str, int]]:
+        out, acc = [], 0
+        for bound, n in zip(list(self.buckets) + [float("inf")], counts):
+            acc += n
+            out.append(("+Inf" if bound == float("inf") else _fmt_number(bound), acc))
+        return out
+
+    def samples(self) -> List[str]:
+        lines = []
+        for k, (counts, total) in sorted(self.values.items()):
+            for le, acc in self._cumulative(counts):
+                le_label = 'le="%s"' % le
+                lines.append(f"{self.name}_bucket{_fmt_labels(self.labelnames, k, le_label)} {acc}")
+            lines.append(f"{self.name}_count{_fmt_labels(self.labelnames, k)} {sum(counts)}")
+            lines.append(f"{self.name}_sum{_fmt_labels(self.labelnames, k)} {_fmt_number(total)}")
+        return lines
+
+    def to_json(self) -> List[Dict[str, Any]]:
+        return [{"labels": dict(zip(self.labelnames, k)),
+                 "count": sum(counts),
+                 "sum": total,
+                 "buckets": dict(self._cumulative(counts))}
+                for k, (counts, total) in sorted(self.values.items())]
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._metrics: Dict[str, _Metric] = {}
+        self.started_at = time.time()
+
+    def _get_or_create(self, cls, name: str, help: str, labelnames: Sequence[str], **kwargs) -> Any:
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, help, labelnames, self._lock, **kwargs)
+            return metric
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get_or_create(Histogram, name, help, labelnames, buckets=buckets)
+
+    def to_openmetrics(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._metrics):
+                m = self._metrics[name]
+                lines.append(f"# TYPE {m.name} {m.kind}")
+                lines.append(f"# HELP {m.name} {_escape(m.help)}")
+                lines += m.samples()
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def to_json(self) -> Dict[str, Any]:
+        with self._lock:
+            out: Dict[str, Any] = {
+                "started_at": self.started_at,
+                "duration_seconds": round(time.time() - self.started_at, 3),
+                "counters": {},
+                "histograms": {},
+            }
+            for name in sorted(self._metrics):
+                m = self._metrics[name]
+                section = "counters" if m.kind == "counter" else "histograms"
+                out[section][name] = m.to_json()
+        return out
+
+    def write(self, directory: Union[str, Path]) -> None:
+        d = Path(directory)
+        d.mkdir(parents=True, exist_ok=True)
+        (d / "metrics.prom").write_text(self.to_openmetrics(), encoding="utf-8")
+        (d / "metrics.json").write_text(json.dumps(self.to_json(), indent=2, ensure_ascii=False),
+                                        encoding="utf-8")
+        logger.info("Métricas salvas em %s", d)
+
+
+REGISTRY = MetricsRegistry()
+
+
+def counter(name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+    return REGISTRY.counter(name, help, labelnames)
+
+
+def histogram(name: str, help: str, labelnames: Sequence[str] = (),
+              buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+    return REGISTRY.histogram(name, help, labelnames, buckets)
@@ -1,22 +1,44 @@
 """
 Execução segura de comandos externos.
+
+- `stream_command` repassa o stdout linha a linha para um consumidor, sem
+  bufferizar a saída inteira, e encerra o grupo de processos no timeout.
+- `run_command` mantém a interface antiga (retorna o stdout como str).
+- `run_commands` executa vários comandos em paralelo com limite de concorrência.
 """
 
 import logging
 import shutil
 import os
-from subprocess import run, CalledProcessError
-from typing import List, Optional
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from subprocess import CalledProcessError, TimeoutExpired
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Union
+
+from bot_cab.config.constants import COMMAND_TIMEOUT_SECONDS, MAX_CONCURRENT_COMMANDS
+from bot_cab.utils import metrics
 
 logger = logging.getLogger(__name__)
 
-def run_command(cmd: List[str], capture_output: bool = True, env: Optional[dict] = None) -> str:
+_SUBPROCESS_TOTAL = metrics.counter(
+    "bot_cab_subprocess", "Comandos externos executados.", ("command", "outcome"))
+_SUBPROCESS_SECONDS = metrics.histogram(
+    "bot_cab_subprocess_duration_seconds", "Duração dos comandos externos.", ("command",))
+_SUBPROCESS_LINES = metrics.counter(
+    "bot_cab_subprocess_output_lines", "Linhas de stdout lidas de comandos externos.", ("command",))
+
+# Quantidade de linhas finais de stderr preservadas para diagnóstico.
+_STDERR_TAIL_LINES = 200
+
+
+def _resolve_command(cmd: Sequence[str]) -> List[str]:
     """
-    Executa comando sem shell=True. Retorna stdout ou lança CalledProcessError / FileNotFoundError.
     Usa shutil.which para localizar o executável e fornece logs úteis se não encontrado.
     """
-    logger.debug("Executando comando: %s", cmd)
-
     exe = shutil.which(cmd[0])
     if exe is None:
         path_env = os.environ.get("PATH", "")
@@ -27,18 +49,208 @@ def run_command(cmd: List[str], capture_output: bool = True, env: Optional[dict]
 
     full_cmd = [exe] + list(cmd[1:])
     logger.debug("Comando resolvido para: %s", full_cmd)
+    return full_cmd
 
+
+def _group_kwargs() -> Dict[str, Any]:
+    """
+    Inicia o filho em um novo grupo de processos, para que o timeout
+    encerre também os netos (pac dispara processos dotnet auxiliares).
+    """
+    if os.name == "nt":
+        return {"creationflags": subprocess.CREATE_NEW_PROCESS_GROUP}
+    return {"start_new_session": True}
+
+
+def _kill_process_group(proc: subprocess.Popen) -> None:
+    if proc.poll() is not None:
+        return
     try:
-        result = run(full_cmd, capture_output=capture_output, text=True, env=env, check=True)
-    except FileNotFoundError:
-        logger.exception("FileNotFoundError ao tentar executar: %s", full_cmd)
+        if os.name == "nt":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                           capture_output=True, check=False)
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except OSError:
+        proc.kill()
+
+
+def _command_label(cmd: Sequence[str]) -> str:
+    """
+    Rótulo de baixa cardinalidade para métricas, ex.: 'pac env', 'az account'.
+    """
+    exe = os.path.splitext(os.path.basename(cmd[0]))[0] if cmd else "?"
+    sub = cmd[1] if len(cmd) > 1 and not str(cmd[1]).startswith("-") else ""
+    return f"{exe} {sub}".strip()
+
+
+def _record(cmd: Sequence[str], started: float, outcome: str) -> None:
+    label = _command_label(cmd)
+    _SUBPROCESS_TOTAL.inc(command=label, outcome=outcome)
+    _SUBPROCESS_SECONDS.observe(time.monotonic() - started, command=label)
+
+
+def _drain(stream, sink: Deque[str]) -> None:
+    for line in stream:
+        sink.append(line)
+
+
+def stream_command(
+    cmd: Sequence[str],
+    on_line: Optional[Callable[[str], None]] = None,
+    timeout: Optional[float] = COMMAND_TIMEOUT_SECONDS,
+    env: Optional[dict] = None,
+) -> int:
+    """
+    Executa comando sem shell=True, entregando cada linha do stdout (sem o '\\n')
+    para `on_line` assim que é lida. O stderr é drenado em paralelo e apenas as
+    últimas linhas são mantidas para o diagnóstico de erro.
+
+    Retorna o código de saída (0) ou lança CalledProcessError / TimeoutExpired /
+    FileNotFoundError. Em timeout, o grupo de processos inteiro é encerrado.
+    """
+    logger.debug("Executando comando: %s", cmd)
+    full_cmd = _resolve_command(cmd)
+
+    started = time.monotonic()
+    proc = subprocess.Popen(
+        full_cmd,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+        errors="replace",
+        env=env,
+        **_group_kwargs(),
+    )
+
+    stderr_tail: Deque[str] = deque(maxlen=_STDERR_TAIL_LINES)
+    stderr_thread = threading.Thread(target=_drain, args=(proc.stderr, stderr_tail), daemon=True)
+    stderr_thread.start()
+
+    timed_out = threading.Event()
+
+    def _on_timeout() -> None:
+        timed_out.set()
+        _kill_process_group(proc)
+
+    timer = threading.Timer(timeout, _on_timeout) if timeout else None
+    if timer is not None:
+        timer.daemon = True
+        timer.start()
+
+    n_lines = 0
+    try:
+        for line in proc.stdout:
+            n_lines += 1
+            if on_line is not None:
+                on_line(line.rstrip("\r\n"))
+        returncode = proc.wait()
+    except BaseException:
+        _kill_process_group(proc)
+        proc.wait()
+        _record(cmd, started, "error")
         raise
-    except CalledProcessError as e:
-        logger.error("Comando '%s' retornou código %s", full_cmd, e.returncode)
-        logger.error("stdout:\n%s", e.stdout or "")
-        logger.error("stderr:\n%s", e.stderr or "")
+    finally:
+        if timer is not None:
+            timer.cancel()
+        stderr_thread.join(timeout=5)
+        proc.stdout.close()
+        proc.stderr.close()
+        _SUBPROCESS_LINES.inc(n_lines, command=_command_label(cmd))
+
+    stderr = "".join(stderr_tail)
+    if timed_out.is_set():
+        _record(cmd, started, "timeout")
+        logger.error("Comando '%s' excedeu o timeout de %ss; grupo de processos encerrado.",
+                     full_cmd, timeout)
+        logger.error("stderr:\n%s", stderr)
+        raise TimeoutExpired(full_cmd, timeout, stderr=stderr)
+    if returncode != 0:
+        _record(cmd, started, "error")
+        logger.error("Comando '%s' retornou código %s", full_cmd, returncode)
+        logger.error("stderr:\n%s", stderr)
+        raise CalledProcessError(returncode, full_cmd, stderr=stderr)
+
+    _record(cmd, started, "ok")
+    logger.debug("Comando concluído (%d linhas de saída).", n_lines)
+    return returncode
+
+
+def _run_inherited(full_cmd: List[str], timeout: Optional[float], env: Optional[dict]) -> None:
+    """
+    Executa herdando stdout/stderr do processo atual (ex.: prompts do `pac auth create`).
+    """
+    started = time.monotonic()
+    proc = subprocess.Popen(full_cmd, env=env, **_group_kwargs())
+    try:
+        returncode = proc.wait(timeout=timeout)
+    except TimeoutExpired:
+        _kill_process_group(proc)
+        proc.wait()
+        _record(full_cmd, started, "timeout")
+        logger.error("Comando '%s' excedeu o timeout de %ss; grupo de processos encerrado.",
+                     full_cmd, timeout)
+        raise
+    except BaseException:
+        _kill_process_group(proc)
+        proc.wait()
+        _record(full_cmd, started, "error")
         raise
+    if returncode != 0:
+        _record(full_cmd, started, "error")
+        logger.error("Comando '%s' retornou código %s", full_cmd, returncode)
+        raise CalledProcessError(returncode, full_cmd)
+    _record(full_cmd, started, "ok")
+
+
+def run_command(
+    cmd: List[str],
+    capture_output: bool = True,
+    env: Optional[dict] = None,
+    timeout: Optional[float] = COMMAND_TIMEOUT_SECONDS,
+) -> str:
+    """
+    Executa comando sem shell=True. Retorna stdout ou lança CalledProcessError /
+    TimeoutExpired / FileNotFoundError.
+    Com capture_output=False a saída vai direto para o terminal e retorna "".
+    """
+    if not capture_output:
+        logger.debug("Executando comando: %s", cmd)
+        _run_inherited(_resolve_command(cmd), timeout, env)
+        return ""
+
+    lines: List[str] = []
+    stream_command(cmd, on_line=lines.append, timeout=timeout, env=env)
+    out = "\n".join(lines).strip()
+    logger.debug("Saída capturada: %d linhas, %d caracteres", len(lines), len(out))
+    return out
+
+
+def run_commands(
+    cmds: Sequence[List[str]],
+    max_workers: int = MAX_CONCURRENT_COMMANDS,
+    timeout: Optional[float] = COMMAND_TIMEOUT_SECONDS,
+    env: Optional[dict] = None,
+    return_exceptions: bool = False,
+) -> List[Union[str, BaseException]]:
+    """
+    Executa vários comandos em paralelo (no máximo `max_workers` simultâneos),
+    cada um com seu próprio timeout. Retorna os stdouts na ordem de `cmds`.
+    Com return_exceptions=True, a exceção de cada comando que falhou ocupa a sua
+    posição na lista; caso contrário, a primeira falha é relançada ao final.
+    """
+    if not cmds:
+        return []
+
+    workers = max(1, min(max_workers, len(cmds)))
+    logger.debug("Executando %d comandos (até %d em paralelo)", len(cmds), workers)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bot_cab_cmd") as pool:
+        futures = [pool.submit(run_command, cmd, True, env, timeout) for cmd in cmds]
 
-    out = result.stdout.strip() if capture_output else ""
-    logger.debug("Saída: %s", out)
-    return out
\ No newline at end of file
+    results: List[Union[str, BaseException]] = []
+    for fut in futures:
+        exc = fut.exception()
+        if exc is not None and not return_exceptions:
+            raise exc
+        results.append(exc if exc is not None else fut.result())
+    return results
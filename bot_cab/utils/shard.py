@@ -0,0 +1,21 @@
+"""
+Especificação de shard ('i/N') do `analisar --shard`.
+
+Fica fora do scheduler para que a validação da CLI não importe o pipeline.
+"""
+
+from typing import Tuple
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """
+    Converte 'i/N' (1-based, como System.JobPositionInPhase/TotalJobsInPhase)
+    em (i, N). Lança ValueError se inválido.
+    """
+    try:
+        index, count = (int(p) for p in spec.split("/", 1))
+    except ValueError:
+        raise ValueError(f"shard inválido '{spec}': use i/N, ex.: 2/4")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"shard inválido '{spec}': é preciso 1 <= i <= N")
+    return index, count
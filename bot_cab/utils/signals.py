@@ -0,0 +1,26 @@
+"""
+Tratamento de sinais comum aos subcomandos que rodam o FlowScheduler.
+"""
+
+import signal
+from contextlib import contextmanager
+
+
+@contextmanager
+def sigterm_as_interrupt():
+    """
+    Converte SIGTERM (cancelamento/timeout do agente de CI) em KeyboardInterrupt,
+    para que o scheduler devolva resultados parciais e o relatório seja gravado.
+    """
+    def _handler(signum, frame):
+        raise KeyboardInterrupt(f"sinal {signum}")
+
+    try:
+        previous = signal.signal(signal.SIGTERM, _handler)
+    except ValueError:  # fora da main thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        signal.signal(signal.SIGTERM, previous)
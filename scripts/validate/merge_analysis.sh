@@ -0,0 +1,52 @@
+# -----------------------------------------------------------------------------
+# Junta os resultados parciais gravados por run_analysis.sh --shard i/N em um
+# único relatório e seta a variável hasIssues
+#
+# PARÂMETROS:
+#   --solution-name    Nome da solução
+#   --output-dir       Diretório de saída para relatórios (o mesmo dos shards)
+#   --timings-file     (opcional) histórico de tempos atualizado com os shards
+# -----------------------------------------------------------------------------
+
+set -euo pipefail
+trap 'echo "❌ Erro no script em linha $LINENO"; exit 1' ERR
+
+while [[ $# -gt 0 ]]; do
+  case $1 in
+    --solution-name)    solName="$2"; shift 2;;
+    --output-dir)       outDir="$2"; shift 2;;
+    --timings-file)     timingsFile="$2"; shift 2;;
+    *) echo "Parâmetro desconhecido: $1"; exit 1;;
+  esac
+done
+
+: "${solName:?--solution-name é obrigatório}"
+: "${outDir:?--output-dir é obrigatório}"
+
+reportDir="${outDir}/solutions/${solName}"
+shopt -s nullglob
+partials=("${reportDir}"/parcial_*.json)
+if (( ${#partials[@]} == 0 )); then
+  echo "❌ Nenhum resultado parcial encontrado em ${reportDir}"
+  exit 2
+fi
+
+extraArgs=()
+if [[ -n "${timingsFile:-}" ]]; then
+  extraArgs=(--timings-file "$timingsFile")
+fi
+
+echo "🔄 Juntando ${#partials[@]} resultados parciais da solução '$solName'"
+python3 -m bot_cab.main merge \
+  --partials        "${partials[@]}" \
+  --output-markdown "${reportDir}/resumo_${solName}.md" \
+  ${extraArgs[@]+"${extraArgs[@]}"} \
+  && exit_code=0 || exit_code=$?
+
+if (( exit_code == 0 )); then
+  echo "##vso[task.setvariable variable=hasIssues]false"
+else
+  echo "##vso[task.setvariable variable=hasIssues]true"
+fi
+
+exit $exit_code
@@ -9,6 +9,8 @@
 #   --application-id   ID do aplicativo (PAC CLI)
 #   --output-dir       Diretório de saída para relatórios
 #   --base-dir         Diretório base para soluções
+#   --shard            (opcional) fatia i/N dos Desktop Flows analisada neste agente;
+#                      grava o parcial em <output-dir>/solutions/<sol>/parcial_<i>.json
 # -----------------------------------------------------------------------------
 
 set -euo pipefail
@@ -23,6 +25,7 @@ while [[ $# -gt 0 ]]; do
     --application-id)   appId="$2"; shift 2;;
     --output-dir)       outDir="$2"; shift 2;;
     --base-dir)         baseDir="$2"; shift 2;;
+    --shard)            shard="$2"; shift 2;;
     *) echo "Parâmetro desconhecido: $1"; exit 1;;
   esac
 done
@@ -39,6 +42,11 @@ pathZip="${baseDir}/bot_cab/solutions/${solName}/${solName}_managed.zip"
 
 mkdir -p "$reportDir"
 
+shardArgs=(--output-markdown "${reportDir}/resumo_${solName}.md")
+if [[ -n "${shard:-}" ]]; then
+  shardArgs=(--shard "$shard" --partial-output "${reportDir}/parcial_${shard%%/*}.json")
+fi
+
 echo "🔄 Iniciando análise da solução '$solName' no ambiente '$envName'"
 python3 -m bot_cab.main analisar \
   --environment-url  "$envUrl" \
@@ -48,10 +56,9 @@ python3 -m bot_cab.main analisar \
   --pac-auth-mode    federated \
   --solution-name    "$solName" \
   --solution-zip-path "$pathZip" \
-  --output-markdown  "${reportDir}/resumo_${solName}.md" \
-  --export-path      "" 
-
-exit_code=$?
+  --export-path      "" \
+  "${shardArgs[@]}" \
+  && exit_code=0 || exit_code=$?
 
 if (( exit_code == 1 )); then
   echo "##vso[task.setvariable variable=hasIssues]true"
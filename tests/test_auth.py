@@ -0,0 +1,55 @@
+import sys
+import threading
+import time
+import types
+from collections import Counter
+
+import pytest
+
+from bot_cab.utils import auth
+
+URLS = ["https://a.crm.dynamics.com", "https://b.crm.dynamics.com"]
+
+
+@pytest.fixture
+def credential(monkeypatch):
+    calls = Counter()
+
+    class FakeCredential:
+        def get_token(self, scope):
+            calls[scope] += 1
+            time.sleep(0.3)
+            return types.SimpleNamespace(token=f"token:{scope}", expires_on=time.time() + 3600)
+
+    module = types.ModuleType("azure.identity")
+    module.DefaultAzureCredential = FakeCredential
+    monkeypatch.setitem(sys.modules, "azure.identity", module)
+    monkeypatch.setattr(auth, "_TOKEN_CACHE", {})
+    monkeypatch.setattr(auth, "_ENV_LOCKS", {})
+    return calls
+
+
+def _in_threads(urls):
+    tokens = {}
+    threads = [threading.Thread(target=lambda i=i, u=u: tokens.__setitem__(i, auth.get_token(u)))
+               for i, u in enumerate(urls)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return tokens
+
+
+def test_environments_get_tokens_in_parallel(credential):
+    started = time.monotonic()
+    tokens = _in_threads(URLS)
+
+    assert time.monotonic() - started < 0.5
+    assert sorted(tokens.values()) == [f"token:{u}/.default" for u in URLS]
+
+
+def test_same_environment_requests_a_single_token(credential):
+    tokens = _in_threads([URLS[0]] * 3)
+
+    assert set(tokens.values()) == {f"token:{URLS[0]}/.default"}
+    assert credential[f"{URLS[0]}/.default"] == 1
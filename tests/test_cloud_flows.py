@@ -0,0 +1,23 @@
+import pytest
+
+from bot_cab.commands.report import exit_code_for
+from bot_cab.processing.cloud_flows import _is_secret_key
+from bot_cab.processing.rules_engine import RULE_ANALYSIS_FAILED, CloudFlowIssues
+
+
+@pytest.mark.parametrize("key", ["password", "dbPassword", "x-api-key", "client_secret", "accessToken",
+                                 "token", "sig", "connectionString", "SharedAccessKey"])
+def test_secret_keys(key):
+    assert _is_secret_key(key)
+
+
+@pytest.mark.parametrize("key", ["continuationToken", "nextPageToken", "csrfToken", "signature", "design"])
+def test_keys_that_only_end_like_a_secret(key):
+    assert not _is_secret_key(key)
+
+
+def test_failed_static_analysis_exits_with_2():
+    failed = CloudFlowIssues()
+    failed.add("Falha na análise estática dos Cloud Flows: zip inválido", rule=RULE_ANALYSIS_FAILED)
+    assert exit_code_for([], [failed]) == 2
+    assert exit_code_for([], [CloudFlowIssues()]) == 0
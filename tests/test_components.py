@@ -0,0 +1,16 @@
+from bot_cab.processing.components import STRUCTURE_KEY, Component, flow_fingerprint
+
+COMPONENTS = {
+    STRUCTURE_KEY: Component("solution", "estrutura", "s"),
+    "workflow:f_a": Component("workflow", "f_a", "w"),
+}
+
+
+def test_fingerprint_changes_with_last_session():
+    assert flow_fingerprint("f_a", COMPONENTS, "sessao-1") != flow_fingerprint("f_a", COMPONENTS, "sessao-2")
+    assert flow_fingerprint("f_a", COMPONENTS, "sessao-1") == flow_fingerprint("f_a", COMPONENTS, "sessao-1")
+
+
+def test_fingerprint_without_session_is_the_offline_one():
+    assert flow_fingerprint("f_a", COMPONENTS) == flow_fingerprint("f_a", COMPONENTS, "")
+    assert flow_fingerprint("f_a", COMPONENTS) != flow_fingerprint("f_a", COMPONENTS, "sessao-1")
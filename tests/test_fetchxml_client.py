@@ -0,0 +1,25 @@
+import pytest
+
+from bot_cab.processing.fetchxml_client import FetchXmlClient
+
+SESSION = "0f8fad5b-d9cb-469f-a165-70867728950e"
+OTHER = "7c9e6679-7425-40de-944b-e07fc1f90ae7"
+
+RAW = f"""Connected as user@contoso.com
+regardingobjectid                     flowsessionid                         startedon
+------------------------------------  ------------------------------------  --------------------
+{OTHER}  {SESSION}  1/2/2024 10:00 AM
+"""
+
+
+def _client():
+    return FetchXmlClient(env_url="https://org.crm.dynamics.com", run_cmd=lambda cmd: "")
+
+
+def test_parse_column_uses_the_header_position():
+    assert _client().parse_column(RAW, "flowsessionid") == [SESSION]
+
+
+def test_parse_column_fails_without_the_column():
+    with pytest.raises(LookupError):
+        _client().parse_column(RAW.replace("flowsessionid", "sessionid"), "flowsessionid")
@@ -0,0 +1,67 @@
+import json
+
+from bot_cab.utils.metrics import MetricsRegistry
+
+
+def _registry():
+    registry = MetricsRegistry()
+    calls = registry.counter("bot_cab_commands", "Comandos executados", ("tool", "status"))
+    calls.inc(tool="pac", status="ok")
+    calls.inc(2, tool="pac", status="ok")
+    calls.inc(tool="az", status="erro")
+    latency = registry.histogram("bot_cab_command_seconds", "Duração dos comandos", ("tool",),
+                                 buckets=(0.5, 1, 2.5))
+    latency.observe(0.2, tool="pac")
+    latency.observe(1, tool="pac")
+    latency.observe(5, tool="pac")
+    return registry
+
+
+def test_counter_is_exposed_with_total_suffix():
+    lines = _registry().to_openmetrics().splitlines()
+
+    assert "# TYPE bot_cab_commands counter" in lines
+    assert "# HELP bot_cab_commands Comandos executados" in lines
+    assert 'bot_cab_commands_total{tool="pac",status="ok"} 3' in lines
+    assert 'bot_cab_commands_total{tool="az",status="erro"} 1' in lines
+    assert not any(line.startswith("bot_cab_commands{") for line in lines)
+
+
+def test_histogram_buckets_are_cumulative_with_inf_sum_and_count():
+    lines = _registry().to_openmetrics().splitlines()
+
+    assert "# TYPE bot_cab_command_seconds histogram" in lines
+    start = lines.index('bot_cab_command_seconds_bucket{tool="pac",le="0.5"} 1')
+    assert lines[start:start + 6] == [
+        'bot_cab_command_seconds_bucket{tool="pac",le="0.5"} 1',
+        'bot_cab_command_seconds_bucket{tool="pac",le="1"} 2',
+        'bot_cab_command_seconds_bucket{tool="pac",le="2.5"} 2',
+        'bot_cab_command_seconds_bucket{tool="pac",le="+Inf"} 3',
+        'bot_cab_command_seconds_count{tool="pac"} 3',
+        'bot_cab_command_seconds_sum{tool="pac"} 6.2',
+    ]
+
+
+def test_exposition_ends_with_eof():
+    text = _registry().to_openmetrics()
+
+    assert text.endswith("# EOF\n")
+    assert text.count("# EOF") == 1
+    assert MetricsRegistry().to_openmetrics() == "# EOF\n"
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("bot_cab_erros", "Erros", ("msg",)).inc(msg='falha "x"\nlinha')
+
+    assert 'bot_cab_erros_total{msg="falha \\"x\\"\\nlinha"} 1' in registry.to_openmetrics()
+
+
+def test_write_saves_prom_and_json(tmp_path):
+    registry = _registry()
+    registry.write(tmp_path)
+
+    assert (tmp_path / "metrics.prom").read_text(encoding="utf-8") == registry.to_openmetrics()
+    data = json.loads((tmp_path / "metrics.json").read_text(encoding="utf-8"))
+    assert data["counters"]["bot_cab_commands"][0]["value"] == 1
+    assert data["histograms"]["bot_cab_command_seconds"][0]["buckets"]["+Inf"] == 3
@@ -0,0 +1,27 @@
+import time
+
+from bot_cab.processing.pipeline import Stage, StagedPipeline
+
+
+def test_accepting_counts_workers_blocked_by_backpressure():
+    pipeline = StagedPipeline([
+        Stage("busca", lambda v: v, workers=2, queue_size=2),
+        Stage("regras", lambda v: time.sleep(1.0), workers=1, queue_size=1),
+    ])
+    try:
+        admitted = 0
+        slowest_submit = 0.0
+        for _ in range(10):
+            if not pipeline.accepting:
+                break
+            t0 = time.monotonic()
+            pipeline.submit(admitted)
+            slowest_submit = max(slowest_submit, time.monotonic() - t0)
+            admitted += 1
+            time.sleep(0.05)
+        # 1 em regras, 1 na fila de regras e os 2 workers da busca esperando vaga
+        assert admitted == 4
+        assert not pipeline.accepting
+        assert slowest_submit < 0.1
+    finally:
+        pipeline.shutdown(wait=False)
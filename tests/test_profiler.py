@@ -0,0 +1,71 @@
+from bot_cab.output.md_builder import MarkdownResponseBuilder
+from bot_cab.processing.profiler import profile_actions
+
+
+def _action(func, name, start, end):
+    return {
+        "functionName": func,
+        "systemActionName": name,
+        "startTime": f"2024-01-01T00:00:{start:02d}",
+        "endTime": f"2024-01-01T00:00:{end:02d}",
+    }
+
+
+def test_sibling_subflows_do_not_nest():
+    profile = profile_actions([
+        _action("main", "SetVariable", 0, 1),
+        _action("f_a", "Wait", 1, 3),
+        _action("f_b", "Wait", 3, 6),
+    ])
+
+    assert set(profile.collapsed) == {"main;SetVariable", "main;f_a;Wait", "main;f_b;Wait"}
+    assert profile.subflows["f_a"]["total"] == 2
+    assert profile.subflows["f_b"]["total"] == 3
+
+
+def test_nested_subflow_while_call_is_running():
+    profile = profile_actions([
+        _action("main", "RunSubflow", 0, 10),
+        _action("f_a", "RunSubflow", 1, 8),
+        _action("f_b", "Wait", 2, 7),
+        _action("f_c", "Wait", 8, 9),
+    ])
+
+    assert "main;f_a;f_b;Wait" in profile.collapsed
+    assert "main;f_c;Wait" in profile.collapsed
+
+
+def test_report_honors_profile_top(tmp_path):
+    profile = profile_actions([_action("main", f"Acao{i}", i, i + 1) for i in range(5)], top_n=2)
+    lines = MarkdownResponseBuilder(str(tmp_path / "r.md"), profile_top=2)._render_profile(profile, 2)
+
+    assert sum(1 for line in lines if line.startswith("|Acao")) == 4
+
+
+def test_callee_time_is_not_counted_in_the_caller():
+    profile = profile_actions([
+        _action("main", "RunSubflow", 0, 10),
+        _action("f_a", "Wait", 1, 9),
+    ])
+
+    assert profile.total_seconds == 10
+    assert profile.subflows["main"]["self"] == 2
+    assert profile.subflows["f_a"]["self"] == 8
+    assert profile.subflows["main"]["total"] == 10
+    assert profile.collapsed == {"main;RunSubflow": 2_000_000, "main;f_a;Wait": 8_000_000}
+    assert sum(profile.collapsed.values()) == profile.total_seconds * 1_000_000
+
+
+def test_nested_self_times_add_up_to_the_session():
+    profile = profile_actions([
+        _action("main", "SetVariable", 0, 1),
+        _action("main", "RunSubflow", 1, 12),
+        _action("f_a", "RunSubflow", 2, 10),
+        _action("f_b", "Wait", 3, 9),
+        _action("main", "Wait", 12, 14),
+    ])
+
+    selfs = {name: st["self"] for name, st in profile.subflows.items()}
+    assert selfs == {"main": 6, "f_a": 2, "f_b": 6}
+    assert sum(selfs.values()) == profile.total_seconds
+    assert sum(profile.collapsed.values()) == profile.total_seconds * 1_000_000
@@ -0,0 +1,105 @@
+import time
+from email.utils import format_datetime
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from bot_cab.processing.request_governor import RequestGovernor, _retry_after_seconds
+
+
+def _response(status, retry_after=None):
+    headers = {} if retry_after is None else {"Retry-After": retry_after}
+    return SimpleNamespace(status_code=status, headers=headers)
+
+
+def _sender(*responses):
+    pending = list(responses)
+    return lambda: pending.pop(0)
+
+
+@pytest.fixture
+def governor():
+    """
+    Governor que registra os Retry-After sem de fato esperar por eles.
+    """
+    gov = RequestGovernor(name="teste", initial=4, max_limit=8, max_retries=3, latency_target=5.0)
+    gov.waits = []
+    on_throttle = gov.on_throttle
+
+    def record(retry_after):
+        gov.waits.append(retry_after)
+        on_throttle(0.0)
+
+    gov.on_throttle = record
+    return gov
+
+
+def _http_date(seconds_ahead):
+    return format_datetime(datetime.now(timezone.utc) + timedelta(seconds=seconds_ahead), usegmt=True)
+
+
+def test_retry_after_forms():
+    assert _retry_after_seconds("7") == 7.0
+    assert _retry_after_seconds("-3") == 0.0
+    assert 28 <= _retry_after_seconds(_http_date(30)) <= 30
+    assert _retry_after_seconds(_http_date(-30)) == 0.0
+    assert _retry_after_seconds("amanhã") is None
+    assert _retry_after_seconds(None) is None
+
+
+def test_429_with_seconds_halves_limit_and_retries(governor):
+    resp = governor.request(_sender(_response(429, "7"), _response(200)))
+
+    assert resp.status_code == 200
+    assert governor.waits == [7.0]
+    assert governor.limit == 2
+    assert (governor.throttled, governor.retries, governor.requests) == (1, 1, 2)
+
+
+def test_503_with_http_date(governor):
+    resp = governor.request(_sender(_response(503, _http_date(30)), _response(200)))
+
+    assert resp.status_code == 200
+    assert len(governor.waits) == 1 and 28 <= governor.waits[0] <= 30
+    assert governor.limit == 2
+
+
+def test_backoff_without_header_and_one_decrease_per_cooldown(governor):
+    resp = governor.request(_sender(_response(429), _response(429), _response(200)))
+
+    assert resp.status_code == 200
+    assert governor.waits == [1.0, 2.0]
+    assert governor.limit == 2
+
+
+def test_gives_up_after_max_retries(governor):
+    resp = governor.request(_sender(*[_response(429, "1")] * 4))
+
+    assert resp.status_code == 429
+    assert governor.waits == [1.0, 1.0, 1.0]
+    assert governor.retries == 3
+
+
+def test_additive_increase_up_to_max():
+    gov = RequestGovernor(initial=2, max_limit=4, latency_target=5.0)
+    limits = []
+    for _ in range(8):
+        gov.on_success(0.1)
+        limits.append(gov.limit)
+    assert limits == [2, 2, 3, 3, 3, 4, 4, 4]
+
+
+def test_slow_response_halves_limit():
+    gov = RequestGovernor(initial=8, max_limit=8, latency_target=5.0)
+    gov.on_success(6.0)
+    assert gov.limit == 4
+
+
+def test_retry_after_blocks_new_requests():
+    gov = RequestGovernor(initial=4, max_retries=2)
+    started = time.monotonic()
+    resp = gov.request(_sender(_response(429, "0.3"), _response(200)))
+
+    assert resp.status_code == 200
+    assert time.monotonic() - started >= 0.3
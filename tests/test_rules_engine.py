@@ -0,0 +1,37 @@
+from bot_cab.processing.desktop_scripts import DesktopFlowIndex
+from bot_cab.processing.rules_engine import Issue, RulesEngine, SolutionIssues
+
+
+def test_display_formats_only_the_count():
+    issue = Issue("Solution", "Ref a,b inválida.", count=50000)
+    assert issue.display() == "Ref a,b inválida (×50 000)"
+    assert Issue("Solution", "Ref a,b inválida.").display() == "Ref a,b inválida."
+
+
+def test_group_aggregates_repeated_issues():
+    group = SolutionIssues()
+    for i in range(5):
+        group.add("SubFluxo 'x' não segue prefixo 'f_'.", rule="subflow_prefix", subject="x",
+                  location=f"ação #{i}")
+    (issue,) = list(group)
+    assert issue.count == 5
+    assert len(issue.samples) == 3
+
+
+def test_action_log_naming_keeps_the_original_rule():
+    actions = [{"functionName": name} for name in ("Main", "Empty", "f_Login", "Login")]
+    engine = RulesEngine(details=None, actions=actions, unzipped_folder=None, prefix="")
+    engine._check_subflows()
+    assert [i.subject for i in engine.subflow_issues] == ["Empty", "Login"]
+
+
+def test_script_naming_exempts_the_cleanup_subflow():
+    index = DesktopFlowIndex(
+        flow="Robo",
+        functions={name: {"line": n, "actions": 1, "calls": []}
+                   for n, name in enumerate(("Main", "Empty", "f_Login", "Login"), start=1)},
+        calls=[("Main", "Empty", 2)],
+    )
+    engine = RulesEngine(details=None, actions=[], unzipped_folder=None, prefix="")
+    engine._check_script(index)
+    assert [i.subject for i in engine.subflow_issues] == ["Login"]
@@ -0,0 +1,98 @@
+import threading
+import time
+
+from bot_cab.processing.pipeline import Stage
+from bot_cab.processing.scheduler import (
+    MIN_RESERVE_SECONDS,
+    STATUS_DONE,
+    STATUS_SKIPPED,
+    FlowScheduler,
+    TimingHistory,
+)
+
+FLOWS = [f"flow_{i:02d}" for i in range(20)]
+
+
+def _stages(fetched, fetch_seconds=0.05, has_issues=True):
+    lock = threading.Lock()
+
+    def fetch(flow):
+        with lock:
+            fetched.append(flow)
+        time.sleep(fetch_seconds)
+        return flow
+
+    def evaluate(flow):
+        return {"desktop_flow": flow, "actions": []}, [], has_issues
+
+    return [Stage("busca", fetch), Stage("regras", evaluate), Stage("exportacao", lambda a: a)]
+
+
+def test_fail_fast_pipeline_stops_fetching():
+    fetched = []
+    outcomes = FlowScheduler(FLOWS, fail_fast=True).run_pipeline(_stages(fetched))
+
+    # Só o flow seguinte pode ter começado a busca enquanto o primeiro passava pelas regras.
+    assert len(fetched) <= 2
+    done = [o for o in outcomes if o.status == STATUS_DONE]
+    assert len(done) == 1
+    assert all(o.reason.startswith("fail-fast") for o in outcomes if o.status == STATUS_SKIPPED)
+
+
+def test_fail_fast_run_matches_pipeline():
+    fetched = []
+
+    def task(flow):
+        fetched.append(flow)
+        return {"desktop_flow": flow, "actions": []}, [], True
+
+    outcomes = FlowScheduler(FLOWS, fail_fast=True).run(task)
+    assert fetched == [sorted(FLOWS)[0]]
+    assert sum(o.status == STATUS_DONE for o in outcomes) == 1
+
+
+def test_deadline_pipeline_skips_what_does_not_fit():
+    history = TimingHistory({f: {"seconds": 0.2, "actions": 0} for f in FLOWS})
+    fetched = []
+    budget = 1.0
+    started = time.monotonic()
+    outcomes = FlowScheduler(FLOWS, history=history, deadline=MIN_RESERVE_SECONDS + budget) \
+        .run_pipeline(_stages(fetched, fetch_seconds=0.2, has_issues=False))
+
+    assert time.monotonic() - started < budget + 0.5
+    assert 1 <= len(fetched) <= 6
+    skipped = [o for o in outcomes if o.status == STATUS_SKIPPED]
+    assert len(skipped) == len(FLOWS) - sum(o.status == STATUS_DONE for o in outcomes)
+    assert all("prazo" in o.reason for o in skipped)
+
+
+def test_deadline_abandons_running_flow_without_waiting():
+    history = TimingHistory({"lento": {"seconds": 0.1, "actions": 0}})
+    started = time.monotonic()
+    outcomes = FlowScheduler(["lento"], history=history, deadline=MIN_RESERVE_SECONDS + 0.5) \
+        .run(lambda flow: (time.sleep(3), ({}, [], False))[1])
+
+    assert time.monotonic() - started < 1.5
+    assert outcomes[0].status == STATUS_SKIPPED
+    assert outcomes[0].reason == "prazo atingido durante a execução"
+    assert all(t.daemon for t in threading.enumerate() if t.name.startswith("bot_cab_"))
+
+
+def test_stop_event_interrupts_pipeline():
+    stop = threading.Event()
+    fetched = []
+    threading.Timer(0.3, stop.set).start()
+    started = time.monotonic()
+    outcomes = FlowScheduler(FLOWS, stop=stop).run_pipeline(_stages(fetched, fetch_seconds=0.1, has_issues=False))
+
+    assert time.monotonic() - started < 1.0
+    assert any(o.reason == "execução interrompida" for o in outcomes)
+    assert len(fetched) < len(FLOWS)
+
+
+def test_merge_keeps_slowest_environment():
+    merged = TimingHistory()
+    merged.merge(TimingHistory({"a": {"seconds": 2.0, "actions": 10}, "b": {"seconds": 5.0, "actions": 1}}))
+    merged.merge(TimingHistory({"a": {"seconds": 3.0, "actions": 12}, "b": {"seconds": 1.0, "actions": 1}}))
+
+    assert merged.entries == {"a": {"seconds": 3.0, "actions": 12}, "b": {"seconds": 5.0, "actions": 1}}
@@ -0,0 +1,85 @@
+import pytest
+
+from bot_cab.processing.fetchxml_client import AggregateColumn, AggregateQuery, parse_aggregate_table
+from bot_cab.processing.session_stats import collect_stats, stats_queries
+
+FLOWS = ["Robo A", "Robo B"]
+
+IN_FLOWS = ('<filter type="and"><condition attribute="name" operator="in">'
+            '<value>Robo A</value><value>Robo B</value></condition></filter>')
+WORKFLOW = ('<link-entity name="workflow" from="workflowid" to="regardingobjectid" alias="wf" link-type="inner">'
+            '<attribute name="name" alias="flow" groupby="true" />' + IN_FLOWS + '</link-entity>')
+LAST_7_DAYS = '<condition attribute="startedon" operator="last-x-days" value="7" />'
+
+EXPECTED = {
+    "runs_by_status": (
+        '<fetch version="1.0" mapping="logical" aggregate="true"><entity name="flowsession">'
+        '<attribute name="statuscode" alias="status" groupby="true" />'
+        '<attribute name="flowsessionid" alias="runs" aggregate="count" />'
+        '<filter type="and">' + LAST_7_DAYS + '</filter>' + WORKFLOW + '</entity></fetch>'
+    ),
+    "error_codes": (
+        '<fetch version="1.0" mapping="logical" aggregate="true"><entity name="flowsession">'
+        '<attribute name="errorcode" alias="errorcode" groupby="true" />'
+        '<attribute name="flowsessionid" alias="runs" aggregate="count" />'
+        '<filter type="and">' + LAST_7_DAYS + '<condition attribute="errorcode" operator="not-null" /></filter>'
+        + WORKFLOW + '</entity></fetch>'
+    ),
+    "workqueue_backlog": (
+        '<fetch version="1.0" mapping="logical" aggregate="true"><entity name="workqueueitem">'
+        '<attribute name="statuscode" alias="status" groupby="true" />'
+        '<attribute name="workqueueitemid" alias="items" aggregate="countcolumn" distinct="true" />'
+        '<link-entity name="flowlog" from="workqueueitemid" to="workqueueitemid" alias="fl" link-type="inner">'
+        '<link-entity name="flowsession" from="flowsessionid" to="flowsessionid" alias="fs" link-type="inner">'
+        '<filter type="and">' + LAST_7_DAYS + '</filter>' + WORKFLOW +
+        '</link-entity></link-entity></entity></fetch>'
+    ),
+}
+
+PAC_TABLE = """Connected as user@contoso.com
+Connected to... Contoso (Default)
+wf.flow      status      runs
+-----------  ----------  ----
+Robo A       Succeeded   40
+Robo A       Failed      2
+Robo B       Succeeded   7
+"""
+
+
+@pytest.mark.parametrize("name", sorted(EXPECTED))
+def test_stats_queries_xml(name):
+    queries = {table.name: query for table, query in stats_queries(FLOWS, 7)}
+    assert queries[name].to_xml() == EXPECTED[name]
+
+
+def test_parse_aggregate_table_with_link_alias_prefix():
+    rows = parse_aggregate_table(PAC_TABLE.splitlines(), ["flow", "status", "runs"])
+    assert rows == [
+        {"flow": "Robo A", "status": "Succeeded", "runs": "40"},
+        {"flow": "Robo A", "status": "Failed", "runs": "2"},
+        {"flow": "Robo B", "status": "Succeeded", "runs": "7"},
+    ]
+
+
+def test_parse_aggregate_table_without_header():
+    assert parse_aggregate_table(["Connected as user@contoso.com", "Robo A  40"], ["flow", "runs"]) == []
+
+
+def test_unknown_aggregate_or_link_is_rejected():
+    with pytest.raises(ValueError):
+        AggregateQuery("flowsession", [AggregateColumn("n", "flowsessionid", aggregate="median")])
+    with pytest.raises(ValueError):
+        AggregateQuery("flowsession", [AggregateColumn("flow", "name", link="wf")])
+
+
+def test_collect_stats_keeps_going_after_a_failed_metric():
+    class Client:
+        def aggregate(self, query):
+            if query.entity == "workqueueitem":
+                raise RuntimeError("limite de 50 000 registros")
+            return [{alias: "x" for alias in query.aliases}]
+
+    stats = collect_stats(Client(), FLOWS, 7)
+    assert [t.name for t in stats.tables] == ["runs_by_status", "error_codes", "workqueue_backlog"]
+    assert [bool(t.rows) for t in stats.tables] == [True, True, False]
+    assert stats.tables[2].error == "limite de 50 000 registros"
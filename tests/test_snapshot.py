@@ -0,0 +1,48 @@
+import zipfile
+
+import pytest
+
+from bot_cab.config.enums import FlowSessionStatus
+from bot_cab.output.snapshot import Snapshot, SnapshotWriter
+from bot_cab.processing.session_details import SessionDetails
+
+SESSION = "0f8fad5b-d9cb-469f-a165-70867728950e"
+
+
+@pytest.fixture
+def solution_zip(tmp_path):
+    path = tmp_path / "solution.zip"
+    with zipfile.ZipFile(path, "w") as z:
+        z.writestr("customizations.xml", "<ImportExportXml/>")
+    return path
+
+
+def test_round_trip(tmp_path, solution_zip):
+    details = SessionDetails(
+        session_id=SESSION,
+        flow_name="Robo",
+        status=FlowSessionStatus.FAILED,
+        error_code="Timeout",
+        _log_rows=[("log-1", "2024-01-01", "1", "Error", '{"x": 1}', "item", "2024-01-01")],
+    )
+    actions = [{"functionName": "main", "systemActionName": "Wait", "startTime": "2024-01-01T00:00:00"}]
+    path = tmp_path / "busca.snapshot"
+    with SnapshotWriter(path, "Solucao", "https://org.crm.dynamics.com", solution_zip) as writer:
+        writer.add({"desktop_flow": "Robo", "session_id": SESSION, "start_time": "2024-01-01 00:00:00",
+                    "details": details, "actions": actions})
+        writer.add_failure("Outro", "nenhuma execução encontrada")
+        writer.close(["Robo", "Outro"])
+
+    with Snapshot(path) as snapshot:
+        assert snapshot.flows == ["Robo", "Outro"]
+        assert snapshot.solution_name == "Solucao"
+        data = snapshot.load("Robo")
+        assert data["actions"] == actions
+        assert data["details"] == SessionDetails.from_dict(details.to_dict())
+        assert data["details"].logs[0].data == {"x": 1}
+        assert snapshot.extract_solution(tmp_path / "s.zip").read_bytes() == solution_zip.read_bytes()
+
+        assert snapshot.missing_reason("Robo") is None
+        assert snapshot.missing_reason("Outro") == "nenhuma execução encontrada"
+        with pytest.raises(LookupError, match="nenhuma execução"):
+            snapshot.load("Outro")